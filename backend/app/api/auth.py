@@ -2,19 +2,17 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer  
 from models.auth import LoginInput, TokenResponse
 from core.database import get_db
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+from core.security import password_hasher
+from core.tokens import get_keyring, token_cache
+from core.ratelimit import rate_limit, check_login_account, charge_failed_login
+from jose import JWTError
 from datetime import datetime, timedelta
 from typing import Optional, Annotated
 import os
-import psycopg2
+import psycopg
 
-router = APIRouter(prefix="/v1/auth", tags=["auth"])
+router = APIRouter(prefix="/v1/auth", tags=["auth"], dependencies=[Depends(rate_limit("auth"))])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")  
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
@@ -25,33 +23,50 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = get_keyring().sign(to_encode)
     return encoded_jwt
 
+# Resolved before get_db, so a throttled attempt costs no connection,
+# query or bcrypt round.
+async def login_form(form_data: OAuth2PasswordRequestForm = Depends()) -> OAuth2PasswordRequestForm:
+    await check_login_account(form_data.username)
+    return form_data
+
 @router.post("/login", response_model=TokenResponse)
-async def login(db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)], form_data: OAuth2PasswordRequestForm = Depends() ):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends(login_form)], db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)]):
     conn, cursor = db
-    cursor.execute(
+    await cursor.execute(
         """SELECT id, email, password FROM users WHERE email = %s AND is_active = TRUE""",
         (form_data.username,)  
     )
-    user = cursor.fetchone()
+    user = await cursor.fetchone()
     if not user:
+        await charge_failed_login(form_data.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
-    if not pwd_context.verify(form_data.password, user["password"]):
+    valid, new_hash = await password_hasher.verify(form_data.password, user["password"])
+    if not valid:
+        await charge_failed_login(form_data.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        await cursor.execute("""UPDATE users SET password = %s WHERE id = %s""", (new_hash, user["id"]))
+        await conn.commit()
     
     access_token = create_access_token(data={"sub": str(user["id"]), "email": user["email"]})
     return {"access_token": access_token, "token_type": "bearer", "message": "Login successful"}
 
-def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/v1/auth/login"))):
+async def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/v1/auth/login"))):
+    current_user = token_cache.get(token)
+    if current_user is not None:
+        return current_user
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = get_keyring().verify(token)
         user_id: str = payload.get("sub")
         email: str = payload.get("email")
         if user_id is None or email is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return {"id": int(user_id), "email": email}
+        current_user = {"id": int(user_id), "email": email}
+        token_cache.set(token, current_user, payload["exp"])
+        return current_user
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
@@ -0,0 +1,177 @@
+from fastapi import APIRouter, status, HTTPException, Depends, Query
+from models.booking import BookingCreate, BookingQuote, BookingResponse, BookedPeriod, AvailabilityResponse
+from core.database import get_db
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Annotated
+from core.ratelimit import rate_limit
+from .auth import get_current_user
+import math
+import psycopg
+
+router = APIRouter(prefix="/v1/bookings", tags=["bookings"], dependencies=[Depends(rate_limit("bookings"))])
+
+AVAILABILITY_MAX_ITEMS = 500
+
+
+def quote_price(start: datetime, end: datetime, price_per_hour: Optional[Decimal], price_per_day: Optional[Decimal]) -> tuple[int, Decimal]:
+    hours = max(1, math.ceil((end - start).total_seconds() / 3600))
+    if price_per_hour is None and price_per_day is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Item has no rental price")
+    if price_per_day is None:
+        price = hours * price_per_hour
+    elif price_per_hour is None:
+        price = math.ceil(hours / 24) * price_per_day
+    else:
+        # Whole days at the daily rate; leftover hours at the hourly rate,
+        # capped at one more day.
+        days, leftover = divmod(hours, 24)
+        price = days * price_per_day + min(leftover * price_per_hour, price_per_day)
+    return hours, Decimal(price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _check_period(start: datetime, end: datetime):
+    if start.tzinfo is None or end.tzinfo is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start and end must include a timezone offset")
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+
+
+async def _bookable_item(cursor: psycopg.AsyncCursor, item_id: int) -> dict:
+    await cursor.execute(
+        """SELECT id, owner_id, price_per_hour, price_per_day, is_available FROM items WHERE id = %s""",
+        (item_id,)
+    )
+    item = await cursor.fetchone()
+    if not item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    if not item["is_available"]:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Item is not available for rent")
+    return item
+
+
+@router.get("/quote", response_model=BookingQuote)
+async def get_quote(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    item_id: int,
+    start: datetime,
+    end: datetime,
+):
+    conn, cursor = db
+    _check_period(start, end)
+    item = await _bookable_item(cursor, item_id)
+    hours, price = quote_price(start, end, item["price_per_hour"], item["price_per_day"])
+    return {"item_id": item_id, "hours": hours, "price": price}
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    start: datetime,
+    end: datetime,
+    item_ids: List[int] = Query(..., min_length=1, max_length=AVAILABILITY_MAX_ITEMS),
+):
+    conn, cursor = db
+    _check_period(start, end)
+    # One round trip for the whole set; each NOT EXISTS is a probe of the
+    # exclusion constraint's GiST index on (item_id, period).
+    await cursor.execute(
+        """SELECT i.id AS item_id,
+                  i.is_available AND NOT EXISTS (
+                      SELECT 1 FROM bookings b
+                      WHERE b.item_id = i.id AND b.status = 'confirmed' AND b.period && tstzrange(%s, %s)
+                  ) AS available
+           FROM items i
+           WHERE i.id = ANY(%s)
+           ORDER BY i.id""",
+        (start, end, item_ids)
+    )
+    return {"start": start, "end": end, "items": await cursor.fetchall()}
+
+@router.get("/items/{item_id}/calendar", response_model=List[BookedPeriod])
+async def get_item_calendar(
+    item_id: int,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    start: datetime,
+    end: datetime,
+):
+    conn, cursor = db
+    _check_period(start, end)
+    await cursor.execute(
+        """SELECT lower(period) AS start, upper(period) AS "end" FROM bookings
+           WHERE item_id = %s AND status = 'confirmed' AND period && tstzrange(%s, %s)
+           ORDER BY lower(period)""",
+        (item_id, start, end)
+    )
+    return await cursor.fetchall()
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=BookingResponse)
+async def create_booking(
+    booking: BookingCreate,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    item = await _bookable_item(cursor, booking.item_id)
+    if item["owner_id"] == current_user["id"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot book your own item")
+    hours, price = quote_price(booking.start, booking.end, item["price_per_hour"], item["price_per_day"])
+    # No availability pre-check: the bookings_no_overlap exclusion constraint
+    # rejects an overlapping insert atomically, even under concurrency.
+    try:
+        await cursor.execute(
+            """INSERT INTO bookings (item_id, renter_id, period, quoted_price)
+               VALUES (%s, %s, tstzrange(%s, %s), %s)
+               RETURNING id, item_id, renter_id, lower(period) AS start, upper(period) AS "end", status, quoted_price, created_at""",
+            (booking.item_id, current_user["id"], booking.start, booking.end, price)
+        )
+        new_booking = await cursor.fetchone()
+        await conn.commit()
+    except psycopg.errors.ExclusionViolation:
+        await conn.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Item is already booked for part of that period")
+    except psycopg.errors.ForeignKeyViolation as e:
+        # The item was deleted after _bookable_item found it.
+        await conn.rollback()
+        if e.diag.constraint_name != "bookings_item_id_fkey":
+            raise
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    return new_booking
+
+@router.get("/{id}", response_model=BookingResponse)
+async def get_booking(
+    id: int,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    await cursor.execute(
+        """SELECT b.id, b.item_id, b.renter_id, lower(b.period) AS start, upper(b.period) AS "end", b.status, b.quoted_price, b.created_at, i.owner_id
+           FROM bookings b JOIN items i ON i.id = b.item_id
+           WHERE b.id = %s""",
+        (id,)
+    )
+    booking = await cursor.fetchone()
+    if not booking or current_user["id"] not in (booking["renter_id"], booking["owner_id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Booking not found")
+    return booking
+
+@router.post("/{id}/cancel", response_model=BookingResponse)
+async def cancel_booking(
+    id: int,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    # Renter or item owner may cancel; the check and the write are one statement.
+    await cursor.execute(
+        """UPDATE bookings b SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+           FROM items i
+           WHERE b.id = %s AND i.id = b.item_id AND b.status = 'confirmed' AND %s IN (b.renter_id, i.owner_id)
+           RETURNING b.id, b.item_id, b.renter_id, lower(b.period) AS start, upper(b.period) AS "end", b.status, b.quoted_price, b.created_at""",
+        (id, current_user["id"])
+    )
+    cancelled = await cursor.fetchone()
+    await conn.commit()
+    if not cancelled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No confirmed booking to cancel")
+    return cancelled
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from core import database, geo
+from core.config import config
+
+router = APIRouter(prefix="/health", tags=["health"], include_in_schema=False)
+
+READY_TIMEOUT_SECONDS = float(config.get('READY_TIMEOUT_MS') or 1000) / 1000
+
+
+async def _database_ready() -> bool:
+    if database.pool is None:
+        return False
+    try:
+        async with database.pool.connection(timeout=READY_TIMEOUT_SECONDS) as conn:
+            await conn.execute("SELECT 1")
+        return True
+    except Exception:
+        return False
+
+
+# The process is up; restarting it will not help with anything below.
+@router.get("/live")
+def live():
+    return {"status": "ok"}
+
+# Whether to send traffic here: the database answers and the campus geo
+# index, if configured, has loaded. Startup does not wait for either.
+@router.get("/ready")
+async def ready():
+    checks = {
+        "database": await _database_ready(),
+        "campus_index": geo.campus_index is None or geo.campus_index.loaded,
+    }
+    ok = all(checks.values())
+    return JSONResponse(
+        {"status": "ready" if ok else "starting", "checks": checks},
+        status_code=status.HTTP_200_OK if ok else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,93 +1,435 @@
-from fastapi import APIRouter, Response, status, HTTPException, Depends
-from models.item import ItemCreate, ItemUpdate, ItemResponse
+from fastapi import APIRouter, Request, Response, status, HTTPException, Depends, Query, UploadFile, File, Body
+from models.item import (
+    ItemCreate, ItemUpdate, ItemResponse, ItemPage, ImageUploadResponse, ItemSearchPage,
+    ItemBulkUpdate, ItemBulkDelete, BulkItemResponse, BULK_MAX_ITEMS, ItemNearbyPage, ItemNearbyResult, ItemSearchResult,
+)
 from core.database import get_db
-from typing import List
+from core.cache import item_cache
+from core.pagination import decode_cursor, paginate
+from core.export import require_export_token, stream_ndjson
+from core.serialization import project, project_rows, respond
+from core.conditional import (
+    MODIFIED_US, PUBLIC_CACHE, check_if_match, not_modified, not_modified_response, row_etag,
+    table_etag, table_version, validators,
+)
+from core.cloudinary import upload_images
+from core.notifications import item_changed
+from core import database, geo
+from core.ratelimit import rate_limit
+from core.replicas import cache_ttl as replica_cache_ttl, read_connection, session_lsn
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Any, Dict
+from pydantic import ValidationError
 from typing import Annotated  # Use typing_extensions if Python < 3.9
 from .auth import get_current_user
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
 
-router = APIRouter(prefix="/v1/items", tags=["items"])
+router = APIRouter(prefix="/v1/items", tags=["items"], dependencies=[Depends(rate_limit("items"))])
 
-@router.get("/", response_model=List[ItemResponse])
-async def get_all_items(db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+# Keep this worker's campus geo index in step with its own writes.
+def _track_locations(rows: list):
+    if geo.campus_index is not None:
+        for row in rows:
+            geo.campus_index.track(row["id"], row["latitude"], row["longitude"])
+
+
+def _forget_locations(ids: list):
+    if geo.campus_index is not None:
+        for id in ids:
+            geo.campus_index.forget(id)
+
+
+# Filters shared by listing and search, returned as SQL conditions plus their values.
+def item_filters(
+    category: Optional[str] = None,
+    is_available: Optional[bool] = None,
+    location: Optional[str] = Query(None, description="Matches locations starting with this text"),
+    min_price_per_day: Optional[float] = Query(None, ge=0),
+    max_price_per_day: Optional[float] = Query(None, ge=0),
+) -> tuple[list, list]:
+    conditions = []
+    values = []
+    if category is not None:
+        conditions.append("category = %s")
+        values.append(category)
+    if is_available is not None:
+        conditions.append("is_available = %s")
+        values.append(is_available)
+    if location is not None:
+        conditions.append("location LIKE %s")
+        values.append(location.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if min_price_per_day is not None:
+        conditions.append("price_per_day >= %s")
+        values.append(min_price_per_day)
+    if max_price_per_day is not None:
+        conditions.append("price_per_day <= %s")
+        values.append(max_price_per_day)
+    return conditions, values
+
+
+@router.get("/", response_model=ItemPage)
+async def get_all_items(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None, alias="cursor"),
+    filters: tuple[list, list] = Depends(item_filters),
+):
+    conditions, values = filters
+    key = f"{limit}:{after}:{conditions}:{values}"
+    if after is not None:
+        conditions.append("(created_at, id) < (%s, %s)")
+        values.extend(decode_cursor(after))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    values.append(limit + 1)
+
+    # Every write that changes items bumps its table version, which answers
+    # conditional requests and retires all cached listing pages at once.
+    # Version and rows are read on one connection, so a page is never
+    # cached under a version newer than the server it came from.
+    async with read_connection(session_lsn(request)) as conn, conn.cursor() as cursor:
+        current = await table_version(cursor, "items")
+        etag = table_etag("items", current["version"])
+        headers = validators(etag, current["modified_us"], PUBLIC_CACHE)
+        if not_modified(request, etag, current["modified_us"]):
+            return not_modified_response(headers)
+
+        async def load():
+            await cursor.execute(
+                f"""SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at 
+                   FROM items {where}
+                   ORDER BY created_at DESC, id DESC
+                   LIMIT %s""",
+                tuple(values)
+            )
+            items, next_cursor = paginate(await cursor.fetchall(), limit)
+            return {"items": [project(ItemResponse, item) for item in items], "next_cursor": next_cursor}
+
+        page = await item_cache.get_or_load(f"items:list:{current['version']}:{key}", load)
+    response.headers.update(headers)
+    return respond(page, response)
+
+@router.get("/search", response_model=ItemSearchPage)
+async def search_items(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    filters: tuple[list, list] = Depends(item_filters),
+):
     conn, cursor = db
-    cursor.execute(
-        """SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at 
-           FROM items"""
+    conditions, values = filters
+    # Full-text matches come from the search_vector GIN index; the trigram
+    # word-similarity test on name catches typos the stemmer cannot.
+    where = " AND ".join(["(search_vector @@ websearch_to_tsquery('english', %s) OR %s <%% name)"] + conditions)
+    await cursor.execute(
+        f"""SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude,
+                  ts_rank(search_vector, websearch_to_tsquery('english', %s)) + word_similarity(%s, name) AS rank,
+                  ts_headline('english', name, websearch_to_tsquery('english', %s), 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true') AS name_highlight,
+                  ts_headline('english', coalesce(description, ''), websearch_to_tsquery('english', %s), 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2') AS description_highlight
+           FROM items
+           WHERE {where}
+           ORDER BY rank DESC, id DESC
+           LIMIT %s OFFSET %s""",
+        (q, q, q, q, q, q, *values, limit + 1, offset)
     )
-    items = cursor.fetchall()
-    return [{"message": "Items retrieved successfully", **item} for item in items]
+    items = await cursor.fetchall()
+    next_offset = offset + limit if len(items) > limit else None
+    return respond({"items": project_rows(ItemSearchResult, items[:limit]), "next_offset": next_offset})
 
-@router.get("/{id}", response_model=ItemResponse)
-async def get_item(id: int, db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+@router.get("/nearby", response_model=ItemNearbyPage)
+async def get_nearby_items(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2000, gt=0, le=50000, description="Search radius in metres"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    filters: tuple[list, list] = Depends(item_filters),
+):
     conn, cursor = db
-    cursor.execute(
-        """SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at 
-           FROM items WHERE id = %s""",
-        (str(id),)
+    conditions, values = filters
+
+    if geo.campus_index is not None and geo.campus_index.covers(lat, lng, radius):
+        # Hot campus: distances come from the in-memory index and the
+        # database only applies the filters to that candidate set.
+        distances = {id: distance for distance, id in geo.campus_index.index.nearby(lat, lng, radius)}
+        where = " AND ".join(["id = ANY(%s)"] + conditions)
+        await cursor.execute(
+            f"""SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude 
+               FROM items WHERE {where}""",
+            (list(distances), *values)
+        )
+        items = sorted(await cursor.fetchall(), key=lambda item: (distances[item["id"]], item["id"]))
+        items = items[offset:offset + limit + 1]
+        for item in items:
+            item["distance_m"] = distances[item["id"]]
+    else:
+        # earth_box is answered by the GiST index; earth_distance then trims
+        # the box's corners down to the circle.
+        where = " AND ".join([
+            "earth_box(ll_to_earth(%s, %s), %s) @> ll_to_earth(latitude, longitude)",
+            "earth_distance(ll_to_earth(%s, %s), ll_to_earth(latitude, longitude)) <= %s",
+        ] + conditions)
+        await cursor.execute(
+            f"""SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude,
+                      earth_distance(ll_to_earth(%s, %s), ll_to_earth(latitude, longitude)) AS distance_m
+               FROM items
+               WHERE {where}
+               ORDER BY distance_m, id
+               LIMIT %s OFFSET %s""",
+            (lat, lng, lat, lng, radius, lat, lng, radius, *values, limit + 1, offset)
+        )
+        items = await cursor.fetchall()
+    next_offset = offset + limit if len(items) > limit else None
+    return respond({"items": project_rows(ItemNearbyResult, items[:limit]), "next_offset": next_offset})
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(require_export_token)])
+async def export_items():
+    return StreamingResponse(
+        stream_ndjson(
+            """SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, owner_id, created_at, updated_at 
+               FROM items ORDER BY id"""
+        ),
+        media_type="application/x-ndjson",
     )
-    item = cursor.fetchone()
-    if not item:
+
+@router.get("/{id}", response_model=ItemResponse)
+async def get_item(id: int, request: Request, response: Response):
+    # A session that has just written reads past the cache, which a lagging
+    # replica may have refilled from before the write.
+    lsn = session_lsn(request)
+
+    # The connection is taken inside the loader, so concurrent misses on one
+    # key share a single checkout as well as a single query.
+    async def load():
+        async with read_connection(lsn) as conn, conn.cursor() as cursor:
+            await cursor.execute(
+                f"""SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at, {MODIFIED_US} AS modified_us 
+                   FROM items WHERE id = %s""",
+                (id,)
+            )
+            item = await cursor.fetchone()
+        return {"item": project(ItemResponse, item), "modified_us": item["modified_us"]} if item else None
+
+    if lsn is not None:
+        entry = await load()
+    else:
+        entry = await item_cache.get_or_load(f"item:{id}", load, ttl=replica_cache_ttl())
+    if not entry:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Required item not found")
-    return {"message": "Item retrieved successfully", **item}
+    headers = validators(row_etag(id, entry["modified_us"]), entry["modified_us"], PUBLIC_CACHE)
+    if not_modified(request, headers["ETag"], entry["modified_us"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return respond(entry["item"], response)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=ItemResponse)
-def add_item(
+async def add_item(
     item: ItemCreate,
-    db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)],
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
     current_user: dict = Depends(get_current_user),
 ):
     conn, cursor = db
-    cursor.execute(
-        """INSERT INTO items (name, description, price_per_hour, price_per_day, category, location, is_available, images, owner_id) 
-           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) 
-           RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at""",
-        (item.name, item.description, item.price_per_hour, item.price_per_day, item.category, item.location, item.is_available, item.images, current_user["id"])
+    await cursor.execute(
+        """INSERT INTO items (name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, owner_id) 
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
+           RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at""",
+        (item.name, item.description, item.price_per_hour, item.price_per_day, item.category, item.location, item.is_available, item.images, item.latitude, item.longitude, current_user["id"])
     )
-    new_item = cursor.fetchone()
-    conn.commit()
-    return {"message": "Item added successfully", **new_item}
+    new_item = await cursor.fetchone()
+    await item_changed(conn, "created", [new_item])
+    await conn.commit()
+    _track_locations([new_item])
+    return new_item
+
+@router.post("/images", status_code=status.HTTP_201_CREATED, response_model=ImageUploadResponse)
+async def upload_item_images(
+    images: List[UploadFile] = File(...),
+    background: bool = Query(True, description="Return the URLs before the uploads finish; a job worker stores them"),
+    current_user: dict = Depends(get_current_user),
+):
+    # Inline uploads talk to storage for seconds and need no connection.
+    # Queued ones only spool to local disk while holding one to enqueue on.
+    if not background:
+        return {"images": await upload_images(images)}
+    async with database.pool.connection() as conn:
+        urls = await upload_images(images, conn)
+    return {"images": urls}
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+
+
+# executemany(returning=True) pipelines the statements in one round trip and
+# keeps one result set per parameter row, in order.
+async def _fetch_each(cursor: psycopg.AsyncCursor) -> list:
+    rows = []
+    while True:
+        rows.append(await cursor.fetchone())
+        if not cursor.nextset():
+            return rows
+
+
+async def _owners(cursor: psycopg.AsyncCursor, ids: list) -> dict:
+    await cursor.execute("SELECT id, owner_id FROM items WHERE id = ANY(%s)", (ids,))
+    return {row["id"]: row["owner_id"] for row in await cursor.fetchall()}
+
+
+def _ownership_error(id: int, owners: dict, current_user: dict) -> Optional[dict]:
+    if id not in owners:
+        return {"status": status.HTTP_404_NOT_FOUND, "id": id, "error": "The item does not exist"}
+    if owners[id] != current_user["id"]:
+        return {"status": status.HTTP_403_FORBIDDEN, "id": id, "error": "Not authorized to modify this item"}
+    return None
+
+
+@router.post("/bulk", response_model=BulkItemResponse)
+async def add_items_bulk(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    items: List[Dict[str, Any]] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    results = [None] * len(items)
+    valid = []
+    for index, raw in enumerate(items):
+        try:
+            valid.append((index, ItemCreate.model_validate(raw)))
+        except ValidationError as e:
+            results[index] = {"index": index, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "error": _validation_error(e)}
+
+    if valid:
+        await cursor.executemany(
+            """INSERT INTO items (name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, owner_id) 
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
+               RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at""",
+            [(item.name, item.description, item.price_per_hour, item.price_per_day, item.category, item.location, item.is_available, item.images, item.latitude, item.longitude, current_user["id"]) for _, item in valid],
+            returning=True,
+        )
+        created = await _fetch_each(cursor)
+        await item_changed(conn, "created", created)
+        await conn.commit()
+        _track_locations(created)
+        for (index, _), row in zip(valid, created):
+            results[index] = {"index": index, "status": status.HTTP_201_CREATED, "id": row["id"], "item": row}
+    return {"results": results}
+
+@router.patch("/bulk", response_model=BulkItemResponse)
+async def update_items_bulk(
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    items: List[Dict[str, Any]] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    results = [None] * len(items)
+    valid = []
+    for index, raw in enumerate(items):
+        try:
+            valid.append((index, ItemBulkUpdate.model_validate(raw)))
+        except ValidationError as e:
+            results[index] = {"index": index, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "id": raw.get("id"), "error": _validation_error(e)}
+
+    owners = await _owners(cursor, [item.id for _, item in valid])
+    allowed = []
+    for index, item in valid:
+        error = _ownership_error(item.id, owners, current_user)
+        if error:
+            results[index] = {"index": index, **error}
+        else:
+            allowed.append((index, item))
+
+    if allowed:
+        # One statement shape for every row: a NULL parameter keeps the
+        # current value, matching how update_item skips unset fields.
+        await cursor.executemany(
+            """UPDATE items SET name = COALESCE(%s, name), description = COALESCE(%s, description),
+                      price_per_hour = COALESCE(%s, price_per_hour), price_per_day = COALESCE(%s, price_per_day),
+                      category = COALESCE(%s, category), location = COALESCE(%s, location),
+                      is_available = COALESCE(%s, is_available), images = COALESCE(%s, images),
+                      latitude = COALESCE(%s, latitude), longitude = COALESCE(%s, longitude),
+                      updated_at = CURRENT_TIMESTAMP
+               WHERE id = %s AND owner_id = %s
+               RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at""",
+            [(item.name, item.description, item.price_per_hour, item.price_per_day, item.category, item.location, item.is_available, item.images, item.latitude, item.longitude, item.id, current_user["id"]) for _, item in allowed],
+            returning=True,
+        )
+        updated = await _fetch_each(cursor)
+        await item_changed(conn, "updated", [row for row in updated if row is not None])
+        await conn.commit()
+        await item_cache.invalidate(*(f"item:{item.id}" for _, item in allowed))
+        _track_locations([row for row in updated if row is not None])
+        for (index, item), row in zip(allowed, updated):
+            if row is None:
+                # Deleted or handed over between the ownership check and the update.
+                results[index] = {"index": index, "status": status.HTTP_404_NOT_FOUND, "id": item.id, "error": "The item does not exist"}
+            else:
+                results[index] = {"index": index, "status": status.HTTP_200_OK, "id": row["id"], "item": row}
+    return {"results": results}
+
+@router.delete("/bulk", response_model=BulkItemResponse)
+async def delete_items_bulk(
+    body: ItemBulkDelete,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    results = [None] * len(body.ids)
+    owners = await _owners(cursor, body.ids)
+    allowed = []
+    for index, id in enumerate(body.ids):
+        error = _ownership_error(id, owners, current_user)
+        if error:
+            results[index] = {"index": index, **error}
+        else:
+            allowed.append((index, id))
+
+    if allowed:
+        await cursor.execute(
+            """DELETE FROM items WHERE id = ANY(%s) AND owner_id = %s 
+               RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at""",
+            ([id for _, id in allowed], current_user["id"])
+        )
+        deleted = {row["id"]: row for row in await cursor.fetchall()}
+        await item_changed(conn, "deleted", list(deleted.values()))
+        await conn.commit()
+        await item_cache.invalidate(*(f"item:{id}" for _, id in allowed))
+        _forget_locations(list(deleted))
+        for index, id in allowed:
+            if id in deleted:
+                results[index] = {"index": index, "status": status.HTTP_200_OK, "id": id, "item": deleted[id]}
+            else:
+                results[index] = {"index": index, "status": status.HTTP_404_NOT_FOUND, "id": id, "error": "The item does not exist"}
+    return {"results": results}
 
 @router.delete("/{id}", response_model=ItemResponse)
 async def delete_item(
     id: int,
-    db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)],
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
     current_user: dict = Depends(get_current_user)
 ):
     conn, cursor = db
-    cursor.execute("SELECT owner_id FROM items WHERE id = %s", (str(id),))
-    item = cursor.fetchone()
+    await cursor.execute("SELECT owner_id FROM items WHERE id = %s", (str(id),))
+    item = await cursor.fetchone()
     if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The item does not exist")
     if item["owner_id"] != current_user["id"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this item")
     
-    cursor.execute(
+    await cursor.execute(
         """DELETE FROM items WHERE id = %s 
-           RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at""",
+           RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at""",
         (str(id),)
     )
-    deleted_item = cursor.fetchone()
-    conn.commit()
-    return {"message": "Item deleted successfully", **deleted_item}
+    deleted_item = await cursor.fetchone()
+    await item_changed(conn, "deleted", [deleted_item])
+    await conn.commit()
+    await item_cache.invalidate(f"item:{id}")
+    _forget_locations([id])
+    return deleted_item
 
-@router.put("/{id}", response_model=ItemResponse)
-async def update_item(
-    id: int,
-    item: ItemUpdate,
-    db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)],
-    current_user: dict = Depends(get_current_user),
-):
-    conn, cursor = db
-    cursor.execute("SELECT owner_id FROM items WHERE id = %s", (str(id),))
-    existing_item = cursor.fetchone()
-    if not existing_item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item to update doesn't exist")
-    if existing_item["owner_id"] != current_user["id"]:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this item")
-    
+def _update_assignments(item: ItemUpdate) -> tuple[list, list]:
     update_fields = []
     update_values = []
     if item.name is not None:
@@ -114,23 +456,67 @@ async def update_item(
     if item.images is not None:
         update_fields.append("images = %s")
         update_values.append(item.images)
+    if item.latitude is not None:
+        update_fields.append("latitude = %s")
+        update_values.append(item.latitude)
+    if item.longitude is not None:
+        update_fields.append("longitude = %s")
+        update_values.append(item.longitude)
     update_fields.append("updated_at = CURRENT_TIMESTAMP")
+    return update_fields, update_values
+
+@router.put("/{id}", response_model=ItemResponse)
+async def update_item(
+    id: int,
+    item: ItemUpdate,
+    request: Request,
+    response: Response,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+):
+    conn, cursor = db
+    await cursor.execute(f"SELECT owner_id, {MODIFIED_US} AS modified_us FROM items WHERE id = %s", (str(id),))
+    existing_item = await cursor.fetchone()
+    if not existing_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item to update doesn't exist")
+    if existing_item["owner_id"] != current_user["id"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this item")
+    if_match = check_if_match(request, row_etag(id, existing_item["modified_us"]))
+    
+    update_fields, update_values = _update_assignments(item)
 
     if not update_fields:
-        cursor.execute(
-            """SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at 
+        await cursor.execute(
+            """SELECT id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at 
                FROM items WHERE id = %s""",
             (str(id),)
         )
-        item_data = cursor.fetchone()
-        return {"message": "No fields provided for update", **item_data}
+        item_data = await cursor.fetchone()
+        return item_data
 
-    update_query = f"""UPDATE items SET {', '.join(update_fields)} 
-                      WHERE id = %s 
-                      RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, created_at, updated_at"""
     update_values.append(id)
+    # With If-Match the update only applies to the version that was checked,
+    # so a write landing in between turns into a 412 rather than being lost.
+    guard = ""
+    if if_match is not None:
+        guard = f" AND {MODIFIED_US} = %s"
+        update_values.append(existing_item["modified_us"])
+    update_query = f"""UPDATE items SET {', '.join(update_fields)} 
+                      WHERE id = %s{guard} 
+                      RETURNING id, name, description, price_per_hour, price_per_day, category, location, is_available, images, latitude, longitude, created_at, updated_at, {MODIFIED_US} AS modified_us"""
 
-    cursor.execute(update_query, tuple(update_values))
-    updated_item = cursor.fetchone()
-    conn.commit()
-    return {"message": "Item updated successfully", **updated_item}
\ No newline at end of file
+    await cursor.execute(update_query, tuple(update_values))
+    updated_item = await cursor.fetchone()
+    if updated_item is None:
+        # Deleted since the ownership check, or (only with If-Match) changed.
+        gone = if_match is None or await (await cursor.execute("SELECT 1 FROM items WHERE id = %s", (id,))).fetchone() is None
+        await conn.rollback()
+        if gone:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item to update doesn't exist")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="The resource has changed since it was fetched")
+    await item_changed(conn, "updated", [updated_item])
+    await conn.commit()
+    await item_cache.invalidate(f"item:{id}")
+    _track_locations([updated_item])
+    response.headers["ETag"] = row_etag(id, updated_item["modified_us"])
+    return updated_item
\ No newline at end of file
@@ -1,71 +1,127 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from models.user import UserCreate, UserResponse, CollegeIdInput, UserUpdate
-from psycopg2.extras import RealDictCursor
-import psycopg2
-from passlib.context import CryptContext
+from fastapi import APIRouter, Depends, Request, Response, status, HTTPException, Query
+from models.user import UserCreate, UserResponse, CollegeIdInput, UserUpdate, UserPage
+import psycopg
+from core.security import password_hasher
 from datetime import datetime
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from core.database import get_db
+from core.pagination import decode_cursor, paginate
+from core.export import require_export_token, stream_ndjson
+from core.serialization import project, project_rows, respond
+from core.conditional import (
+    MODIFIED_US, PRIVATE_CACHE, is_conditional, not_modified, not_modified_response, row_etag, table_etag, table_version,
+    validators,
+)
+from core.ratelimit import rate_limit
+from core.replicas import get_read_db
+from fastapi.responses import StreamingResponse
 from .auth import get_current_user
 from core.cloudinary import handle_upload
 
-router = APIRouter(prefix="/v1/users", tags=["users"])
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+router = APIRouter(prefix="/v1/users", tags=["users"], dependencies=[Depends(rate_limit("users"))])
 
 @router.post("/register", status_code=status.HTTP_201_CREATED, response_model=UserResponse)
-def create_user(user: UserCreate, db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+async def create_user(user: UserCreate, db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)]):
     conn, cursor = db
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     try:
-        cursor.execute(
+        await cursor.execute(
             """INSERT INTO users (email, password, first_name, last_name, phone_number, role) 
             VALUES (%s, %s, %s, %s, %s, %s) RETURNING id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active""",
             (user.email, hashed_password, user.first_name, user.last_name, user.phone_number, user.role)
         )
-        new_user = cursor.fetchone()
-        conn.commit()
+        new_user = await cursor.fetchone()
+        await conn.commit()
         return new_user  
-    except psycopg2.IntegrityError:
-        conn.rollback()
+    except psycopg.IntegrityError:
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
 
-@router.get("/", response_model=List[UserResponse])
-def get_all_users(db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+@router.get("/", response_model=UserPage)
+async def get_all_users(
+    request: Request,
+    response: Response,
+    db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_read_db)],
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None, alias="cursor"),
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+):
     conn, cursor = db
-    cursor.execute("""SELECT id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active FROM users""")
-    users = cursor.fetchall()
-    return users  
+    current = await table_version(cursor, "users")
+    headers = validators(table_etag("users", current["version"]), current["modified_us"], PRIVATE_CACHE)
+    if not_modified(request, headers["ETag"], current["modified_us"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    conditions = []
+    values = []
+    if role is not None:
+        conditions.append("role = %s")
+        values.append(role)
+    if is_active is not None:
+        conditions.append("is_active = %s")
+        values.append(is_active)
+    if after is not None:
+        conditions.append("(created_at, id) < (%s, %s)")
+        values.extend(decode_cursor(after))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    values.append(limit + 1)
+
+    await cursor.execute(
+        f"""SELECT id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active FROM users {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s""",
+        tuple(values)
+    )
+    users, next_cursor = paginate(await cursor.fetchall(), limit)
+    return respond({"users": project_rows(UserResponse, users), "next_cursor": next_cursor}, response)
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(require_export_token)])
+async def export_users():
+    return StreamingResponse(
+        stream_ndjson(
+            """SELECT id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active 
+               FROM users ORDER BY id"""
+        ),
+        media_type="application/x-ndjson",
+    )
 
 @router.get("/{id}", response_model=UserResponse)
-def get_user(id: int, db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+async def get_user(id: int, request: Request, response: Response, db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_read_db)]):
     conn, cursor = db
-    cursor.execute(
-        """SELECT id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active FROM users WHERE id = %s""",
+    if is_conditional(request):
+        await cursor.execute(f"SELECT {MODIFIED_US} AS modified_us FROM users WHERE id = %s", (id,))
+        probe = await cursor.fetchone()
+        if probe is not None:
+            headers = validators(row_etag(id, probe["modified_us"]), probe["modified_us"], PRIVATE_CACHE)
+            if not_modified(request, headers["ETag"], probe["modified_us"]):
+                return not_modified_response(headers)
+    await cursor.execute(
+        f"""SELECT id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active, {MODIFIED_US} AS modified_us FROM users WHERE id = %s""",
         (str(id),)
     )
-    user = cursor.fetchone()
+    user = await cursor.fetchone()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user
+    response.headers.update(validators(row_etag(id, user["modified_us"]), user["modified_us"], PRIVATE_CACHE))
+    return respond(project(UserResponse, user), response)
 
 @router.post("/{id}/college-id", status_code=status.HTTP_200_OK, response_model=UserResponse)
-async def set_college_id(id: int, input: CollegeIdInput, db: Annotated[tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor], Depends(get_db)]):
+async def set_college_id(id: int, input: CollegeIdInput, db: Annotated[tuple[psycopg.AsyncConnection, psycopg.AsyncCursor], Depends(get_db)]):
     conn, cursor = db
     valid_extensions = {'.jpg', '.jpeg', '.png', '.gif'}
     url = str(input.college_id_url)
     if not any(url.lower().endswith(ext) for ext in valid_extensions):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="URL must point to an image (.jpg, .jpeg, .png, .gif)")
     
-    cursor.execute(
+    await cursor.execute(
         """UPDATE users SET college_id_url = %s, updated_at = CURRENT_TIMESTAMP 
             WHERE id = %s 
             RETURNING id, email, first_name, last_name, phone_number, college_id_url, role, created_at, updated_at, is_active""",
         (url, id)
     )
-    updated_user = cursor.fetchone()
-    conn.commit()
+    updated_user = await cursor.fetchone()
+    await conn.commit()
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
@@ -73,7 +129,7 @@ async def set_college_id(id: int, input: CollegeIdInput, db: Annotated[tuple[psy
 
 
 @router.put("/update", response_model=UserResponse)
-def update_user(user: UserUpdate, current_user=Depends(get_current_user), db=Depends(get_db)):
+async def update_user(user: UserUpdate, current_user=Depends(get_current_user), db=Depends(get_db)):
     conn, cursor = db
     id = current_user["id"]
     update_fields = []
@@ -92,7 +148,7 @@ def update_user(user: UserUpdate, current_user=Depends(get_current_user), db=Dep
         update_values.append(user.phone_number)
     if user.password is not None:
         update_fields.append("password = %s")
-        update_values.append(pwd_context.hash(user.password))
+        update_values.append(await password_hasher.hash(user.password))
     if user.is_active is not None:
         update_fields.append("is_active = %s")
         update_values.append(user.is_active)
@@ -102,24 +158,24 @@ def update_user(user: UserUpdate, current_user=Depends(get_current_user), db=Dep
     update_fields.append("updated_at = CURRENT_TIMESTAMP")
 
     if not update_fields:
-        cursor.execute(
+        await cursor.execute(
             """SELECT id, name, email, phone_number, is_active, created_at, updated_at 
             FROM users WHERE id = %s""",
             (str(id),)
         )
-        user_data = cursor.fetchone()
+        user_data = await cursor.fetchone()
         if not user_data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User to update doesn't exist")
-        return {"message": "No fields provided for update", **user_data}
+        return user_data
 
     update_query = f"""UPDATE users SET {', '.join(update_fields)} 
                     WHERE id = %s 
                     RETURNING id, first_name, last_name, email, phone_number, role, is_active, created_at, updated_at"""
     update_values.append(id)
 
-    cursor.execute(update_query, tuple(update_values))
-    updated_user = cursor.fetchone()
-    conn.commit()
+    await cursor.execute(update_query, tuple(update_values))
+    updated_user = await cursor.fetchone()
+    await conn.commit()
     if updated_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User to update doesn't exist")
-    return {"message": "User updated successfully", **updated_user}
\ No newline at end of file
+    return updated_user
\ No newline at end of file
@@ -1,15 +1,82 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
 from app.api.item import router as items_router
 from app.api.user import router as users_router
 from app.api.auth import router as auth_router
+from app.api.booking import router as bookings_router
+from app.api.health import router as health_router
+from core.database import open_pool, close_pool, pool_metrics
+from core import replicas
+from core.cache import cache_metrics
+from core import metrics
+from core.security import password_hasher
+from core.tokens import get_keyring, token_cache
+from core.storage import LocalStorage, get_storage
+from core.serialization import LEAN_RESPONSES, LeanJSONResponse
+from core import images, geo
+from core.config import config
 
-app = FastAPI(title="Lendit")
 
-# Include routers
-app.include_router(items_router)
-app.include_router(users_router)
-app.include_router(auth_router)
+# Only cheap, fail-fast work happens before the app serves: the signing keys
+# are loaded, but database connections and the campus index come up in the
+# background and /health/ready reports when they have.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_keyring()
+    await open_pool(wait=False)
+    await replicas.open_replicas()
+    refresh = None
+    if geo.campus_index is not None:
+        refresh = asyncio.create_task(geo.campus_index.refresh_forever(float(config.get('GEO_INDEX_REFRESH') or 60)))
+    yield
+    if refresh is not None:
+        refresh.cancel()
+    await replicas.close_replicas()
+    await close_pool()
+    password_hasher.shutdown()
+    images.shutdown()
 
-@app.get("/")
-def root():
-    return {"message": "Welcome to Lendit"}
\ No newline at end of file
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Lendit", lifespan=lifespan, default_response_class=LeanJSONResponse if LEAN_RESPONSES else JSONResponse)
+
+    if replicas.REPLICA_HOSTS:
+        app.add_middleware(replicas.ReadYourWritesMiddleware)
+
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+        metrics.register_components({
+            "db_pool": pool_metrics,
+            "db_replicas": replicas.replica_metrics,
+            "cache": cache_metrics,
+            "password_hasher": password_hasher.metrics,
+            "token_cache": lambda: {"hits": token_cache.hits, "misses": token_cache.misses},
+        })
+
+        @app.get("/metrics", include_in_schema=False)
+        def get_metrics():
+            body, content_type = metrics.render()
+            return Response(body, media_type=content_type)
+
+    # Include routers
+    app.include_router(items_router)
+    app.include_router(users_router)
+    app.include_router(auth_router)
+    app.include_router(bookings_router)
+    app.include_router(health_router)
+
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        app.mount(storage.base_url, StaticFiles(directory=storage.root), name="media")
+
+    @app.get("/")
+    def root():
+        return {"message": "Welcome to Lendit"}
+
+    return app
+
+
+app = create_app()
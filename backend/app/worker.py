@@ -0,0 +1,62 @@
+# Background job worker.
+#
+#   python -m app.worker --processes 4 --concurrency 8 --metrics-port 9100
+#
+# Each process claims jobs independently, so throughput scales by adding
+# processes here or on other hosts against the same database. Queued uploads
+# are staged in the database, so any worker can store them; with
+# STORAGE_BACKEND=local, though, workers must write to the LOCAL_STORAGE_DIR
+# the API serves. SIGTERM stops claiming and waits for the jobs in hand to
+# finish.
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+from prometheus_client import start_http_server
+from core import database, images, jobs
+# Imported for the job handlers they register.
+from core import cloudinary, notifications
+
+
+async def run(concurrency: int, kinds: list):
+    await database.open_pool()
+    worker = jobs.Worker(concurrency=concurrency, kinds=kinds)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await database.close_pool()
+        images.shutdown()
+
+
+def start(concurrency: int, kinds: list, metrics_port: int = None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    if metrics_port:
+        start_http_server(metrics_port)
+    asyncio.run(run(concurrency, kinds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs from the jobs table")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs run at once by each process")
+    parser.add_argument("--kinds", nargs="*", help="only run these job kinds (default: all known)")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics from the first process on this port")
+    args = parser.parse_args()
+    if args.processes == 1:
+        start(args.concurrency, args.kinds, args.metrics_port)
+    else:
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=start, args=(args.concurrency, args.kinds, args.metrics_port if i == 0 else None))
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        # Children get the terminal's SIGINT themselves; pass on SIGTERM.
+        signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+        for process in processes:
+            process.join()
@@ -0,0 +1,100 @@
+# Thousands of concurrent, mostly overlapping POST /v1/bookings/ requests.
+#
+#   python -m benchmarks.bookings --items 20 --requests 5000 --concurrency 64
+#
+# Every request books a random 1-6 hour slot on one of a few items inside a
+# two-day window, so most of them collide. Afterwards the bookings table is
+# checked for overlapping confirmed periods; there must be none. Runs in a
+# disposable database (see benchmarks.common).
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import BENCH_EMAIL, app_client, disposable_database, percentiles, seed_items
+from app.api.auth import create_access_token
+from core import database
+
+RENTER_EMAIL = "bench-renter@example.com"
+
+
+async def prepare(conn, items: int) -> tuple[list, int]:
+    await seed_items(conn, items, batch=items)
+    item_ids = [row["id"] for row in await (await conn.execute(
+        """SELECT id FROM items WHERE owner_id = (SELECT id FROM users WHERE email = %s)
+           ORDER BY id DESC LIMIT %s""",
+        (BENCH_EMAIL, items)
+    )).fetchall()]
+    await conn.execute("UPDATE items SET is_available = true WHERE id = ANY(%s)", (item_ids,))
+    renter = await (await conn.execute(
+        """INSERT INTO users (email, password, first_name, role) VALUES (%s, 'x', 'Bench', 'renter')
+           ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email RETURNING id""",
+        (RENTER_EMAIL,)
+    )).fetchone()
+    await conn.commit()
+    return item_ids, renter["id"]
+
+
+async def overlapping(conn, item_ids: list) -> int:
+    row = await (await conn.execute(
+        """SELECT count(*) AS conflicts FROM bookings a JOIN bookings b
+             ON a.item_id = b.item_id AND a.id < b.id AND a.period && b.period
+           WHERE a.status = 'confirmed' AND b.status = 'confirmed' AND a.item_id = ANY(%s)""",
+        (item_ids,)
+    )).fetchone()
+    return row["conflicts"]
+
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    window = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=30)
+    samples, statuses = [], Counter()
+    async with disposable_database(template=args.template, keep=args.keep_database), app_client() as client:
+        async with database.pool.connection() as conn:
+            item_ids, renter_id = await prepare(conn, args.items)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(renter_id), 'email': RENTER_EMAIL})}"}
+        requests = []
+        for _ in range(args.requests):
+            start = window + timedelta(hours=rng.randrange(48))
+            requests.append({
+                "item_id": rng.choice(item_ids),
+                "start": start.isoformat(),
+                "end": (start + timedelta(hours=rng.randint(1, 6))).isoformat(),
+            })
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def run(body):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/v1/bookings/", json=body, headers=headers)
+                samples.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run(body) for body in requests))
+        elapsed = time.perf_counter() - started
+        async with database.pool.connection() as conn:
+            conflicts = await overlapping(conn, item_ids)
+    result = {
+        "endpoint": "POST /v1/bookings/",
+        "throughput_rps": len(samples) / elapsed,
+        "statuses": dict(statuses),
+        "overlapping_bookings": conflicts,
+        **percentiles(samples),
+    }
+    print(json.dumps(result, indent=2))
+    if conflicts or set(statuses) - {201, 409}:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Race overlapping reservations against POST /v1/bookings/")
+    parser.add_argument("--items", type=int, default=20, help="number of fresh items to book against")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--template", help="clone this database instead of running migrations")
+    parser.add_argument("--keep-database", action="store_true")
+    asyncio.run(main(parser.parse_args()))
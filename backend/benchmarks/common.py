@@ -0,0 +1,126 @@
+import secrets
+import statistics
+from contextlib import asynccontextmanager
+import httpx
+import psycopg
+from psycopg import sql
+from core import database, migrations, replicas
+from core.config import config
+
+CATEGORIES = ["Electronics", "Books", "Appliances", "Sports", "Furniture", "Clothing", "Stationery", "Tools"]
+NOUNS = ["kettle", "calculator", "bicycle", "textbook", "lamp", "guitar", "projector", "drill", "tent", "blender",
+         "camera", "helmet", "racket", "chair", "jacket", "speaker", "monitor", "iron", "heater", "backpack"]
+ADJECTIVES = ["electric", "portable", "vintage", "compact", "wireless", "heavy", "foldable", "digital", "classic", "mini"]
+BENCH_EMAIL = "bench-owner@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+    def at(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+    }
+
+
+async def ensure_owner(conn: psycopg.AsyncConnection) -> int:
+    row = await (await conn.execute(
+        """INSERT INTO users (email, password, first_name, role) VALUES (%s, 'x', 'Bench', 'lender')
+           ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email RETURNING id""",
+        (BENCH_EMAIL,)
+    )).fetchone()
+    return row["id"]
+
+
+# bench-user-<n>@example.com, all sharing one password hash so seeding does
+# not pay for a bcrypt round per user.
+async def seed_users(conn: psycopg.AsyncConnection, count: int, password_hash: str) -> list:
+    rows = await (await conn.execute(
+        """INSERT INTO users (email, password, first_name, last_name, role, created_at)
+           SELECT 'bench-user-' || g || '@example.com', %s, 'Bench', 'User ' || g,
+                  CASE WHEN g %% 3 = 0 THEN 'lender' ELSE 'renter' END,
+                  now() - (g || ' seconds')::interval
+           FROM generate_series(1, %s::int) AS g
+           ON CONFLICT (email) DO UPDATE SET password = EXCLUDED.password
+           RETURNING id""",
+        (password_hash, count)
+    )).fetchall()
+    await conn.execute("ANALYZE users")
+    await conn.commit()
+    return [row["id"] for row in rows]
+
+
+# Synthetic catalogue generated server-side so seeding 1M rows takes seconds,
+# not a million round trips. Items go round-robin to owner_ids, or all to the
+# bench owner.
+async def seed_items(conn: psycopg.AsyncConnection, count: int, batch: int = 100000, owner_ids: list = None):
+    owner_ids = owner_ids or [await ensure_owner(conn)]
+    for start in range(0, count, batch):
+        await conn.execute(
+            """INSERT INTO items (name, description, price_per_hour, price_per_day, category, location, is_available, owner_id, created_at)
+               SELECT initcap(adj.v || ' ' || noun.v) || ' #' || g,
+                      'A ' || adj.v || ' ' || noun.v || ' in good condition, lightly used, pickup from ' || 'Hostel ' || chr(65 + g %% 8),
+                      round((1 + random() * 9)::numeric, 2),
+                      round((5 + random() * 45)::numeric, 2),
+                      (%s::text[])[1 + g %% %s],
+                      'Hostel ' || chr(65 + g %% 8) || ', Room ' || (100 + g %% 300),
+                      random() > 0.2,
+                      (%s::int[])[1 + g %% %s],
+                      now() - (g || ' seconds')::interval
+               FROM generate_series(%s::int, %s::int) AS g
+               CROSS JOIN LATERAL (SELECT (%s::text[])[1 + (g * 7) %% %s] AS v) AS adj
+               CROSS JOIN LATERAL (SELECT (%s::text[])[1 + (g * 13) %% %s] AS v) AS noun""",
+            (CATEGORIES, len(CATEGORIES), owner_ids, len(owner_ids), start, min(start + batch, count) - 1,
+             ADJECTIVES, len(ADJECTIVES), NOUNS, len(NOUNS))
+        )
+        await conn.commit()
+    await conn.execute("ANALYZE items")
+    await conn.commit()
+
+
+# A throwaway database, built from migrations/ (or cloned from template),
+# that the app is pointed at until the block exits. Needs a role allowed to
+# CREATE DATABASE.
+@asynccontextmanager
+async def disposable_database(template: str = None, keep: bool = False):
+    name = f"lendit_bench_{secrets.token_hex(4)}"
+    async with await psycopg.AsyncConnection.connect(database.conninfo("postgres"), autocommit=True) as admin:
+        if template:
+            await admin.execute(sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(sql.Identifier(name), sql.Identifier(template)))
+        else:
+            await admin.execute(sql.SQL("CREATE DATABASE {} TEMPLATE template0 ENCODING 'UTF8'").format(sql.Identifier(name)))
+    try:
+        if not template:
+            async with await psycopg.AsyncConnection.connect(database.conninfo(name), autocommit=True) as conn:
+                await migrations.apply(conn)
+        previous, config['DATABASE'] = config['DATABASE'], name
+        try:
+            yield name
+        finally:
+            config['DATABASE'] = previous
+    finally:
+        if not keep:
+            async with await psycopg.AsyncConnection.connect(database.conninfo("postgres"), autocommit=True) as admin:
+                await admin.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(name)))
+
+
+# In-process client against the real app and database pool. Every request
+# comes from the same address, so rate limiting is off unless asked for.
+@asynccontextmanager
+async def app_client(rate_limited: bool = False):
+    from app.main import app
+    from core.ratelimit import limiter
+    limiter.enabled = rate_limited
+    await database.open_pool()
+    await replicas.open_replicas()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            yield client
+    finally:
+        await replicas.close_replicas()
+        await database.close_pool()
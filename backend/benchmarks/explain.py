@@ -0,0 +1,192 @@
+# Checks that every query the routers send is answered from an index.
+#
+#   python -m benchmarks.explain --users 20000 --items 100000
+#
+# Seeds a disposable database, calls each endpoint once through the app
+# while recording the statements it runs, then EXPLAINs every statement
+# with the parameters it was sent and fails if any plan sequentially scans
+# a table estimated at --min-rows or more. Exports read whole tables through
+# server-side cursors by design and are not checked; neither is PUT
+# /v1/users/update, which fails on UserUpdate before it reaches the database.
+import argparse
+import asyncio
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import BENCH_PASSWORD, CATEGORIES, disposable_database, app_client, seed_items, seed_users
+from app.api.auth import create_access_token
+from core import database
+from core.metrics import SQL_OPERATIONS, TracedCursor
+from core.security import password_hasher
+
+endpoint: ContextVar[str] = ContextVar("explain_endpoint", default=None)
+# (endpoint, query) -> params of the first call
+recorded: dict = {}
+
+
+class RecordingCursor(TracedCursor):
+    def _record(self, query, params):
+        label = endpoint.get()
+        if label is not None and not isinstance(query, str):
+            query = query.as_string(self.connection)
+        if label is not None and query.lstrip().upper().startswith(SQL_OPERATIONS):
+            recorded.setdefault((label, query), params)
+
+    async def execute(self, query, params=None, **kwargs):
+        self._record(query, params)
+        return await super().execute(query, params, **kwargs)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        params_seq = list(params_seq)
+        self._record(query, params_seq[0] if params_seq else None)
+        return await super().executemany(query, params_seq, **kwargs)
+
+
+async def prepare(args) -> dict:
+    async with database.pool.connection() as conn:
+        password_hash = await password_hasher.hash(BENCH_PASSWORD)
+        user_ids = await seed_users(conn, args.users, password_hash)
+        await seed_items(conn, args.items, owner_ids=user_ids)
+        owner, renter = await (await conn.execute(
+            "SELECT id, email FROM users WHERE id = ANY(%s) ORDER BY id LIMIT 2", (user_ids,)
+        )).fetchall()
+        owned = [row["id"] for row in await (await conn.execute(
+            "SELECT id FROM items WHERE owner_id = %s ORDER BY id", (owner["id"],)
+        )).fetchall()]
+        # One confirmed booking on most items, so the bookings table is large too.
+        await conn.execute(
+            """INSERT INTO bookings (item_id, renter_id, period, quoted_price)
+               SELECT id, %s, tstzrange(now() + interval '400 days', now() + interval '401 days'), coalesce(price_per_day, 0)
+               FROM items WHERE owner_id <> %s""",
+            (renter["id"], renter["id"])
+        )
+        booking = await (await conn.execute(
+            "SELECT b.id FROM bookings b JOIN items i ON i.id = b.item_id WHERE i.owner_id = %s LIMIT 1", (owner["id"],)
+        )).fetchone()
+        await conn.execute("UPDATE items SET is_available = true WHERE id = ANY(%s)", (owned,))
+        await conn.execute("ANALYZE")
+        await conn.commit()
+    return {"owner": owner, "renter": renter, "owned": owned, "booking": booking["id"]}
+
+
+def auth(user: dict) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user['id']), 'email': user['email']})}"}
+
+
+async def drive(client, seeded: dict):
+    owner, renter, owned = seeded["owner"], seeded["renter"], seeded["owned"]
+    item = owned[0]
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=60)
+    period = {"start": start.isoformat(), "end": (start + timedelta(hours=3)).isoformat()}
+
+    async def call(label: str, method: str, url: str, **kwargs):
+        token = endpoint.set(label)
+        try:
+            response = await client.request(method, url, **kwargs)
+        finally:
+            endpoint.reset(token)
+        if response.status_code >= 400:
+            raise SystemExit(f"{label} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    page = await call("GET /v1/items/", "GET", "/v1/items/", params={"limit": 20})
+    await call("GET /v1/items/", "GET", "/v1/items/", params={"limit": 20, "cursor": page.json()["next_cursor"]})
+    await call("GET /v1/items/", "GET", "/v1/items/", params={"category": CATEGORIES[0]})
+    await call("GET /v1/items/", "GET", "/v1/items/", params={"category": CATEGORIES[1], "is_available": True})
+    await call("GET /v1/items/", "GET", "/v1/items/", params={"location": "Hostel C"})
+    await call("GET /v1/items/", "GET", "/v1/items/", params={"min_price_per_day": 10, "max_price_per_day": 12})
+    await call("GET /v1/items/search", "GET", "/v1/items/search", params={"q": "portable kettle"})
+    await call("GET /v1/items/search", "GET", "/v1/items/search", params={"q": "kettel", "category": CATEGORIES[2]})
+    await call("GET /v1/items/nearby", "GET", "/v1/items/nearby", params={"lat": 12.97, "lng": 77.59, "radius": 2000})
+    detail = await call("GET /v1/items/{id}", "GET", f"/v1/items/{item}")
+
+    await call("GET /v1/users/", "GET", "/v1/users/", params={"limit": 20})
+    page = await call("GET /v1/users/", "GET", "/v1/users/", params={"role": "lender"})
+    await call("GET /v1/users/", "GET", "/v1/users/", params={"role": "lender", "cursor": page.json()["next_cursor"]})
+    await call("GET /v1/users/", "GET", "/v1/users/", params={"is_active": True})
+    await call("GET /v1/users/{id}", "GET", f"/v1/users/{owner['id']}")
+    await call("POST /v1/auth/login", "POST", "/v1/auth/login", data={"username": owner["email"], "password": BENCH_PASSWORD})
+    await call("POST /v1/users/register", "POST", "/v1/users/register", json={
+        "email": "explain-new@example.com", "password": BENCH_PASSWORD, "first_name": "Explain", "role": "renter",
+    })
+    await call("POST /v1/users/{id}/college-id", "POST", f"/v1/users/{owner['id']}/college-id",
+               json={"college_id_url": "https://example.com/college_id/explain.jpg"})
+
+    await call("GET /v1/bookings/quote", "GET", "/v1/bookings/quote", params={"item_id": item, **period})
+    await call("GET /v1/bookings/availability", "GET", "/v1/bookings/availability",
+               params={"item_ids": owned[:10], **period})
+    await call("GET /v1/bookings/items/{item_id}/calendar", "GET", f"/v1/bookings/items/{item}/calendar", params=period)
+    booking = await call("POST /v1/bookings/", "POST", "/v1/bookings/", headers=auth(renter), json={"item_id": item, **period})
+    await call("GET /v1/bookings/{id}", "GET", f"/v1/bookings/{seeded['booking']}", headers=auth(owner))
+    await call("POST /v1/bookings/{id}/cancel", "POST", f"/v1/bookings/{booking.json()['id']}/cancel", headers=auth(renter))
+
+    created = await call("POST /v1/items/", "POST", "/v1/items/", headers=auth(owner), json={
+        "name": "Explain kettle", "price_per_day": 5, "category": CATEGORIES[0], "location": "Hostel A, Room 101",
+    })
+    await call("PUT /v1/items/{id}", "PUT", f"/v1/items/{item}", headers={**auth(owner), "If-Match": detail.headers["ETag"]},
+               json={"price_per_day": 8})
+    await call("PUT /v1/items/{id}", "PUT", f"/v1/items/{item}", headers=auth(owner), json={"price_per_day": 7})
+    await call("DELETE /v1/items/{id}", "DELETE", f"/v1/items/{created.json()['id']}", headers=auth(owner))
+    bulk = await call("POST /v1/items/bulk", "POST", "/v1/items/bulk", headers=auth(owner), json=[
+        {"name": f"Explain lamp {i}", "price_per_day": 4, "location": "Hostel B, Room 202"} for i in range(3)
+    ])
+    ids = [result["id"] for result in bulk.json()["results"]]
+    await call("PATCH /v1/items/bulk", "PATCH", "/v1/items/bulk", headers=auth(owner),
+               json=[{"id": id, "price_per_day": 6} for id in ids])
+    await call("DELETE /v1/items/bulk", "DELETE", "/v1/items/bulk", headers=auth(owner), json={"ids": ids})
+
+
+def seq_scans(plan: dict) -> list:
+    found = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def check(min_rows: int) -> list:
+    violations = []
+    async with database.pool.connection() as conn:
+        sizes = {row["relname"]: row["reltuples"] for row in await (await conn.execute(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )).fetchall()}
+        for (label, query), params in recorded.items():
+            row = await (await conn.execute(f"EXPLAIN (FORMAT JSON) {query}", params)).fetchone()
+            plan = row["QUERY PLAN"][0]["Plan"]
+            large = sorted({table for table in seq_scans(plan) if sizes.get(table, 0) >= min_rows})
+            print(f"{'SEQ SCAN' if large else 'ok':8}  {label:42}  {' '.join(query.split())[:100]}")
+            if large:
+                violations.append((label, large, " ".join(query.split())))
+            await conn.rollback()
+    return violations
+
+
+# Seeds the configured database, drives the app and returns the violations.
+# tests/test_explain.py runs this too.
+async def run(args) -> list:
+    recorded.clear()
+    database.pool = database.build_pool(database.conninfo())
+    database.pool.kwargs["cursor_factory"] = RecordingCursor
+    await database.pool.open(wait=True)
+    async with app_client() as client:
+        seeded = await prepare(args)
+        await drive(client, seeded)
+        return await check(args.min_rows)
+
+
+async def main(args):
+    async with disposable_database(template=args.template, keep=args.keep_database):
+        violations = await run(args)
+    print(f"{len(recorded)} statements checked")
+    for label, tables, query in violations:
+        print(f"\n{label} scans {', '.join(tables)}:\n  {query}")
+    if violations:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if any router query sequentially scans a large table")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--min-rows", type=int, default=10000, help="tables at least this big must not be scanned")
+    parser.add_argument("--template", help="clone this database instead of running migrations")
+    parser.add_argument("--keep-database", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,242 @@
+# End-to-end load test of the API against a disposable database.
+#
+#   python -m benchmarks.harness --users 1000 --items 50000 --mix browse --requests 20000 --concurrency 32
+#   python -m benchmarks.harness --mix write --compare benchmarks/results/<baseline>.json
+#
+# Creates lendit_bench_<random> on the configured server, applies
+# migrations/, seeds it, drives the in-process app with a weighted mix of
+# requests and drops the database again. Results (throughput and
+# p50/p95/p99 per endpoint) are written as JSON named after the current
+# commit; --compare fails the run when an endpoint regressed past
+# --tolerance against an earlier result file.
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from benchmarks.common import (
+    BENCH_PASSWORD, CATEGORIES, NOUNS, app_client, disposable_database, percentiles, seed_items, seed_users,
+)
+from core import database
+from core.security import password_hasher
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+MIXES = {
+    "browse": {"list": 45, "detail": 40, "login": 5, "create": 3, "update": 4, "delete": 1, "college_id": 2},
+    "write": {"list": 15, "detail": 15, "login": 10, "create": 25, "update": 20, "delete": 10, "college_id": 5},
+    "login": {"login": 80, "detail": 20},
+}
+
+
+class Session:
+    def __init__(self, user_id: int, email: str, token: str, items: list):
+        self.user_id = user_id
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.items = items
+
+
+class Scenario:
+    def __init__(self, client, rng: random.Random, emails: list, item_ids: list, sessions: list):
+        self.client = client
+        self.rng = rng
+        self.emails = emails
+        self.item_ids = item_ids
+        self.sessions = sessions
+        self.cursors = []
+        self.deleted = set()
+
+    async def login(self):
+        return "POST /v1/auth/login", await self.client.post(
+            "/v1/auth/login", data={"username": self.rng.choice(self.emails), "password": BENCH_PASSWORD}
+        )
+
+    async def list(self):
+        params = {"limit": 20}
+        if self.rng.random() < 0.3:
+            params["category"] = self.rng.choice(CATEGORIES)
+        elif self.cursors and self.rng.random() < 0.3:
+            params["cursor"] = self.rng.choice(self.cursors)
+        response = await self.client.get("/v1/items/", params=params)
+        if response.status_code == 200 and response.json()["next_cursor"] and len(self.cursors) < 1000:
+            self.cursors.append(response.json()["next_cursor"])
+        return "GET /v1/items/", response
+
+    async def detail(self):
+        id = self.rng.choice(self.item_ids)
+        while id in self.deleted:
+            id = self.rng.choice(self.item_ids)
+        return "GET /v1/items/{id}", await self.client.get(f"/v1/items/{id}")
+
+    async def create(self):
+        session = self.rng.choice(self.sessions)
+        response = await self.client.post("/v1/items/", headers=session.headers, json={
+            "name": f"Bench {self.rng.choice(NOUNS)}",
+            "description": "Created by the load test",
+            "price_per_day": round(self.rng.uniform(5, 50), 2),
+            "category": self.rng.choice(CATEGORIES),
+            "location": f"Hostel {self.rng.choice('ABCDEFGH')}, Room {self.rng.randrange(100, 400)}",
+        })
+        if response.status_code == 201:
+            session.items.append(response.json()["id"])
+        return "POST /v1/items/", response
+
+    async def update(self):
+        session = self.rng.choice([session for session in self.sessions if session.items] or self.sessions)
+        if not session.items:
+            return await self.create()
+        return "PUT /v1/items/{id}", await self.client.put(
+            f"/v1/items/{self.rng.choice(session.items)}", headers=session.headers,
+            json={"price_per_day": round(self.rng.uniform(5, 50), 2), "is_available": self.rng.random() > 0.2},
+        )
+
+    async def delete(self):
+        session = self.rng.choice([session for session in self.sessions if session.items] or self.sessions)
+        if not session.items:
+            return await self.create()
+        id = session.items.pop(self.rng.randrange(len(session.items)))
+        self.deleted.add(id)
+        return "DELETE /v1/items/{id}", await self.client.delete(f"/v1/items/{id}", headers=session.headers)
+
+    async def college_id(self):
+        session = self.rng.choice(self.sessions)
+        return "POST /v1/users/{id}/college-id", await self.client.post(
+            f"/v1/users/{session.user_id}/college-id",
+            json={"college_id_url": f"https://example.com/college_id/{session.user_id}-{self.rng.getrandbits(32):08x}.jpg"},
+        )
+
+
+async def prepare(args) -> tuple[list, list]:
+    async with database.pool.connection() as conn:
+        password_hash = await password_hasher.hash(BENCH_PASSWORD)
+        user_ids = await seed_users(conn, args.users, password_hash)
+        await seed_items(conn, args.items, owner_ids=user_ids)
+        rows = await (await conn.execute("SELECT id, email FROM users WHERE id = ANY(%s) ORDER BY id", (user_ids,))).fetchall()
+        item_ids = [row["id"] for row in await (await conn.execute("SELECT id FROM items")).fetchall()]
+    return rows, item_ids
+
+
+async def open_sessions(client, users: list, count: int) -> list:
+    async def open_one(user):
+        response = await client.post("/v1/auth/login", data={"username": user["email"], "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        return user, response.json()["access_token"]
+
+    logged_in = await asyncio.gather(*(open_one(user) for user in users[:count]))
+    async with database.pool.connection() as conn:
+        owned = defaultdict(list)
+        for row in await (await conn.execute(
+            "SELECT id, owner_id FROM items WHERE owner_id = ANY(%s)", ([user["id"] for user, _ in logged_in],)
+        )).fetchall():
+            owned[row["owner_id"]].append(row["id"])
+    return [Session(user["id"], user["email"], token, owned[user["id"]]) for user, token in logged_in]
+
+
+async def drive(scenario: Scenario, mix: dict, requests: int, concurrency: int) -> dict:
+    operations = scenario.rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    samples, errors = defaultdict(list), defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(operation):
+        async with semaphore:
+            started = time.perf_counter()
+            endpoint, response = await getattr(scenario, operation)()
+            samples[endpoint].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(operation) for operation in operations))
+    elapsed = time.perf_counter() - started
+    endpoints = {
+        endpoint: {"throughput_rps": len(values) / elapsed, "errors": errors[endpoint], **percentiles(values)}
+        for endpoint, values in sorted(samples.items())
+    }
+    every = [value for values in samples.values() for value in values]
+    return {
+        "elapsed_s": elapsed,
+        "overall": {"throughput_rps": len(every) / elapsed, "errors": sum(errors.values()), **percentiles(every)},
+        "endpoints": endpoints,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# (endpoint, metric, baseline, current, change) for every metric that got
+# worse by more than tolerance; latency up or throughput down.
+def regressions(baseline: dict, current: dict, tolerance: float) -> list:
+    found = []
+    for endpoint, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(endpoint)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = now[metric] / before[metric] - 1 if before[metric] else 0
+            if change > tolerance:
+                found.append((endpoint, metric, before[metric], now[metric], change))
+        change = now["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0
+        if change < -tolerance:
+            found.append((endpoint, "throughput_rps", before["throughput_rps"], now["throughput_rps"], change))
+    return found
+
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    async with disposable_database(template=args.template, keep=args.keep_database) as name:
+        async with app_client() as client:
+            users, item_ids = await prepare(args)
+            sessions = await open_sessions(client, users, args.sessions)
+            scenario = Scenario(client, rng, [user["email"] for user in users], item_ids, sessions)
+            if args.warmup:
+                await drive(scenario, MIXES[args.mix], args.warmup, args.concurrency)
+            result = await drive(scenario, MIXES[args.mix], args.requests, args.concurrency)
+
+    result = {
+        "commit": git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": name,
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        **result,
+    }
+    output = Path(args.output or RESULTS_DIR / f"{result['commit']}-{args.mix}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps({"overall": result["overall"], "endpoints": result["endpoints"]}, indent=2))
+    print(f"results written to {output}")
+
+    if args.compare:
+        found = regressions(json.loads(Path(args.compare).read_text()), result, args.tolerance)
+        for endpoint, metric, before, now, change in found:
+            print(f"REGRESSION {endpoint} {metric}: {before:.2f} -> {now:.2f} ({change:+.0%})")
+        if found:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the API against a disposable database")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=50, help="users logged in up front for authenticated requests")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="browse")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--template", help="clone this database instead of running migrations")
+    parser.add_argument("--keep-database", action="store_true")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>-<mix>.json)")
+    parser.add_argument("--compare", help="earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown before --compare fails")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+# Micro-benchmarks of per-request hot paths that need no database.
+#
+#   python -m benchmarks.micro --repeat 50 --number 2000 --output micro.json
+#
+# Each case runs --number calls per sample; percentiles are per call.
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from app.api.auth import create_access_token, get_current_user
+from app.api.item import _update_assignments
+from core.pagination import decode_cursor, encode_cursor
+from core.tokens import token_cache
+from models.item import ItemUpdate
+from benchmarks.common import percentiles
+
+
+def measure(fn, repeat: int, number: int) -> dict:
+    for _ in range(number):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return percentiles(samples)
+
+
+def cases() -> dict:
+    claims = {"sub": "42", "email": "student42@college.edu"}
+    token = create_access_token(claims)
+    loop = asyncio.new_event_loop()
+
+    def current_user_uncached():
+        token_cache.clear()
+        loop.run_until_complete(get_current_user(token))
+
+    def current_user_cached():
+        loop.run_until_complete(get_current_user(token))
+
+    full_update = ItemUpdate(
+        name="Electric Kettle", description="Updated 1.7L kettle", price_per_hour=2.0, price_per_day=6.0,
+        category="Appliances", location="Hostel B, Room 202", is_available=True,
+        images=["https://example.com/kettle2.jpg"], latitude=28.5, longitude=77.2,
+    )
+    partial_update = ItemUpdate(price_per_day=6.0)
+    cursor = encode_cursor(datetime.now(timezone.utc), 123456)
+    return {
+        "create_access_token": lambda: create_access_token(claims),
+        "get_current_user:verify": current_user_uncached,
+        "get_current_user:cached": current_user_cached,
+        "update_assignments:all_fields": lambda: _update_assignments(full_update),
+        "update_assignments:one_field": lambda: _update_assignments(partial_update),
+        "item_update:validate": lambda: ItemUpdate.model_validate({"price_per_day": 6.0, "is_available": False}),
+        "cursor:encode": lambda: encode_cursor(datetime.now(timezone.utc), 123456),
+        "cursor:decode": lambda: decode_cursor(cursor),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark request hot paths")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument("--only", nargs="*", help="run just these cases")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+    results = {
+        name: measure(fn, args.repeat, args.number)
+        for name, fn in cases().items() if not args.only or name in args.only
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
@@ -0,0 +1,62 @@
+# In-memory geohash index vs. a full scan for "items near me".
+#
+#   python -m benchmarks.nearby --sizes 100000 1000000 --queries 200
+#
+# Items are spread over a handful of campus-sized clusters, like real
+# listings; every query is a 2 km radius around a random point in a cluster.
+import argparse
+import json
+import random
+import time
+from benchmarks.common import percentiles
+from core.geo import GeoIndex, haversine_m
+
+CAMPUSES = [(28.545, 77.192), (19.133, 72.915), (12.991, 80.233), (22.320, 87.310), (26.512, 80.232)]
+
+
+def random_point(rng: random.Random):
+    lat, lng = rng.choice(CAMPUSES)
+    return lat + rng.gauss(0, 0.02), lng + rng.gauss(0, 0.02)
+
+
+def full_scan(points: list, lat: float, lng: float, radius: float):
+    matches = [(haversine_m(lat, lng, p_lat, p_lng), id) for id, (p_lat, p_lng) in enumerate(points)]
+    return sorted(match for match in matches if match[0] <= radius)
+
+
+def run(size: int, queries: int, radius: float, rng: random.Random) -> dict:
+    points = [random_point(rng) for _ in range(size)]
+    started = time.perf_counter()
+    index = GeoIndex()
+    for id, (lat, lng) in enumerate(points):
+        index.upsert(id, lat, lng)
+    build_seconds = time.perf_counter() - started
+
+    probes = [random_point(rng) for _ in range(queries)]
+    indexed, scanned = [], []
+    for lat, lng in probes:
+        started = time.perf_counter()
+        from_index = index.nearby(lat, lng, radius)
+        indexed.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        from_scan = full_scan(points, lat, lng, radius)
+        scanned.append(time.perf_counter() - started)
+        assert [id for _, id in from_index] == [id for _, id in from_scan]
+    return {
+        "items": size,
+        "radius_m": radius,
+        "index_build_s": build_seconds,
+        "geohash_index": percentiles(indexed),
+        "full_scan": percentiles(scanned),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the campus geo index against a full scan")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--radius", type=float, default=2000)
+    parser.add_argument("--random-seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.random_seed)
+    print(json.dumps([run(size, args.queries, args.radius, rng) for size in args.sizes], indent=2))
@@ -0,0 +1,64 @@
+# Latency of GET /v1/items/search over a synthetic catalogue.
+#
+#   python -m benchmarks.search --items 1000000 --queries 2000 --concurrency 16
+#
+# Seeds --items items into a disposable database (see benchmarks.common),
+# so nothing is left behind. Refuses to run without pg_trgm: the typo
+# fallback would have no index and the numbers would mean nothing.
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.common import ADJECTIVES, CATEGORIES, NOUNS, app_client, disposable_database, percentiles, seed_items
+from core import database
+
+
+def random_query(rng: random.Random) -> dict:
+    roll = rng.random()
+    noun = rng.choice(NOUNS)
+    if roll < 0.4:
+        return {"q": noun}
+    if roll < 0.7:
+        return {"q": f"{rng.choice(ADJECTIVES)} {noun}"}
+    if roll < 0.85:
+        # One dropped letter, to exercise the trigram fallback.
+        i = rng.randrange(1, len(noun))
+        return {"q": noun[:i] + noun[i + 1:]}
+    return {"q": noun, "category": rng.choice(CATEGORIES), "is_available": "true"}
+
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    queries = [random_query(rng) for _ in range(args.queries)]
+    samples = []
+    async with disposable_database(template=args.template, keep=args.keep_database), app_client() as client:
+        async with database.pool.connection() as conn:
+            if await (await conn.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).fetchone() is None:
+                raise SystemExit("pg_trgm is not installed on this server")
+            await seed_items(conn, args.items)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def run(params):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get("/v1/items/search", params=params)
+                samples.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run(params) for params in queries))
+        elapsed = time.perf_counter() - started
+    result = {"endpoint": "GET /v1/items/search", "throughput_rps": len(samples) / elapsed, **percentiles(samples)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GET /v1/items/search")
+    parser.add_argument("--items", type=int, default=100000, help="synthetic items to search over")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--template", help="clone this database instead of running migrations")
+    parser.add_argument("--keep-database", action="store_true")
+    asyncio.run(main(parser.parse_args()))
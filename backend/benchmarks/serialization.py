@@ -0,0 +1,110 @@
+# Cost of turning a 1k-row listing into a response body: FastAPI's
+# response_model validation + stdlib JSON versus the LEAN_RESPONSES path.
+#
+#   python -m benchmarks.serialization --rows 1000 --rounds 200
+#
+# No database or HTTP involved: both paths get the same pre-built rows, shaped
+# like the dicts psycopg hands back, so the difference is serialization alone.
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from benchmarks.common import ADJECTIVES, CATEGORIES, NOUNS, percentiles
+from core.serialization import LeanJSONResponse, project
+from models.item import ItemPage, ItemResponse
+from models.user import UserPage, UserResponse
+
+
+def item_rows(count: int, rng: random.Random) -> list:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": id,
+        "name": f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} #{id}",
+        "description": "A lightly used item in good condition, pickup from the hostel reception",
+        "price_per_hour": Decimal(f"{rng.uniform(1, 10):.2f}"),
+        "price_per_day": Decimal(f"{rng.uniform(5, 50):.2f}"),
+        "category": rng.choice(CATEGORIES),
+        "location": f"Hostel {chr(65 + id % 8)}, Room {100 + id % 300}",
+        "is_available": rng.random() > 0.2,
+        "images": [f"https://res.cloudinary.com/lendit/image/upload/{rng.getrandbits(256):064x}.jpg" for _ in range(2)],
+        "latitude": 28.545 + rng.gauss(0, 0.02),
+        "longitude": 77.192 + rng.gauss(0, 0.02),
+        "created_at": now - timedelta(seconds=id),
+        "updated_at": None,
+    } for id in range(count)]
+
+
+def user_rows(count: int, rng: random.Random) -> list:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": id,
+        "email": f"student{id}@college.edu",
+        "first_name": "Student",
+        "last_name": str(id),
+        "phone_number": f"+91{rng.randrange(10**9, 10**10)}",
+        "college_id_url": f"https://res.cloudinary.com/lendit/image/upload/college_id_{id}.jpg",
+        "role": rng.choice(["renter", "lender"]),
+        "created_at": now - timedelta(seconds=id),
+        "updated_at": None,
+        "is_active": True,
+    } for id in range(count)]
+
+
+def response_field(model):
+    app = FastAPI()
+    app.get("/", response_model=model)(lambda: None)
+    return app.routes[-1].response_field
+
+
+# What FastAPI does with a returned dict: validate against response_model,
+# dump to JSON-able objects, then encode with the stdlib.
+async def standard(field, content) -> bytes:
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def lean(model, key, rows) -> bytes:
+    return LeanJSONResponse({key: [project(model, row) for row in rows], "next_cursor": None}).body
+
+
+async def measure(fn, rounds: int, warmup: int) -> tuple[dict, bytes]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = await fn()
+        samples.append(time.perf_counter() - started)
+    return {"bytes": len(body), **percentiles(samples)}, body
+
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    cases = {
+        "items": (ItemPage, ItemResponse, item_rows(args.rows, rng)),
+        "users": (UserPage, UserResponse, user_rows(args.rows, rng)),
+    }
+    results = {}
+    for key, (page, model, rows) in cases.items():
+        field = response_field(page)
+        results[f"{key}:standard"], standard_body = await measure(
+            lambda: standard(field, {key: rows, "next_cursor": None}), args.rounds, args.warmup)
+        results[f"{key}:lean"], lean_body = await measure(lambda: lean(model, key, rows), args.rounds, args.warmup)
+        # Both paths must produce the same document.
+        assert json.loads(standard_body) == json.loads(lean_body), f"{key} bodies differ"
+        results[f"{key}:speedup_p50"] = results[f"{key}:standard"]["p50_ms"] / results[f"{key}:lean"]["p50_ms"]
+    print(json.dumps({"rows": args.rows, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response serialization of a listing page")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--random-seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+# Cold-start cost of an API process.
+#
+#   python -m benchmarks.startup --runs 20 --path "/v1/items/?limit=20" --importtime 15
+#
+# Each run starts a fresh interpreter that imports app.main, runs the
+# lifespan and serves one request in-process, then waits for /health/ready.
+# Reports interpreter start, import, startup, time to first response and
+# time to ready, measured from process spawn. --importtime also lists the
+# modules that take longest to import on their own. Uses the configured
+# database; the request should be a read.
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from benchmarks.common import percentiles
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import sys, time
+spawned = float(sys.argv[2])
+started = time.time()
+from app.main import app
+imported = time.time()
+import asyncio, json, httpx
+
+async def main():
+    async with app.router.lifespan_context(app):
+        up = time.time()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+            status = (await client.get(sys.argv[1])).status_code
+            first = time.time()
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.005)
+            ready = time.time()
+    print(json.dumps({
+        "status": status, "interpreter": started - spawned, "import": imported - spawned,
+        "startup": up - spawned, "first_response": first - spawned, "ready": ready - spawned,
+    }))
+
+asyncio.run(main())
+"""
+PHASES = ("interpreter", "import", "startup", "first_response", "ready")
+
+
+def run_once(path: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, path, repr(time.time())],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# (self_us, cumulative_us, module) for the slowest modules by self time.
+def slowest_imports(count: int) -> list:
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)", line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), match[3]))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(args):
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    statuses = {run["status"] for run in runs}
+    result = {
+        "path": args.path,
+        "statuses": sorted(statuses),
+        "phases": {phase: percentiles([run[phase] for run in runs]) for phase in PHASES},
+    }
+    if args.importtime:
+        result["slowest_imports"] = [
+            {"module": module, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for self_us, cumulative_us, module in slowest_imports(args.importtime)
+        ]
+    print(json.dumps(result, indent=2))
+    if statuses != {200}:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request of a fresh API process")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/v1/items/?limit=20", help="request served first")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    main(parser.parse_args())
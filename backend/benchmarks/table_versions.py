@@ -0,0 +1,69 @@
+# What the table_versions triggers cost concurrent writers.
+#
+#   python -m benchmarks.table_versions --writers 16 --transactions 50 --hold-ms 20
+#
+# Each writer updates its own item, keeps the transaction open for
+# --hold-ms (the rest of a request's work) and commits. No two writers touch
+# the same item, so any waiting is on table_versions. Runs once with the
+# version triggers disabled, once with every bump on one row per table (as
+# before migration 0008) and once with the slots, in a disposable database.
+import argparse
+import asyncio
+import json
+import time
+import psycopg
+from benchmarks.common import disposable_database, percentiles, seed_items
+from core import database
+
+MODES = ("no_triggers", "single_row", "slots")
+
+
+async def set_mode(conn, mode: str):
+    await conn.execute(f"ALTER TABLE items {'DISABLE' if mode == 'no_triggers' else 'ENABLE'} TRIGGER USER")
+    definition = (await (await conn.execute("SELECT pg_get_functiondef('bump_table_version'::regproc)")).fetchone())[0]
+    if mode == "single_row":
+        definition = definition.replace("pg_backend_pid() % 16", "0")
+    else:
+        definition = definition.replace("slot = 0;", "slot = pg_backend_pid() % 16;")
+    await conn.execute(definition)
+    await conn.commit()
+
+
+async def writer(id: int, transactions: int, hold: float, samples: list):
+    async with await psycopg.AsyncConnection.connect(database.conninfo()) as conn:
+        for _ in range(transactions):
+            started = time.perf_counter()
+            await conn.execute("UPDATE items SET price_per_day = price_per_day WHERE id = %s", (id,))
+            await asyncio.sleep(hold)
+            await conn.commit()
+            samples.append(time.perf_counter() - started)
+
+
+async def run(mode: str, item_ids: list, args) -> dict:
+    async with await psycopg.AsyncConnection.connect(database.conninfo()) as conn:
+        await set_mode(conn, mode)
+    samples = []
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(id, args.transactions, args.hold_ms / 1000, samples) for id in item_ids))
+    elapsed = time.perf_counter() - started
+    return {"mode": mode, "throughput_tps": len(samples) / elapsed, **percentiles(samples)}
+
+
+async def main(args):
+    async with disposable_database(template=args.template):
+        async with await psycopg.AsyncConnection.connect(database.conninfo(), row_factory=psycopg.rows.dict_row) as conn:
+            await seed_items(conn, args.writers)
+            item_ids = [row["id"] for row in await (await conn.execute(
+                "SELECT id FROM items ORDER BY id DESC LIMIT %s", (args.writers,)
+            )).fetchall()]
+        results = [await run(mode, item_ids, args) for mode in MODES]
+    print(json.dumps({"writers": args.writers, "hold_ms": args.hold_ms, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how the table version triggers serialize concurrent writes")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--transactions", type=int, default=50, help="per writer")
+    parser.add_argument("--hold-ms", type=float, default=20, help="time each transaction stays open after its write")
+    parser.add_argument("--template", help="clone this database instead of running migrations")
+    asyncio.run(main(parser.parse_args()))
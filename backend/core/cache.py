@@ -0,0 +1,147 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+import orjson
+from core.config import config
+from core.serialization import json_default
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is only needed for CACHE_BACKEND=redis
+    redis = None
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: Optional[float] = None):
+        self._entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisCache:
+    # Works with any client exposing the redis.asyncio get/set/delete
+    # coroutines, so tests can hand in an in-memory stand-in.
+    def __init__(self, client, ttl: float = 60, prefix: str = "lendit:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value, ttl: Optional[float] = None):
+        await self.client.set(self.prefix + key, orjson.dumps(value, default=json_default), ex=int(ttl or self.ttl))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Loads that were running when their key was invalidated. They read
+        # the row before the write committed, so their result must not be
+        # cached; keeping only these means nothing grows per key.
+        self._stale: set[asyncio.Future] = set()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None):
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        # Concurrent misses for the same key wait on the first caller's load
+        # instead of each querying the database.
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            if value is not None and future not in self._stale:
+                await self.backend.set(key, value, ttl)
+                # An invalidation that landed while the set was in flight.
+                if future in self._stale:
+                    await self.backend.delete(key)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve it so a future nobody else awaited does not log a warning.
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._stale.discard(future)
+
+    async def get(self, key: str):
+        return await self.backend.get(key)
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            inflight = self._inflight.pop(key, None)
+            if inflight is not None:
+                self._stale.add(inflight)
+        await self.backend.delete(*keys)
+
+    def metrics(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.backend.evictions,
+        }
+
+
+def build_backend():
+    ttl = float(config.get('CACHE_TTL') or 60)
+    if (config.get('CACHE_BACKEND') or "memory") == "redis":
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return RedisCache(redis.from_url(config.get('REDIS_URL') or "redis://localhost:6379/0"), ttl=ttl)
+    return LRUCache(max_size=int(config.get('CACHE_MAX_SIZE') or 1024), ttl=ttl)
+
+
+item_cache = Cache(build_backend())
+
+
+def cache_metrics():
+    return item_cache.metrics()
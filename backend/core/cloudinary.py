@@ -1,22 +1,177 @@
-import cloudinary
-from cloudinary.uploader import upload
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from typing import List, Optional
+import psycopg
 from fastapi import APIRouter, UploadFile, HTTPException, status
+from core.config import config
+from core.storage import StorageBackend, get_storage
+from core.images import derivative_key, render_derivatives
+from core.metrics import external_call
+from core import database, jobs
 
-# Configuration       
-cloudinary.config( 
-    cloud_name = "djopmrv4e", 
-    api_key = "473857625732351", 
-    api_secret = "<your_api_secret>", 
-    secure=True
-)
+logger = logging.getLogger(__name__)
 
-async def upload_image(image: UploadFile):
+READ_CHUNK_SIZE = 1024 * 1024
+UPLOAD_CONCURRENCY = int(config.get('UPLOAD_CONCURRENCY') or 4)
+# Scratch space for uploads while they are hashed, checked and stored (the
+# system temp dir by default). Nothing in it outlives a request or a job.
+SPOOL_DIR = config.get('UPLOAD_SPOOL_DIR') or None
+# Pillow format -> extension the original is stored and served under. The
+# client's filename is never used: an "image.html" would be served as HTML.
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+
+# Copy the upload to a temp file one chunk at a time, hashing as we go. The
+# file outlives the request, which queued uploads need, and is never held in
+# memory whole.
+async def _spool_to_disk(image: UploadFile) -> tuple[str, str]:
+    fd, path = tempfile.mkstemp(prefix="lendit-upload-", dir=SPOOL_DIR)
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            while chunk := await image.read(READ_CHUNK_SIZE):
+                digest.update(chunk)
+                await asyncio.to_thread(spooled.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+async def _storage_call(operation: str, fn, *args):
+    with external_call("storage", operation):
+        return await asyncio.to_thread(fn, *args)
+
+
+# Stores the spooled file at path under key, derivatives first, so once the
+# original exists every derivative does too. The spooled file is removed
+# once stored; on failure the caller removes it.
+async def _store(storage: StorageBackend, path: str, digest: str, key: str) -> str:
+    # Uploads are content-addressed: the same photo is stored once.
+    if await _storage_call("exists", storage.exists, key):
+        os.unlink(path)
+        return storage.url_for(key)
+    with external_call("images", "render_derivatives"):
+        derivatives = await render_derivatives(path)
+    try:
+        await asyncio.gather(*(
+            _storage_call("put", storage.put, derivative_key(digest, name), output) for name, output in derivatives.items()
+        ))
+        url = await _storage_call("put", storage.put, key, path)
+    finally:
+        for output in derivatives.values():
+            os.unlink(output)
+    os.unlink(path)
+    return url
+
+
+# Copies a spooled upload into upload_chunks on the queue connection, one
+# chunk at a time, so it commits or rolls back with its job.
+async def _stage(queue: psycopg.AsyncConnection, upload: uuid.UUID, path: str):
+    with open(path, "rb") as spooled:
+        seq = 0
+        while chunk := await asyncio.to_thread(spooled.read, READ_CHUNK_SIZE):
+            await queue.execute("INSERT INTO upload_chunks (upload_id, seq, data) VALUES (%s, %s, %s)", (upload, seq, chunk))
+            seq += 1
+
+
+# Rebuilds a staged upload in a local spool file, streaming the chunks.
+async def _unstage(upload: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="lendit-upload-", dir=SPOOL_DIR)
+    found = False
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            async with database.pool.connection() as conn, conn.cursor() as cursor:
+                async for row in cursor.stream("SELECT data FROM upload_chunks WHERE upload_id = %s ORDER BY seq", (upload,)):
+                    found = True
+                    await asyncio.to_thread(spooled.write, row["data"])
+        if not found:
+            raise jobs.JobFailed(f"staged upload {upload} is gone")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def _discard_staged(upload: str):
+    async with database.pool.connection() as conn:
+        await conn.execute("DELETE FROM upload_chunks WHERE upload_id = %s", (upload,))
+
+
+@jobs.handler("storage.upload")
+async def store_staged_upload(payload: dict):
+    from PIL import UnidentifiedImageError
+    path = await _unstage(payload["upload"])
     try:
-        upload_result = upload(image.file)
-        file_url = upload_result['secure_url']
-        return file_url
+        await _store(get_storage(), path, payload["digest"], payload["key"])
+    except UnidentifiedImageError as e:
+        await _discard_staged(payload["upload"])
+        raise jobs.JobFailed(str(e))
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+    await _discard_staged(payload["upload"])
+
+
+# Reads just the header, enough to turn away files that are not images
+# before anything is stored, and returns the extension for their format.
+def _identify(path: str) -> str:
+    from PIL import Image, UnidentifiedImageError
+    with Image.open(path) as image:
+        extension = EXTENSIONS.get(image.format)
+    if extension is None:
+        raise UnidentifiedImageError(f"unsupported image format {image.format}")
+    return extension
+
+
+# With a connection to queue on, the request only stages the file in the
+# database: storing it and its derivatives happens in a job worker once the
+# caller commits, and the returned URL works from then on. Without one it
+# is stored inline.
+async def upload_image(image: UploadFile, queue: Optional[psycopg.AsyncConnection] = None):
+    # Pillow is only loaded once something is uploaded.
+    from PIL import UnidentifiedImageError
+    try:
+        storage = get_storage()
+        path, digest = await _spool_to_disk(image)
+        try:
+            key = digest + await asyncio.to_thread(_identify, path)
+            if queue is None:
+                return await _store(storage, path, digest, key)
+            upload = uuid.uuid4()
+            await _stage(queue, upload, path)
+            await jobs.enqueue(queue, "storage.upload", {"upload": str(upload), "digest": digest, "key": key})
+            return storage.url_for(key)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{image.filename} is not a supported image")
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error uploading images: {e}")
+
+
+async def upload_images(images: List[UploadFile], queue: Optional[psycopg.AsyncConnection] = None, concurrency: int = UPLOAD_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload_one(image: UploadFile):
+        async with semaphore:
+            return await upload_image(image, queue)
+
+    # Every upload runs to the end before a failure is raised, so none is
+    # still staging when the caller rolls back; the jobs and chunks already
+    # written go with that rollback.
+    results = await asyncio.gather(*(upload_one(image) for image in images), return_exceptions=True)
+    failed = next((result for result in results if isinstance(result, BaseException)), None)
+    if failed is not None:
+        raise failed
+    return results
     
 
 async def handle_upload(image: UploadFile):
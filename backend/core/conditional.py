@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import psycopg
+from fastapi import HTTPException, Request, Response, status
+from core.config import config
+
+# Microseconds since the epoch of a row's last change, selected alongside it.
+MODIFIED_US = "(extract(epoch FROM coalesce(updated_at, created_at)) * 1000000)::bigint"
+
+# Item reads are public: browsers revalidate every time, a CDN may serve a
+# copy for HTTP_CACHE_S_MAXAGE seconds and keep serving it while it refetches.
+PUBLIC_CACHE = (
+    f"public, max-age={int(config.get('HTTP_CACHE_MAX_AGE') or 0)}, "
+    f"s-maxage={int(config.get('HTTP_CACHE_S_MAXAGE') or 30)}, "
+    f"stale-while-revalidate={int(config.get('HTTP_CACHE_STALE_WHILE_REVALIDATE') or 60)}"
+)
+# User records carry contact details; no shared cache may keep them.
+PRIVATE_CACHE = "private, no-cache"
+
+
+def row_etag(id: int, modified_us: int) -> str:
+    return f'"{id:x}-{modified_us:x}"'
+
+
+def table_etag(table: str, version: int) -> str:
+    return f'"{table}-{version:x}"'
+
+
+def validators(etag: str, modified_us: int, cache_control: str) -> dict:
+    modified = datetime.fromtimestamp(modified_us / 1000000, tz=timezone.utc)
+    return {"ETag": etag, "Last-Modified": format_datetime(modified, usegmt=True), "Cache-Control": cache_control}
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _etags(header: str) -> list:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+# If-None-Match wins over If-Modified-Since when both are sent (RFC 9110).
+def not_modified(request: Request, etag: str, modified_us: int) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second precision.
+        return modified_us // 1000000 <= int(since.timestamp())
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+# None when the request carries no If-Match; otherwise raises 412 unless one
+# of its tags (or *) matches the current strong ETag.
+def check_if_match(request: Request, etag: str) -> Optional[str]:
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return None
+    tags = [tag.strip() for tag in if_match.split(",")]
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="The resource has changed since it was fetched")
+    return if_match
+
+
+# Versions are striped over slots (migration 0008) and a table's version is
+# their sum. Without seeded rows the triggers have nothing to bump, so no
+# fallback version would ever change and clients would keep revalidating
+# stale listings as fresh.
+async def table_version(cursor: psycopg.AsyncCursor, table: str) -> dict:
+    await cursor.execute(
+        """SELECT sum(version)::bigint AS version, (extract(epoch FROM max(updated_at)) * 1000000)::bigint AS modified_us
+           FROM table_versions WHERE name = %s""",
+        (table,)
+    )
+    row = await cursor.fetchone()
+    if row is None or row["version"] is None:
+        raise RuntimeError(f"table_versions has no row for {table!r}; run python -m core.migrations up")
+    return row
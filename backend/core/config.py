@@ -1,3 +1,38 @@
+import os
+from collections.abc import MutableMapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 from dotenv import dotenv_values
 
-config = dotenv_values(".env")
+# backend/.env wherever the process was started from; LENDIT_ENV_FILE points
+# elsewhere, e.g. at a file baked into a serverless image.
+DEFAULT_ENV_FILE = Path(__file__).resolve().parent.parent / ".env"
+
+
+# Read once per process (per path) and cached. Most modules read their
+# settings at import, and importing app.main builds the app, so
+# LENDIT_ENV_FILE has to be set before then: later changes are not seen.
+@lru_cache
+def get_config(path: Optional[str] = None) -> dict:
+    return dotenv_values(path or os.environ.get("LENDIT_ENV_FILE") or DEFAULT_ENV_FILE)
+
+
+class _Config(MutableMapping):
+    def __getitem__(self, key):
+        return get_config()[key]
+
+    def __setitem__(self, key, value):
+        get_config()[key] = value
+
+    def __delitem__(self, key):
+        del get_config()[key]
+
+    def __iter__(self):
+        return iter(get_config())
+
+    def __len__(self):
+        return len(get_config())
+
+
+config = _Config()
@@ -1,19 +1,76 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from fastapi import Depends
+import psycopg
+from psycopg.rows import dict_row
+from fastapi import Request
+from psycopg_pool import AsyncConnectionPool
 from core.config import config
+from core.metrics import METRICS_ENABLED, TracedCursor
 
-def get_db():
-    conn = psycopg2.connect(
-        host="localhost",
-        database=config['DATABASE'],
+
+async def _reset_connection(conn: psycopg.AsyncConnection):
+    # The pool already rolls back open transactions; also drop any session
+    # settings a handler may have changed.
+    await conn.execute("RESET ALL")
+    await conn.commit()
+
+
+def conninfo(dbname: str = None, host: str = None, port: int = None) -> str:
+    return psycopg.conninfo.make_conninfo(
+        host=host or config.get('DATABASE_HOST') or "localhost",
+        port=port or int(config.get('DATABASE_PORT') or 5432),
+        dbname=dbname or config['DATABASE'],
         user="postgres",
         password=config['POSTGRES_PASSWORD'],
-        cursor_factory=RealDictCursor
     )
-    cursor = conn.cursor()
-    try:
-        yield conn, cursor
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+
+
+pool: AsyncConnectionPool = None
+# Set while read replicas are in use, so writes report how far the primary's
+# WAL has got (see core.replicas).
+track_write_lsn = False
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def build_pool(info: str, connection_class: type = psycopg.AsyncConnection) -> AsyncConnectionPool:
+    return AsyncConnectionPool(
+        conninfo=info,
+        connection_class=connection_class,
+        min_size=int(config.get('DB_POOL_MIN_SIZE') or 2),
+        max_size=int(config.get('DB_POOL_MAX_SIZE') or 10),
+        timeout=float(config.get('DB_POOL_TIMEOUT') or 30),
+        kwargs={"row_factory": dict_row, **({"cursor_factory": TracedCursor} if METRICS_ENABLED else {})},
+        check=AsyncConnectionPool.check_connection,
+        reset=_reset_connection,
+        open=False,
+    )
+
+
+async def open_pool(wait: bool = True):
+    global pool
+    if pool is None:
+        pool = build_pool(conninfo())
+        await pool.open(wait=wait)
+    return pool
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+def pool_metrics():
+    # requests_wait_ms is the time spent queueing for a connection and
+    # usage_ms the time connections were checked out.
+    return pool.get_stats() if pool is not None else {}
+
+
+async def get_db(request: Request):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            yield conn, cursor
+            if not track_write_lsn or request.method in SAFE_METHODS:
+                return
+            if conn.info.transaction_status != psycopg.pq.TransactionStatus.INERROR:
+                await cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+                request.state.write_lsn = (await cursor.fetchone())["lsn"]
@@ -0,0 +1,48 @@
+import secrets
+from typing import Optional
+import orjson
+import psycopg
+from fastapi import Header, HTTPException, status
+from psycopg.rows import dict_row
+from core import database
+from core.config import config
+from core.serialization import json_default
+
+# Exports carry every row, including users' contact details, so they are
+# only served to sync jobs holding this token; unset, they are disabled.
+EXPORT_TOKEN = config.get('EXPORT_TOKEN')
+# Per FETCH, and between FETCHes: a client that stops reading has its
+# connection closed by the server instead of holding it open.
+STATEMENT_TIMEOUT_MS = int(config.get('EXPORT_STATEMENT_TIMEOUT_MS') or 30000)
+IDLE_TIMEOUT_MS = int(config.get('EXPORT_IDLE_TIMEOUT_MS') or 60000)
+
+
+async def require_export_token(authorization: Optional[str] = Header(None)):
+    if not EXPORT_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Exports are disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), EXPORT_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid export token", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+# Rows are read through a server-side cursor so only one batch is ever held in
+# memory. The stream lasts as long as the client takes to read it, so it runs
+# on its own connection rather than one from the request pool (which get_db
+# could not provide anyway: dependency cleanup runs before a streamed body is
+# sent).
+async def stream_ndjson(query: str, batch_size: int = 1000):
+    async with await psycopg.AsyncConnection.connect(
+        database.conninfo(),
+        row_factory=dict_row,
+        options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS} -c idle_in_transaction_session_timeout={IDLE_TIMEOUT_MS}",
+    ) as conn:
+        async with conn.cursor(name="ndjson_export") as cursor:
+            cursor.itersize = batch_size
+            await cursor.execute(query)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield b"".join(orjson.dumps(row, default=json_default) + b"\n" for row in rows)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import math
+from typing import Optional
+from core import database
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+class GeoIndex:
+    # Items bucketed by geohash cell. A radius query only visits the cells
+    # overlapping the circle's bounding box instead of every item.
+    def __init__(self, precision: int = 6):
+        self.precision = precision
+        lng_bits = math.ceil(5 * precision / 2)
+        lat_bits = 5 * precision // 2
+        self.cell_height = 180.0 / (1 << lat_bits)
+        self.cell_width = 360.0 / (1 << lng_bits)
+        self._cells: dict[str, dict[int, tuple[float, float]]] = {}
+        self._cell_of: dict[int, str] = {}
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def upsert(self, id: int, lat: float, lng: float):
+        self.remove(id)
+        cell = geohash(lat, lng, self.precision)
+        self._cells.setdefault(cell, {})[id] = (lat, lng)
+        self._cell_of[id] = cell
+
+    def remove(self, id: int):
+        cell = self._cell_of.pop(id, None)
+        if cell is not None:
+            members = self._cells[cell]
+            members.pop(id, None)
+            if not members:
+                del self._cells[cell]
+
+    def _cells_covering(self, lat: float, lng: float, radius_m: float):
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        i0 = math.floor((max(lat - dlat, -90.0) + 90.0) / self.cell_height)
+        i1 = math.floor((min(lat + dlat, 89.999999) + 90.0) / self.cell_height)
+        j0 = math.floor((lng - dlng + 180.0) / self.cell_width)
+        j1 = math.floor((lng + dlng + 180.0) / self.cell_width)
+        for i in range(i0, i1 + 1):
+            cell_lat = -90.0 + (i + 0.5) * self.cell_height
+            for j in range(j0, j1 + 1):
+                cell_lng = (-180.0 + (j + 0.5) * self.cell_width + 180.0) % 360.0 - 180.0
+                yield geohash(cell_lat, cell_lng, self.precision)
+
+    # (distance_m, id) pairs within radius_m, nearest first.
+    def nearby(self, lat: float, lng: float, radius_m: float) -> list[tuple[float, int]]:
+        matches = []
+        for cell in set(self._cells_covering(lat, lng, radius_m)):
+            for id, (item_lat, item_lng) in self._cells.get(cell, {}).items():
+                distance = haversine_m(lat, lng, item_lat, item_lng)
+                if distance <= radius_m:
+                    matches.append((distance, id))
+        matches.sort()
+        return matches
+
+
+class CampusIndex:
+    # Keeps the items of a few configured "hot" areas in a GeoIndex. Queries
+    # whose circle fits inside one of those areas are answered from memory.
+    def __init__(self, campuses: list[tuple[float, float, float]], precision: int = 6):
+        self.campuses = campuses
+        self.index = GeoIndex(precision)
+        self.loaded = False
+
+    # Until the first load finishes, queries fall through to the database.
+    def covers(self, lat: float, lng: float, radius_m: float) -> bool:
+        return self.loaded and any(
+            haversine_m(lat, lng, c_lat, c_lng) + radius_m <= c_radius
+            for c_lat, c_lng, c_radius in self.campuses
+        )
+
+    def _in_campus(self, lat: float, lng: float) -> bool:
+        return any(haversine_m(lat, lng, c_lat, c_lng) <= c_radius for c_lat, c_lng, c_radius in self.campuses)
+
+    def track(self, id: int, lat: Optional[float], lng: Optional[float]):
+        if lat is not None and lng is not None and self._in_campus(lat, lng):
+            self.index.upsert(id, lat, lng)
+        else:
+            self.index.remove(id)
+
+    def forget(self, id: int):
+        self.index.remove(id)
+
+    async def load(self):
+        index = GeoIndex(self.index.precision)
+        async with database.pool.connection() as conn, conn.cursor() as cursor:
+            for c_lat, c_lng, c_radius in self.campuses:
+                await cursor.execute(
+                    """SELECT id, latitude, longitude FROM items
+                       WHERE earth_box(ll_to_earth(%s, %s), %s) @> ll_to_earth(latitude, longitude)""",
+                    (c_lat, c_lng, c_radius)
+                )
+                for row in await cursor.fetchall():
+                    index.upsert(row["id"], row["latitude"], row["longitude"])
+        # Swap in one step so readers never see a half-built index.
+        self.index = index
+        self.loaded = True
+
+    async def refresh_forever(self, interval: float):
+        # Other workers' writes only reach this process through the reload.
+        # The first load happens here too, so startup does not wait on it.
+        while True:
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Refreshing the campus geo index failed")
+            await asyncio.sleep(interval)
+
+
+def _parse_campuses(raw: str) -> list[tuple[float, float, float]]:
+    # GEO_INDEX_CAMPUSES="lat,lng,radius_m;lat,lng,radius_m"
+    campuses = []
+    for entry in raw.split(";"):
+        if entry.strip():
+            lat, lng, radius = (float(part) for part in entry.split(","))
+            campuses.append((lat, lng, radius))
+    return campuses
+
+
+campus_index: Optional[CampusIndex] = None
+if config.get('GEO_INDEX_CAMPUSES'):
+    campus_index = CampusIndex(_parse_campuses(config['GEO_INDEX_CAMPUSES']), int(config.get('GEO_INDEX_PRECISION') or 6))
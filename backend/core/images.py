@@ -0,0 +1,65 @@
+import asyncio
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from core.config import config
+
+# name -> longest edge in pixels
+DERIVATIVES = {"thumb": 240, "medium": 960}
+DERIVATIVE_FORMAT = "webp"
+DERIVATIVE_QUALITY = int(config.get('IMAGE_DERIVATIVE_QUALITY') or 80)
+
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{64}$")
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def derivative_key(digest: str, name: str) -> str:
+    return f"{digest}_{name}.{DERIVATIVE_FORMAT}"
+
+
+# Runs in a worker process: decode once, then write each size to a temp file.
+# Pillow is imported here, so only those processes load it.
+def _render_derivatives(path: str, quality: int) -> dict:
+    from PIL import Image, ImageOps
+    outputs = {}
+    with Image.open(path) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+        for name, size in DERIVATIVES.items():
+            resized = original.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            fd, output = tempfile.mkstemp(prefix=f"lendit-{name}-", suffix=f".{DERIVATIVE_FORMAT}")
+            with os.fdopen(fd, "wb") as f:
+                resized.save(f, format=DERIVATIVE_FORMAT, quality=quality, method=4)
+            outputs[name] = output
+    return outputs
+
+
+async def render_derivatives(path: str) -> dict:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=int(config.get('IMAGE_WORKERS') or 0) or None)
+    return await asyncio.get_running_loop().run_in_executor(_executor, _render_derivatives, path, DERIVATIVE_QUALITY)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# Uploads are stored under their SHA-256, so derivative URLs follow from the
+# original URL alone. URLs that were not uploaded through us only get
+# "original".
+def image_variants(url: str) -> dict:
+    variants = {"original": url}
+    head, _, filename = url.rpartition("/")
+    digest = os.path.splitext(filename)[0]
+    if _CONTENT_KEY.match(digest):
+        for name in DERIVATIVES:
+            variants[name] = f"{head}/{derivative_key(digest, name)}"
+    return variants
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from typing import Awaitable, Callable, Optional
+import orjson
+import psycopg
+from core import database
+from core.config import config
+from core.metrics import JOB_SECONDS, JOBS
+from core.serialization import json_default
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "lendit_jobs"
+MAX_ATTEMPTS = int(config.get('JOB_MAX_ATTEMPTS') or 8)
+BACKOFF_SECONDS = float(config.get('JOB_BACKOFF_SECONDS') or 5)
+BACKOFF_MAX_SECONDS = float(config.get('JOB_BACKOFF_MAX_SECONDS') or 3600)
+TIMEOUT_SECONDS = float(config.get('JOB_TIMEOUT_SECONDS') or 300)
+POLL_SECONDS = float(config.get('JOB_POLL_SECONDS') or 5)
+RETENTION_HOURS = float(config.get('JOB_RETENTION_HOURS') or 168)
+MAINTENANCE_SECONDS = 60
+# Longest pause between attempts while the database is unreachable.
+RETRY_MAX_SECONDS = 60
+
+# kind -> async fn(payload)
+handlers: dict[str, Callable[[dict], Awaitable[None]]] = {}
+
+
+# Raised by a handler when retrying cannot help.
+class JobFailed(Exception):
+    pass
+
+
+def handler(kind: str):
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+# Queues a job on the caller's connection, so it commits or rolls back with
+# the change that caused it. The notification is only delivered on commit
+# and wakes an idle worker straight away.
+async def enqueue(conn: psycopg.AsyncConnection, kind: str, payload: dict, delay: float = 0, max_attempts: Optional[int] = None):
+    await conn.execute(
+        """WITH job AS (
+               INSERT INTO jobs (kind, payload, run_at, max_attempts)
+               VALUES (%s, %s::jsonb, now() + %s * interval '1 second', %s)
+               RETURNING id
+           )
+           SELECT pg_notify(%s, id::text) FROM job""",
+        (kind, orjson.dumps(payload, default=json_default).decode(), delay, max_attempts or MAX_ATTEMPTS, CHANNEL)
+    )
+
+
+# Exponential with full jitter, so jobs that failed together do not all
+# retry together.
+def backoff(attempts: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+class Worker:
+    # Runs up to `concurrency` jobs at a time. Any number of these, in any
+    # number of processes, can share the table: claiming skips rows another
+    # worker has locked instead of waiting for them.
+    def __init__(self, concurrency: int = 8, kinds: Optional[list] = None):
+        self.concurrency = concurrency
+        self.kinds = kinds or sorted(handlers)
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.running: set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+        self.stopped = asyncio.Event()
+        self.stopping = False
+
+    async def claim(self, limit: int) -> list:
+        async with database.pool.connection() as conn:
+            return await (await conn.execute(
+                """UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_at = now(), locked_by = %s
+                   WHERE id IN (
+                       SELECT id FROM jobs
+                       WHERE status = 'pending' AND run_at <= now() AND kind = ANY(%s)
+                       ORDER BY run_at, id
+                       LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                   )
+                   RETURNING id, kind, payload, attempts, max_attempts""",
+                (self.name, self.kinds, limit)
+            )).fetchall()
+
+    async def execute(self, job: dict):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(handlers[job["kind"]](job["payload"]), TIMEOUT_SECONDS)
+        except Exception as e:
+            retry = not isinstance(e, JobFailed) and job["attempts"] < job["max_attempts"]
+            outcome = "retried" if retry else "failed"
+            logger.warning("job %s (%s) %s on attempt %s: %r", job["id"], job["kind"], outcome, job["attempts"], e)
+            await self.finish(
+                job, "pending" if retry else "failed", error=repr(e), delay=backoff(job["attempts"]) if retry else 0
+            )
+        else:
+            outcome = "done"
+            await self.finish(job, "done")
+        JOBS.labels(job["kind"], outcome).inc()
+        JOB_SECONDS.labels(job["kind"]).observe(time.perf_counter() - started)
+
+    # Only the worker holding the lock may settle a job; one that took so long
+    # it was reclaimed leaves the row to its new owner.
+    async def finish(self, job: dict, status: str, error: Optional[str] = None, delay: float = 0):
+        async with database.pool.connection() as conn:
+            await conn.execute(
+                """UPDATE jobs SET status = %s, last_error = %s, run_at = now() + %s * interval '1 second',
+                                   locked_at = NULL, locked_by = NULL,
+                                   finished_at = CASE WHEN %s IN ('done', 'failed') THEN now() END
+                   WHERE id = %s AND locked_by = %s""",
+                (status, error, delay, status, job["id"], self.name)
+            )
+
+    # Jobs whose worker died mid-run are handed back once their lock is well
+    # past the job timeout; done jobs are dropped after the retention period.
+    async def maintain(self):
+        async with database.pool.connection() as conn:
+            await conn.execute(
+                """UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                                   last_error = 'worker lost', locked_at = NULL, locked_by = NULL
+                   WHERE status = 'running' AND locked_at < now() - %s * interval '1 second'""",
+                (2 * TIMEOUT_SECONDS,)
+            )
+            await conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND finished_at < now() - %s * interval '1 hour'",
+                (RETENTION_HOURS,)
+            )
+
+    # Without notifications jobs are still found by polling, so a lost
+    # connection is only logged and retried.
+    async def listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(database.conninfo(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    async for _ in conn.notifies():
+                        self.wakeup.set()
+            except Exception as e:
+                logger.warning("job notifications lost, reconnecting in %ss: %r", POLL_SECONDS, e)
+                await asyncio.sleep(POLL_SECONDS)
+
+    async def run(self):
+        listener = asyncio.create_task(self.listen())
+        maintained = 0.0
+        failures = 0
+        try:
+            while not self.stopping:
+                self.wakeup.clear()
+                free = self.concurrency - len(self.running)
+                try:
+                    if time.monotonic() - maintained > MAINTENANCE_SECONDS:
+                        await self.maintain()
+                        maintained = time.monotonic()
+                    jobs = await self.claim(free) if free > 0 else []
+                    failures = 0
+                except Exception:
+                    # A database outage or pool timeout: keep the jobs in
+                    # hand running and try again, backing off.
+                    failures += 1
+                    delay = min(RETRY_MAX_SECONDS, POLL_SECONDS * 2 ** (failures - 1))
+                    logger.exception("claiming jobs failed, retrying in %.0fs", delay)
+                    try:
+                        await asyncio.wait_for(self.stopped.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for job in jobs:
+                    task = asyncio.create_task(self.execute(job))
+                    self.running.add(task)
+                    task.add_done_callback(self._done)
+                # A full batch may mean more are due; otherwise sleep until a
+                # job is queued, one finishes, or the poll interval passes.
+                if free == 0 or len(jobs) < free:
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            listener.cancel()
+            if self.running:
+                await asyncio.wait(self.running)
+
+    def _done(self, task: asyncio.Task):
+        self.running.discard(task)
+        self.wakeup.set()
+        if not task.cancelled() and task.exception() is not None:
+            # Settling the job failed; its lock expires and maintain() hands it back.
+            logger.error("could not record the outcome of a job", exc_info=task.exception())
+
+    def stop(self):
+        self.stopping = True
+        self.stopped.set()
+        self.wakeup.set()
@@ -0,0 +1,178 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from psycopg import AsyncCursor
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = (config.get('METRICS_ENABLED') or "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_SECONDS = float(config.get('SLOW_QUERY_MS') or 200) / 1000
+SQL_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+REQUESTS = Counter("lendit_http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram("lendit_http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+IN_PROGRESS = Gauge("lendit_http_requests_in_progress", "HTTP requests being handled", ["method"])
+QUERY_SECONDS = Histogram(
+    "lendit_db_query_duration_seconds", "SQL statement latency", ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+QUERY_ROWS = Counter("lendit_db_query_rows_total", "Rows returned or affected by SQL statements", ["operation"])
+QUERIES_PER_REQUEST = Histogram(
+    "lendit_db_queries_per_request", "SQL statements run while handling one request", ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 50, 100),
+)
+RATE_LIMITED = Counter("lendit_rate_limited_total", "Requests rejected by a rate limit", ["scope"])
+EXTERNAL_SECONDS = Histogram("lendit_external_call_duration_seconds", "Latency of calls to outside services", ["service", "operation"])
+JOBS = Counter("lendit_jobs_total", "Background jobs run, by outcome", ["kind", "outcome"])
+JOB_SECONDS = Histogram("lendit_job_duration_seconds", "Background job run time", ["kind"])
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+
+    # Set once the router has matched. Labelling by route template rather
+    # than raw path keeps the number of series bounded.
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+
+_children = {}
+
+
+# metric.labels() takes a lock and re-stringifies every label on each call;
+# children are looked up here instead, so the hot path is one dict hit.
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+_request: ContextVar[Optional[RequestStats]] = ContextVar("lendit_request", default=None)
+
+
+def _operation(query) -> str:
+    if isinstance(query, str):
+        keyword = query.lstrip()[:6].upper()
+        for operation in SQL_OPERATIONS:
+            if keyword.startswith(operation):
+                return operation
+    return "OTHER"
+
+
+def _record_query(query, seconds: float, rows: int):
+    if not query:
+        # The pool's liveness check sends an empty statement.
+        return
+    operation = _operation(query)
+    _child(QUERY_SECONDS, operation).observe(seconds)
+    if rows > 0:
+        _child(QUERY_ROWS, operation).inc(rows)
+    request = _request.get()
+    if request is not None:
+        request.queries += 1
+    if seconds >= SLOW_QUERY_SECONDS:
+        route = request.route if request is not None else None
+        sql = " ".join(query.split()) if isinstance(query, str) else repr(query)
+        logger.warning("Slow query (%.0f ms, %d rows, route %s): %.500s", seconds * 1000, rows, route, sql)
+
+
+# Installed as the connections' cursor_factory, so every statement run
+# through the pool is timed, whether it came from get_db or not.
+class TracedCursor(AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            _record_query(query, time.perf_counter() - started, self.rowcount)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            _record_query(query, time.perf_counter() - started, self.rowcount)
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _child(EXTERNAL_SECONDS, service, operation).observe(time.perf_counter() - started)
+
+
+# Plain ASGI rather than BaseHTTPMiddleware: no extra task per request and
+# streamed bodies pass straight through.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status_code = 500
+        request = RequestStats(scope)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _request.set(request)
+        in_progress = _child(IN_PROGRESS, method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            _request.reset(token)
+            route = request.route
+            _child(REQUESTS, method, route, status_code).inc()
+            _child(REQUEST_SECONDS, method, route).observe(elapsed)
+            _child(QUERIES_PER_REQUEST, route).observe(request.queries)
+
+
+# Re-exports the counters other components already keep (pool, cache,
+# password hasher, token cache) as gauges at scrape time.
+class ComponentCollector:
+    def __init__(self, sources: dict[str, Callable[[], dict]]):
+        self.sources = sources
+
+    def collect(self):
+        for component, source in self.sources.items():
+            for name, value in source().items():
+                yield GaugeMetricFamily(f"lendit_{component}_{name}", f"{component} {name}", value=value)
+
+
+_components: dict[str, Callable[[], dict]] = {}
+
+
+# May be called again, e.g. by each create_app(); the collector is registered
+# once and reads whichever sources are registered at scrape time.
+def register_components(sources: dict[str, Callable[[], dict]]):
+    if not _components:
+        REGISTRY.register(ComponentCollector(_components))
+    _components.update(sources)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
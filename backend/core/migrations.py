@@ -0,0 +1,196 @@
+# Versioned schema migrations from backend/migrations/.
+#
+#   python -m core.migrations status
+#   python -m core.migrations up [--to 0007] [--fake]
+#   python -m core.migrations down [--steps 1 | --to 0005]
+#
+# Each NNNN_name.sql file holds a "-- migrate:up" and a "-- migrate:down"
+# section and runs in one transaction, recorded in schema_migrations with a
+# checksum of its up section. A file whose opening comment block has a
+# "-- migrate:no-transaction" line (for CREATE INDEX CONCURRENTLY) runs one
+# statement at a time instead, so its statements must each end a line
+# with ";".
+import argparse
+import asyncio
+import hashlib
+import re
+import sys
+from pathlib import Path
+from typing import NamedTuple, Optional
+import psycopg
+from psycopg.rows import dict_row
+from core import database
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+# Held for the whole run, so two deploys cannot migrate at once.
+LOCK_KEY = 0x6c656e64  # "lend"
+
+
+class Migration(NamedTuple):
+    version: str
+    name: str
+    up: str
+    down: str
+    transactional: bool
+    checksum: str
+
+
+# "-- migrate:" lines in the comments a file opens with, before any SQL.
+def _directives(text: str) -> set:
+    directives = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            break
+        if line.startswith("-- migrate:"):
+            directives.add(line)
+    return directives
+
+
+def parse(version: str, name: str, text: str) -> Migration:
+    up, _, down = text.partition("-- migrate:down")
+    up = up.replace("-- migrate:up", "", 1).strip()
+    return Migration(
+        version, name, up, down.strip(), "-- migrate:no-transaction" not in _directives(text),
+        hashlib.sha256(up.encode()).hexdigest(),
+    )
+
+
+def load(directory: Path = MIGRATIONS_DIR) -> list:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        version, _, name = path.stem.partition("_")
+        migrations.append(parse(version, name, path.read_text()))
+    return migrations
+
+
+def _statements(script: str) -> list:
+    return [statement.strip() for statement in re.split(r";\s*$", script, flags=re.MULTILINE) if _has_sql(statement)]
+
+
+def _has_sql(statement: str) -> bool:
+    return any(line.strip() and not line.strip().startswith("--") for line in statement.splitlines())
+
+
+async def _ensure_table(conn: psycopg.AsyncConnection):
+    await conn.execute(
+        """CREATE TABLE IF NOT EXISTS schema_migrations (
+               version VARCHAR(50) PRIMARY KEY,
+               name VARCHAR(255) NOT NULL,
+               checksum CHAR(64) NOT NULL,
+               applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
+
+
+async def applied(conn: psycopg.AsyncConnection) -> dict:
+    await _ensure_table(conn)
+    async with conn.cursor(row_factory=dict_row) as cursor:
+        await cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+        rows = await cursor.fetchall()
+    return {row["version"]: row for row in rows}
+
+
+async def _run(conn: psycopg.AsyncConnection, migration: Migration, script: str, record: str, params: tuple):
+    if migration.transactional:
+        async with conn.transaction():
+            if _has_sql(script):
+                await conn.execute(script)
+            await conn.execute(record, params)
+    else:
+        for statement in _statements(script):
+            await conn.execute(statement)
+        await conn.execute(record, params)
+
+
+# conn must be in autocommit mode: each migration manages its own
+# transaction. Returns the versions applied (or only recorded, with fake).
+async def apply(conn: psycopg.AsyncConnection, target: Optional[str] = None, fake: bool = False) -> list:
+    await conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    try:
+        done = await applied(conn)
+        versions = []
+        for migration in load():
+            if migration.version in done:
+                continue
+            if target is not None and migration.version > target:
+                break
+            await _run(
+                conn, migration, "" if fake else migration.up,
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum),
+            )
+            versions.append(migration.version)
+        return versions
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+
+
+# Rolls back the newest `steps` migrations, or every one after target.
+async def rollback(conn: psycopg.AsyncConnection, steps: int = 1, target: Optional[str] = None) -> list:
+    await conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    try:
+        done = await applied(conn)
+        by_version = {migration.version: migration for migration in load()}
+        versions = []
+        for version in sorted(done, reverse=True):
+            if target is not None and version <= target:
+                break
+            if target is None and len(versions) >= steps:
+                break
+            migration = by_version.get(version)
+            if migration is None:
+                raise RuntimeError(f"migration {version} is applied but its file is gone")
+            await _run(conn, migration, migration.down, "DELETE FROM schema_migrations WHERE version = %s", (version,))
+            versions.append(version)
+        return versions
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+
+
+# (version, name, state) in order; state is applied, pending, changed (the
+# file was edited after it ran) or missing (applied, no file).
+async def status(conn: psycopg.AsyncConnection) -> list:
+    done = await applied(conn)
+    rows = []
+    for migration in load():
+        row = done.pop(migration.version, None)
+        if row is None:
+            state = "pending"
+        elif row["checksum"] != migration.checksum:
+            state = "changed"
+        else:
+            state = "applied"
+        rows.append((migration.version, migration.name, state))
+    rows.extend((version, row["name"], "missing") for version, row in done.items())
+    return sorted(rows)
+
+
+async def main(args) -> int:
+    async with await psycopg.AsyncConnection.connect(database.conninfo(args.database), autocommit=True) as conn:
+        if args.command == "up":
+            versions = await apply(conn, target=args.to, fake=args.fake)
+            print(f"{'recorded' if args.fake else 'applied'}: {', '.join(versions) or 'nothing to do'}")
+        elif args.command == "down":
+            versions = await rollback(conn, steps=args.steps, target=args.to)
+            print(f"rolled back: {', '.join(versions) or 'nothing to do'}")
+        else:
+            rows = await status(conn)
+            for version, name, state in rows:
+                print(f"{version}  {state:8}  {name}")
+            return 1 if any(state != "applied" for _, _, state in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply, roll back or inspect schema migrations")
+    parser.add_argument("--database", help="database name (default: DATABASE from .env)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="list migrations; exits 1 unless all are applied and unchanged")
+    up = commands.add_parser("up", help="apply pending migrations")
+    up.add_argument("--to", help="stop after this version")
+    up.add_argument("--fake", action="store_true", help="record as applied without running, for databases built by hand")
+    down = commands.add_parser("down", help="roll back applied migrations")
+    down.add_argument("--steps", type=int, default=1)
+    down.add_argument("--to", help="roll back every migration after this version")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,29 @@
+import psycopg
+from core import jobs
+from core.config import config
+from core.metrics import external_call
+
+# Item changes are POSTed here as {"event": ..., "items": [...]}; unset, no
+# jobs are queued at all.
+ITEM_WEBHOOK_URL = config.get('ITEM_WEBHOOK_URL')
+WEBHOOK_TIMEOUT_SECONDS = float(config.get('WEBHOOK_TIMEOUT_SECONDS') or 10)
+
+
+# Queued in the transaction that changes the items, so a notification goes
+# out exactly when the change commits.
+async def item_changed(conn: psycopg.AsyncConnection, event: str, items: list):
+    if ITEM_WEBHOOK_URL and items:
+        await jobs.enqueue(conn, "item.changed", {"event": event, "items": items})
+
+
+@jobs.handler("item.changed")
+async def deliver_item_change(payload: dict):
+    # Only the job workers deliver, so only they import httpx.
+    import httpx
+    with external_call("webhook", "item_changed"):
+        async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT_SECONDS) as client:
+            response = await client.post(ITEM_WEBHOOK_URL, json=payload)
+    # Other client errors will not go away by sending the same body again.
+    if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+        raise jobs.JobFailed(f"webhook rejected the event: {response.status_code}")
+    response.raise_for_status()
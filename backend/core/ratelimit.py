@@ -0,0 +1,175 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from fastapi import HTTPException, Request, status
+from core.config import config
+from core.metrics import RATE_LIMITED
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is only needed for RATE_LIMIT_BACKEND=redis
+    redis = None
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Per-IP limits for each router, overridable with RATE_LIMIT_<ROUTER>.
+DEFAULT_LIMITS = {
+    "items": "300/minute",
+    "users": "120/minute",
+    "auth": "30/minute",
+    "bookings": "120/minute",
+}
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens added per second
+    burst: float  # bucket capacity
+
+
+# "20/minute" allows a burst of 20 that refills at 20 per minute.
+def parse_limit(raw: Optional[str]) -> Optional[Limit]:
+    if not raw:
+        return None
+    count, period = raw.strip().split("/")
+    return Limit(float(count) / PERIODS[period.strip()], float(count))
+
+
+class MemoryBucketStore:
+    # Buckets are spread over independently locked shards so threadpool
+    # handlers do not serialise on one lock. Each shard forgets its least
+    # recently used buckets past max_keys; a forgotten bucket comes back
+    # full, which only ever errs towards letting a request through.
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+
+    # cost=0 only looks: it answers whether a token is there without
+    # taking it.
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> float:
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.pop(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= cost
+            else:
+                wait = (1 - tokens) / limit.rate
+            buckets[key] = (tokens, now)
+            if len(buckets) > self.max_keys_per_shard:
+                buckets.popitem(last=False)
+        return wait
+
+
+# Refill and take in one atomic step on the server, timed by the server's
+# clock so workers on different hosts agree. Returns the wait as a string:
+# Lua numbers are truncated to integers on the way out.
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - cost
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    # Shared by every worker. Any client with redis.asyncio's
+    # register_script works, including Redis-compatible servers.
+    def __init__(self, client, prefix: str = "lendit:ratelimit:"):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[limit.rate, limit.burst, cost]))
+
+
+class RateLimiter:
+    def __init__(self, store, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+
+    # Takes a token without ever rejecting, for charging after the fact.
+    async def charge(self, scope: str, key: str, limit: Optional[Limit]):
+        if self.enabled and limit is not None:
+            await self.store.take(f"{scope}:{key}", limit)
+
+    async def hit(self, scope: str, key: str, limit: Optional[Limit], cost: int = 1):
+        if not self.enabled or limit is None:
+            return
+        wait = await self.store.take(f"{scope}:{key}", limit, cost)
+        if wait > 0:
+            RATE_LIMITED.labels(scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+def build_store():
+    if (config.get('RATE_LIMIT_BACKEND') or "memory") == "redis":
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        return RedisBucketStore(redis.from_url(config.get('REDIS_URL') or "redis://localhost:6379/0"))
+    return MemoryBucketStore(max_keys=int(config.get('RATE_LIMIT_MAX_KEYS') or 100000))
+
+
+limiter = RateLimiter(build_store(), enabled=(config.get('RATE_LIMIT_ENABLED') or "true").lower() in ("1", "true", "yes"))
+TRUST_PROXY = (config.get('RATE_LIMIT_TRUST_PROXY') or "false").lower() in ("1", "true", "yes")
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+# Router-level dependency: a bucket per client IP for the whole router and,
+# when RATE_LIMIT_<ROUTER>_ROUTE is set, one per route shared by all
+# clients. Runs before the route's own dependencies, so a rejected request
+# never checks out a connection.
+def rate_limit(router: str):
+    per_ip = parse_limit(config.get(f'RATE_LIMIT_{router.upper()}') or DEFAULT_LIMITS.get(router))
+    per_route = parse_limit(config.get(f'RATE_LIMIT_{router.upper()}_ROUTE'))
+
+    async def dependency(request: Request):
+        await limiter.hit(router, f"ip:{client_ip(request)}", per_ip)
+        if per_route is not None:
+            await limiter.hit(router, f"route:{request.method}:{request.scope['route'].path}", per_route)
+
+    return dependency
+
+
+LOGIN_ACCOUNT_LIMIT = parse_limit(config.get('RATE_LIMIT_LOGIN_ACCOUNT') or "10/minute")
+
+
+# Caps failed attempts per account however many IPs they come from. The
+# check, which runs before the database is touched, only looks at the
+# bucket; failures alone drain it, so the owner's own logins never count.
+def _login_key(username: str) -> str:
+    return f"account:{username.strip().lower()}"
+
+
+async def check_login_account(username: str):
+    await limiter.hit("login", _login_key(username), LOGIN_ACCOUNT_LIMIT, cost=0)
+
+
+async def charge_failed_login(username: str):
+    await limiter.charge("login", _login_key(username), LOGIN_ACCOUNT_LIMIT)
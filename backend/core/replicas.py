@@ -0,0 +1,264 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+import psycopg
+from fastapi import Request
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from core import database
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Streaming replicas of the primary as "host:port,host:port". Unset, every
+# read goes to the primary as before.
+REPLICA_HOSTS = [host.strip() for host in (config.get('DATABASE_REPLICAS') or "").split(",") if host.strip()]
+MAX_LAG_SECONDS = float(config.get('REPLICA_MAX_LAG_MS') or 5000) / 1000
+CHECK_INTERVAL_SECONDS = float(config.get('REPLICA_CHECK_INTERVAL_MS') or 500) / 1000
+CHECKOUT_TIMEOUT_SECONDS = float(config.get('REPLICA_CHECKOUT_TIMEOUT_MS') or 1000) / 1000
+MAX_FAILURES = int(config.get('REPLICA_MAX_FAILURES') or 2)
+
+SESSION_COOKIE = "lendit_lsn"
+# A replica within MAX_LAG_SECONDS can still hand out, and the item cache
+# keep, rows from before a write for about twice that long; the session
+# that wrote is pinned to caught-up servers and fresh reads until then.
+SESSION_SECONDS = math.ceil(2 * MAX_LAG_SECONDS + CHECK_INTERVAL_SECONDS)
+# How long the item cache keeps rows that may come from a replica.
+CACHE_SECONDS = max(1, math.ceil(MAX_LAG_SECONDS))
+
+LAG_QUERY = """SELECT pg_is_in_recovery() AS in_recovery,
+                      CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()::text END AS lsn"""
+
+
+# "16/B374D848" -> an integer that orders the same way.
+def parse_lsn(text: Optional[str]) -> Optional[int]:
+    if not text:
+        return None
+    try:
+        high, low = text.split("/")
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return None
+
+
+# Replica pools hand out this class, so callers can tell where a connection
+# came from without tracking it.
+class ReplicaConnection(psycopg.AsyncConnection):
+    pass
+
+
+def on_replica(conn: psycopg.AsyncConnection) -> bool:
+    return isinstance(conn, ReplicaConnection)
+
+
+class Replica:
+    def __init__(self, address: str):
+        host, _, port = address.partition(":")
+        self.address = address
+        self.pool: AsyncConnectionPool = database.build_pool(
+            database.conninfo(host=host, port=int(port) if port else None), connection_class=ReplicaConnection
+        )
+        self.healthy = False
+        self.failures = 0
+        self.replay_lsn: Optional[int] = None
+        self.lag = math.inf
+
+    # Lag is measured against the primary's own WAL position as sampled over
+    # recent checks: the time since the newest sample this replica has
+    # replayed up to. Unlike pg_last_xact_replay_timestamp() it stays near
+    # zero while the primary is idle and keeps growing when replication stops.
+    async def check(self, primary_samples: deque):
+        try:
+            async with self.pool.connection(timeout=CHECKOUT_TIMEOUT_SECONDS) as conn:
+                row = await (await conn.execute(LAG_QUERY)).fetchone()
+        except (psycopg.Error, PoolTimeout) as e:
+            self.fail(f"health check failed: {e}")
+            return
+        if not row["in_recovery"]:
+            # Promoted, or never was a standby: its WAL no longer follows ours.
+            self.fail("is not in recovery")
+            return
+        self.replay_lsn = parse_lsn(row["lsn"])
+        caught_up = [at for at, lsn in primary_samples if self.replay_lsn is not None and lsn <= self.replay_lsn]
+        self.lag = time.monotonic() - max(caught_up) if caught_up else math.inf
+        self.failures = 0
+        if not self.healthy:
+            logger.info("replica %s is back", self.address)
+        self.healthy = True
+
+    def fail(self, reason: str):
+        self.failures += 1
+        if self.healthy and self.failures >= MAX_FAILURES:
+            logger.warning("ejecting replica %s: %s", self.address, reason)
+            self.healthy = False
+
+    def eject(self, reason: str):
+        self.failures = MAX_FAILURES
+        if self.healthy:
+            logger.warning("ejecting replica %s: %s", self.address, reason)
+        self.healthy = False
+
+    def usable(self, min_lsn: Optional[int]) -> bool:
+        return (
+            self.healthy and self.lag <= MAX_LAG_SECONDS
+            and (min_lsn is None or (self.replay_lsn is not None and self.replay_lsn >= min_lsn))
+        )
+
+
+class ReplicaSet:
+    def __init__(self, addresses: list):
+        self.replicas = [Replica(address) for address in addresses]
+        self.primary_samples = deque(maxlen=math.ceil(MAX_LAG_SECONDS / CHECK_INTERVAL_SECONDS) + 2)
+        self._next = itertools.count()
+        self._monitor: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    async def open(self):
+        for replica in self.replicas:
+            await replica.pool.open(wait=False)
+        await self.check()
+        self._monitor = asyncio.create_task(self.monitor())
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for replica in self.replicas:
+            await replica.pool.close()
+
+    async def check(self):
+        try:
+            # Short, like the replica checks: open() runs this in the
+            # lifespan, which must not wait out the pool's own timeout.
+            async with database.pool.connection(timeout=CHECKOUT_TIMEOUT_SECONDS) as conn:
+                row = await (await conn.execute("SELECT pg_current_wal_lsn()::text AS lsn")).fetchone()
+            self.primary_samples.append((time.monotonic(), parse_lsn(row["lsn"])))
+        except (psycopg.Error, PoolTimeout) as e:
+            logger.warning("could not read the primary's WAL position: %s", e)
+        await asyncio.gather(*(replica.check(self.primary_samples) for replica in self.replicas))
+
+    async def monitor(self):
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("replica check failed")
+
+    # Round robin over the replicas fit to serve a read that must see
+    # min_lsn; None when only the primary will do.
+    def choose(self, min_lsn: Optional[int] = None) -> Optional[Replica]:
+        usable = [replica for replica in self.replicas if replica.usable(min_lsn)]
+        if not usable:
+            return None
+        return usable[next(self._next) % len(usable)]
+
+    def metrics(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        return {
+            "replicas": len(self.replicas),
+            "healthy": len(healthy),
+            "max_lag_seconds": max((replica.lag for replica in healthy), default=0),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_set: Optional[ReplicaSet] = None
+
+
+# How long the item cache keeps a row. With replicas in use it may have been
+# read from one, after a write whose invalidation already ran, so it is only
+# kept as long as a replica may lag.
+def cache_ttl() -> Optional[float]:
+    return CACHE_SECONDS if replica_set is not None else None
+
+
+async def open_replicas():
+    global replica_set
+    if REPLICA_HOSTS and replica_set is None:
+        replica_set = ReplicaSet(REPLICA_HOSTS)
+        await replica_set.open()
+        database.track_write_lsn = True
+
+
+async def close_replicas():
+    global replica_set
+    if replica_set is not None:
+        await replica_set.close()
+        replica_set = None
+        database.track_write_lsn = False
+
+
+def replica_metrics():
+    return replica_set.metrics() if replica_set is not None else {}
+
+
+# The WAL position of this session's last write, if it is recent enough to
+# matter.
+def session_lsn(request: Request) -> Optional[int]:
+    return parse_lsn(request.cookies.get(SESSION_COOKIE))
+
+
+# A connection for a read that must see min_lsn: a replica when one is
+# healthy, close enough and far enough along, otherwise the primary. A
+# replica that fails to hand out a connection is ejected on the spot and
+# the read falls back to the primary.
+@asynccontextmanager
+async def read_connection(min_lsn: Optional[int] = None):
+    replica = replica_set.choose(min_lsn) if replica_set is not None else None
+    if replica is not None:
+        try:
+            conn = await replica.pool.getconn(timeout=CHECKOUT_TIMEOUT_SECONDS)
+        except (psycopg.OperationalError, PoolTimeout) as e:
+            replica.eject(f"checkout failed: {e}")
+        else:
+            replica_set.replica_reads += 1
+            try:
+                yield conn
+                # End the read transaction, as pool.connection() would.
+                await conn.commit()
+            except psycopg.OperationalError as e:
+                replica.eject(f"query failed: {e}")
+                raise
+            finally:
+                await replica.pool.putconn(conn)
+            return
+    if replica_set is not None:
+        replica_set.primary_reads += 1
+    async with database.pool.connection() as conn:
+        yield conn
+
+
+# get_db for read-only handlers.
+async def get_read_db(request: Request):
+    async with read_connection(session_lsn(request)) as conn:
+        async with conn.cursor() as cursor:
+            yield conn, cursor
+
+
+# get_db leaves the primary's WAL position after a write in request.state;
+# this hands it to the client as a short-lived cookie, so its next reads
+# skip replicas that have not replayed that far. Plain ASGI because the
+# header is only known once dependency cleanup has run.
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in database.SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                lsn = scope.get("state", {}).get("write_lsn")
+                if lsn is not None:
+                    cookie = f"{SESSION_COOKIE}={lsn}; Max-Age={SESSION_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                    message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
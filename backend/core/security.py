@@ -0,0 +1,88 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+from fastapi import HTTPException, status
+from core.config import config
+
+
+# Built once per worker process, on first use, so passlib is not imported
+# until a password is hashed. Pinning min/max rounds to the configured cost
+# makes verify_and_update hand back a fresh hash for anything hashed under a
+# different cost.
+@lru_cache
+def _crypt_context(rounds: int):
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> tuple[bool, Optional[str]]:
+    return _crypt_context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, workers: Optional[int] = None, max_pending: int = 64, use_processes: bool = False):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # bcrypt releases the GIL, so threads are enough by default; a
+            # process pool is available for backends that hold it.
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    # Returns (valid, new_hash); new_hash is set when the stored hash used an
+    # outdated cost and should be replaced.
+    async def verify(self, password: str, hashed: str) -> tuple[bool, Optional[str]]:
+        return await self._submit(_verify_and_update, password, hashed, self.rounds)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self):
+        return {"pending": self.pending, "rejected": self.rejected, "workers": self.workers}
+
+
+password_hasher = PasswordHasher(
+    rounds=int(config.get('BCRYPT_ROUNDS') or 12),
+    workers=int(config.get('PASSWORD_HASH_WORKERS') or 0) or None,
+    max_pending=int(config.get('PASSWORD_HASH_MAX_PENDING') or 64),
+    use_processes=(config.get('PASSWORD_HASH_EXECUTOR') or "thread") == "process",
+)
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Optional
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from core.config import config
+
+# LEAN_RESPONSES=true skips response_model validation for rows read straight
+# from the database and writes JSON with orjson. Off by default.
+LEAN_RESPONSES = (config.get('LEAN_RESPONSES') or "false").lower() in ("1", "true", "yes")
+
+
+# orjson's default= hook for the values it cannot encode itself: NUMERIC
+# columns come back as Decimal.
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+class LeanJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        # OPT_UTC_Z writes "Z" for UTC, like pydantic does.
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+@lru_cache
+def _layout(model: type[BaseModel]) -> tuple[tuple, tuple]:
+    fields = tuple((name, field.get_default()) for name, field in model.model_fields.items())
+    computed = tuple((name, info.wrapped_property.fget) for name, info in model.model_computed_fields.items())
+    return fields, computed
+
+
+# Row -> response dict without validation: only the model's fields, in its
+# order, plus its computed fields evaluated against the row's values.
+def project(model: type[BaseModel], row: dict) -> dict:
+    fields, computed = _layout(model)
+    data = {name: row.get(name, default) for name, default in fields}
+    if computed:
+        view = SimpleNamespace(**data)
+        for name, getter in computed:
+            data[name] = getter(view)
+    return data
+
+
+def project_rows(model: type[BaseModel], rows: list) -> list:
+    if not LEAN_RESPONSES:
+        return rows
+    return [project(model, row) for row in rows]
+
+
+# Handlers return respond(content): the plain content, validated against
+# response_model as usual, or a ready response that FastAPI passes through
+# untouched. Only use it for content built from project()ed rows. Headers
+# set on the handler's injected Response are carried over either way.
+def respond(content: Any, response: Optional[Response] = None, status_code: int = 200):
+    if not LEAN_RESPONSES:
+        return content
+    lean = LeanJSONResponse(content, status_code=status_code)
+    if response is not None:
+        lean.raw_headers.extend(response.raw_headers)
+    return lean
@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from pathlib import Path
+from core.config import config
+
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+KNOWN_KEYS = 10000
+
+
+class StorageBackend:
+    # put() is blocking and is always called off the event loop.
+    def put(self, key: str, path: str) -> str:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    # URL an object will be served from once put() finishes, so background
+    # uploads can hand it out before the transfer completes.
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class CloudinaryStorage(StorageBackend):
+    # exists() goes to the Admin API, which is rate limited, so keys known to
+    # be stored are remembered. Objects are content-addressed and never
+    # deleted, so a remembered key cannot go stale.
+    def __init__(self):
+        self._known = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._known[key] = None
+            self._known.move_to_end(key)
+            while len(self._known) > KNOWN_KEYS:
+                self._known.popitem(last=False)
+
+    # Imported and configured on first use rather than with the app, so
+    # processes that never touch storage do not pay for the SDK.
+    @cached_property
+    def sdk(self):
+        import cloudinary
+        import cloudinary.api
+        import cloudinary.uploader
+        cloudinary.config(
+            cloud_name=config.get('CLOUDINARY_CLOUD_NAME') or "djopmrv4e",
+            api_key=config.get('CLOUDINARY_API_KEY') or "473857625732351",
+            api_secret=config.get('CLOUDINARY_API_SECRET') or "<your_api_secret>",
+            secure=True,
+        )
+        return cloudinary
+
+    def put(self, key: str, path: str) -> str:
+        # upload_large sends the file in chunks instead of one request body.
+        # overwrite=False: a concurrent upload of the same photo that got
+        # there first is kept rather than stored again.
+        result = self.sdk.uploader.upload_large(
+            path, public_id=os.path.splitext(key)[0], chunk_size=UPLOAD_CHUNK_SIZE, overwrite=False
+        )
+        self._remember(key)
+        return result['secure_url']
+
+    def exists(self, key: str) -> bool:
+        if key in self._known:
+            self._remember(key)
+            return True
+        try:
+            self.sdk.api.resource(os.path.splitext(key)[0])
+        except self.sdk.exceptions.NotFound:
+            return False
+        self._remember(key)
+        return True
+
+    def url_for(self, key: str) -> str:
+        public_id, extension = os.path.splitext(key)
+        return self.sdk.CloudinaryImage(public_id).build_url(secure=True, format=extension.lstrip(".") or None)
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def put(self, key: str, path: str) -> str:
+        shutil.copyfile(path, self.root / key)
+        return self.url_for(key)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+_storage: StorageBackend = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if (config.get('STORAGE_BACKEND') or "cloudinary") == "local":
+            _storage = LocalStorage(config.get('LOCAL_STORAGE_DIR') or "media", config.get('LOCAL_STORAGE_URL') or "/media")
+        else:
+            _storage = CloudinaryStorage()
+    return _storage
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from jose import JWTError, jwt
+from core.config import config
+
+DEFAULT_KID = "default"
+
+
+class KeyRing:
+    # kid -> key used to verify tokens carrying that kid. Only the active kid
+    # needs a signing key, so services that just verify can be given public
+    # keys alone.
+    def __init__(self, algorithm: str, verification_keys: dict, active_kid: Optional[str] = None, signing_key=None):
+        if not verification_keys:
+            raise ValueError("at least one JWT verification key is required")
+        self.algorithm = algorithm
+        self.verification_keys = verification_keys
+        self.active_kid = active_kid or next(iter(verification_keys))
+        self.signing_key = signing_key
+
+    def sign(self, claims: dict) -> str:
+        if self.signing_key is None:
+            raise RuntimeError(f"no signing key loaded for kid {self.active_kid!r}")
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm, headers={"kid": self.active_kid})
+
+    def verify(self, token: str) -> dict:
+        # Tokens issued before key rotation carry no kid; they were signed
+        # with what is now the "default" key.
+        kid = jwt.get_unverified_header(token).get("kid") or DEFAULT_KID
+        key = self.verification_keys.get(kid)
+        if key is None:
+            raise JWTError(f"unknown key id {kid!r}")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+def load_keyring() -> KeyRing:
+    algorithm = config.get('JWT_ALGORITHM') or "HS256"
+    active_kid = config.get('JWT_ACTIVE_KID')
+
+    if algorithm.startswith("HS"):
+        # JWT_KEYS="kid1:secret1,kid2:secret2"; falls back to the single
+        # JWT_SECRET_KEY under the default kid.
+        keys = {}
+        for entry in (config.get('JWT_KEYS') or "").split(","):
+            if entry.strip():
+                kid, secret = entry.strip().split(":", 1)
+                keys[kid] = secret
+        if not keys:
+            keys[DEFAULT_KID] = os.getenv("JWT_SECRET_KEY") or config.get('JWT_SECRET_KEY') or "your-secret-key"
+        active_kid = active_kid or next(iter(keys))
+        return KeyRing(algorithm, keys, active_kid, keys.get(active_kid))
+
+    # Asymmetric keys are read from JWT_KEYS_DIR: <kid>.pub.pem to verify and,
+    # for the active kid only, <kid>.pem to sign.
+    keys_dir = Path(config.get('JWT_KEYS_DIR') or "keys")
+    keys = {path.name[:-len(".pub.pem")]: path.read_text() for path in sorted(keys_dir.glob("*.pub.pem"))}
+    if not active_kid:
+        raise ValueError(f"JWT_ACTIVE_KID is required for {algorithm}")
+    private_key = keys_dir / f"{active_kid}.pem"
+    return KeyRing(algorithm, keys, active_kid, private_key.read_text() if private_key.exists() else None)
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, token: str, value, expires_at: float):
+        self._entries[self._key(token)] = (value, expires_at)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_keyring: Optional[KeyRing] = None
+token_cache = VerifiedTokenCache(int(config.get('JWT_CACHE_SIZE') or 10000))
+
+
+def get_keyring() -> KeyRing:
+    global _keyring
+    if _keyring is None:
+        _keyring = load_keyring()
+    return _keyring
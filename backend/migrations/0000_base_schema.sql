@@ -0,0 +1,36 @@
+-- migrate:up
+-- The original users and items tables, so an empty database (such as the
+-- benchmark harness's disposable one) can be built from migrations alone.
+-- IF NOT EXISTS keeps this a no-op on databases that already have them.
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    phone_number VARCHAR(15),
+    college_id_url TEXT,
+    role VARCHAR(20) NOT NULL DEFAULT 'renter',
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description VARCHAR(500),
+    price_per_hour NUMERIC(10, 2),
+    price_per_day NUMERIC(10, 2),
+    category VARCHAR(50),
+    location VARCHAR(100) NOT NULL,
+    is_available BOOLEAN NOT NULL DEFAULT TRUE,
+    images TEXT[],
+    owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ
+);
+
+-- migrate:down
+DROP TABLE IF EXISTS items;
+DROP TABLE IF EXISTS users;
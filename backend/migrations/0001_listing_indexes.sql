@@ -0,0 +1,22 @@
+-- migrate:up
+-- Keyset pagination walks (created_at, id) newest first; each filter gets a
+-- composite index with the same trailing order so filtered pages stay an
+-- index range scan.
+CREATE INDEX IF NOT EXISTS items_created_at_id_idx ON items (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS items_category_created_at_id_idx ON items (category, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS items_is_available_created_at_id_idx ON items (is_available, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS items_location_pattern_idx ON items (location text_pattern_ops);
+CREATE INDEX IF NOT EXISTS items_price_per_day_idx ON items (price_per_day);
+
+CREATE INDEX IF NOT EXISTS users_created_at_id_idx ON users (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS users_role_created_at_id_idx ON users (role, created_at DESC, id DESC);
+
+-- migrate:down
+DROP INDEX IF EXISTS users_role_created_at_id_idx;
+DROP INDEX IF EXISTS users_created_at_id_idx;
+
+DROP INDEX IF EXISTS items_price_per_day_idx;
+DROP INDEX IF EXISTS items_location_pattern_idx;
+DROP INDEX IF EXISTS items_is_available_created_at_id_idx;
+DROP INDEX IF EXISTS items_category_created_at_id_idx;
+DROP INDEX IF EXISTS items_created_at_id_idx;
@@ -0,0 +1,17 @@
+-- migrate:up
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Name outranks category, which outranks description.
+ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS items_search_vector_idx ON items USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS items_name_trgm_idx ON items USING gin (name gin_trgm_ops);
+
+-- migrate:down
+DROP INDEX IF EXISTS items_name_trgm_idx;
+DROP INDEX IF EXISTS items_search_vector_idx;
+ALTER TABLE items DROP COLUMN IF EXISTS search_vector;
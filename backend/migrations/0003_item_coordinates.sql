@@ -0,0 +1,20 @@
+-- migrate:up
+-- earthdistance (on top of cube) rather than PostGIS: it ships with the
+-- standard contrib package and radius queries are all we need.
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+ALTER TABLE items
+    ADD COLUMN IF NOT EXISTS latitude double precision CHECK (latitude BETWEEN -90 AND 90),
+    ADD COLUMN IF NOT EXISTS longitude double precision CHECK (longitude BETWEEN -180 AND 180),
+    ADD CONSTRAINT items_coordinates_together CHECK ((latitude IS NULL) = (longitude IS NULL));
+
+CREATE INDEX IF NOT EXISTS items_earth_location_idx ON items
+    USING gist (ll_to_earth(latitude, longitude));
+
+-- migrate:down
+DROP INDEX IF EXISTS items_earth_location_idx;
+ALTER TABLE items
+    DROP CONSTRAINT IF EXISTS items_coordinates_together,
+    DROP COLUMN IF EXISTS longitude,
+    DROP COLUMN IF EXISTS latitude;
@@ -0,0 +1,23 @@
+-- migrate:up
+-- btree_gist lets the exclusion constraint mix = on item_id with && on the range.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id SERIAL PRIMARY KEY,
+    item_id INTEGER NOT NULL REFERENCES items (id) ON DELETE CASCADE,
+    renter_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    period TSTZRANGE NOT NULL CHECK (NOT isempty(period) AND NOT lower_inf(period) AND NOT upper_inf(period)),
+    status VARCHAR(20) NOT NULL DEFAULT 'confirmed' CHECK (status IN ('confirmed', 'cancelled')),
+    quoted_price NUMERIC(10, 2) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ,
+    -- Double-booking is impossible at the storage level, however many
+    -- requests race; the GiST index behind it also serves availability
+    -- lookups by (item_id, period).
+    CONSTRAINT bookings_no_overlap EXCLUDE USING gist (item_id WITH =, period WITH &&) WHERE (status = 'confirmed')
+);
+
+CREATE INDEX IF NOT EXISTS bookings_renter_id_created_at_idx ON bookings (renter_id, created_at DESC);
+
+-- migrate:down
+DROP TABLE IF EXISTS bookings;
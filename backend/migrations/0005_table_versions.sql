@@ -0,0 +1,33 @@
+-- migrate:up
+-- One row per table, bumped in the writing transaction by a statement-level
+-- trigger. List endpoints read it as their ETag / Last-Modified; because the
+-- bump commits with the data, a reader that fetches the version before the
+-- rows can only ever pair new rows with an older version, never the reverse.
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO table_versions (name) VALUES ('items'), ('users') ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1, updated_at = clock_timestamp() WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS items_bump_version ON items;
+CREATE TRIGGER items_bump_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS users_bump_version ON users;
+CREATE TRIGGER users_bump_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+-- migrate:down
+DROP TRIGGER IF EXISTS users_bump_version ON users;
+DROP TRIGGER IF EXISTS items_bump_version ON items;
+DROP FUNCTION IF EXISTS bump_table_version();
+DROP TABLE IF EXISTS table_versions;
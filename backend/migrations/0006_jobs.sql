@@ -0,0 +1,26 @@
+-- migrate:up
+-- Outbox and job queue in one: rows are inserted in the same transaction as
+-- the change that causes them and claimed by workers with FOR UPDATE SKIP
+-- LOCKED (see core/jobs.py).
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 8,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMPTZ,
+    locked_by VARCHAR(255),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMPTZ
+);
+
+-- Small partial indexes: workers only ever look for due, stuck or expired rows.
+CREATE INDEX IF NOT EXISTS jobs_due_idx ON jobs (run_at, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS jobs_done_idx ON jobs (finished_at) WHERE status = 'done';
+
+-- migrate:down
+DROP TABLE IF EXISTS jobs;
@@ -0,0 +1,15 @@
+-- migrate:up
+-- migrate:no-transaction
+-- Built CONCURRENTLY so the tables stay writable while the indexes build.
+
+-- Deleting a user cascades to their items, and bulk item operations look up
+-- ownership; without this both scan the whole table.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS items_owner_id_idx ON items (owner_id);
+
+-- The users listing filtered by is_active, in keyset order like the others.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_is_active_created_at_id_idx ON users (is_active, created_at DESC, id DESC);
+
+-- migrate:down
+-- migrate:no-transaction
+DROP INDEX CONCURRENTLY IF EXISTS users_is_active_created_at_id_idx;
+DROP INDEX CONCURRENTLY IF EXISTS items_owner_id_idx;
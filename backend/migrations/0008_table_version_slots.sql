@@ -0,0 +1,89 @@
+-- migrate:up
+-- With one table_versions row per table, every transaction writing items or
+-- users held that row's lock until commit, so all of them ran one at a time
+-- (python -m benchmarks.table_versions measures it). The counter is now
+-- striped over 16 slots, each connection bumping the one its backend pid
+-- picks, and readers sum the slots. Every commit that bumps still raises
+-- the sum, but only transactions whose connections share a slot wait for
+-- each other, and only for as long as the one holding it takes to commit.
+--
+-- Statements that change no rows no longer bump, so they no longer retire
+-- every cached listing page. Each event needs its own trigger because a
+-- trigger with a transition table may only have one.
+--
+-- Last-Modified is the newest bump across the slots. A transaction that
+-- commits after a later-bumping one can leave it unchanged, so clients
+-- that revalidate with If-Modified-Since alone may keep a listing for up to
+-- a transaction's length; the ETag always changes.
+ALTER TABLE table_versions ADD COLUMN IF NOT EXISTS slot SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE table_versions DROP CONSTRAINT IF EXISTS table_versions_pkey;
+ALTER TABLE table_versions ADD PRIMARY KEY (name, slot);
+
+INSERT INTO table_versions (name, slot)
+SELECT name, slot FROM (VALUES ('items'), ('users')) AS tables (name) CROSS JOIN generate_series(0, 15) AS slot
+ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    -- TRUNCATE has no transition table and always empties the table.
+    IF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM changed) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    UPDATE table_versions SET version = version + 1, updated_at = clock_timestamp()
+    WHERE name = TG_TABLE_NAME AND slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS items_bump_version ON items;
+CREATE TRIGGER items_bump_version_insert AFTER INSERT ON items
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER items_bump_version_update AFTER UPDATE ON items
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER items_bump_version_delete AFTER DELETE ON items
+    REFERENCING OLD TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER items_bump_version_truncate AFTER TRUNCATE ON items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS users_bump_version ON users;
+CREATE TRIGGER users_bump_version_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER users_bump_version_update AFTER UPDATE ON users
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER users_bump_version_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER users_bump_version_truncate AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+-- migrate:down
+DROP TRIGGER IF EXISTS users_bump_version_truncate ON users;
+DROP TRIGGER IF EXISTS users_bump_version_delete ON users;
+DROP TRIGGER IF EXISTS users_bump_version_update ON users;
+DROP TRIGGER IF EXISTS users_bump_version_insert ON users;
+DROP TRIGGER IF EXISTS items_bump_version_truncate ON items;
+DROP TRIGGER IF EXISTS items_bump_version_delete ON items;
+DROP TRIGGER IF EXISTS items_bump_version_update ON items;
+DROP TRIGGER IF EXISTS items_bump_version_insert ON items;
+
+-- Fold the slots back into slot 0 so versions keep counting up.
+UPDATE table_versions AS kept SET version = totals.version, updated_at = totals.updated_at
+FROM (SELECT name, sum(version)::bigint AS version, max(updated_at) AS updated_at FROM table_versions GROUP BY name) AS totals
+WHERE kept.name = totals.name AND kept.slot = 0;
+DELETE FROM table_versions WHERE slot <> 0;
+ALTER TABLE table_versions DROP CONSTRAINT table_versions_pkey;
+ALTER TABLE table_versions DROP COLUMN slot;
+ALTER TABLE table_versions ADD PRIMARY KEY (name);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1, updated_at = clock_timestamp() WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_bump_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+CREATE TRIGGER users_bump_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
@@ -0,0 +1,18 @@
+-- migrate:up
+-- The bytes of queued uploads, written in the same transaction as their
+-- storage.upload job, so a worker on any host can store them and a rolled
+-- back request leaves neither behind. The job deletes them once the image
+-- is stored or rejected; a job that runs out of attempts keeps them, so it
+-- can be requeued.
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    upload_id UUID NOT NULL,
+    seq INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_id, seq)
+);
+-- Images are already compressed; do not let TOAST try again.
+ALTER TABLE upload_chunks ALTER COLUMN data SET STORAGE EXTERNAL;
+
+-- migrate:down
+DROP TABLE IF EXISTS upload_chunks;
@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List
+from datetime import datetime
+
+class BookingCreate(BaseModel):
+    item_id: int = Field(..., description="ID of the item to rent")
+    start: datetime = Field(..., description="Start of the rental (inclusive, timezone-aware)")
+    end: datetime = Field(..., description="End of the rental (exclusive, timezone-aware)")
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.start.tzinfo is None or self.end.tzinfo is None:
+            raise ValueError("start and end must include a timezone offset")
+        if self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "item_id": 1,
+                "start": "2025-08-01T10:00:00+05:30",
+                "end": "2025-08-02T18:00:00+05:30"
+            }
+        }
+
+class BookingQuote(BaseModel):
+    item_id: int = Field(..., description="ID of the quoted item")
+    hours: int = Field(..., description="Billable hours, rounded up")
+    price: float = Field(..., description="Total rental price")
+
+class BookingResponse(BaseModel):
+    id: int = Field(..., description="Unique booking ID")
+    item_id: int = Field(..., description="ID of the rented item")
+    renter_id: int = Field(..., description="ID of the renting user")
+    start: datetime = Field(..., description="Start of the rental")
+    end: datetime = Field(..., description="End of the rental")
+    status: str = Field(..., description="Booking status: confirmed or cancelled")
+    quoted_price: float = Field(..., description="Price agreed when the booking was made")
+    created_at: datetime = Field(..., description="When the booking was made")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "item_id": 1,
+                "renter_id": 2,
+                "start": "2025-08-01T04:30:00Z",
+                "end": "2025-08-02T12:30:00Z",
+                "status": "confirmed",
+                "quoted_price": 8.0,
+                "created_at": "2025-07-20T09:00:00Z"
+            }
+        }
+
+class BookedPeriod(BaseModel):
+    start: datetime = Field(..., description="Start of a confirmed booking")
+    end: datetime = Field(..., description="End of a confirmed booking")
+
+class ItemAvailability(BaseModel):
+    item_id: int = Field(..., description="Item ID")
+    available: bool = Field(..., description="Whether the item can be booked for the whole range")
+
+class AvailabilityResponse(BaseModel):
+    start: datetime = Field(..., description="Start of the queried range")
+    end: datetime = Field(..., description="End of the queried range")
+    items: List[ItemAvailability] = Field(..., description="One entry per existing requested item")
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field, PositiveFloat
-from typing import Optional, List
+from pydantic import BaseModel, Field, PositiveFloat, computed_field, model_validator
+from typing import Optional, List, Dict
+from core.images import image_variants
 from datetime import datetime
 
 class ItemCreate(BaseModel):
@@ -11,6 +12,14 @@ class ItemCreate(BaseModel):
     location: str = Field(..., max_length=100, description="Pickup location (e.g., 'Hostel A, Room 101')")
     is_available: bool = Field(True, description="Whether the item is available for rent")
     images: Optional[List[str]] = Field(None, description="List of image URLs for the item")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Pickup latitude in degrees")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Pickup longitude in degrees")
+
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be given together")
+        return self
 
     class Config:
         json_schema_extra = {
@@ -35,6 +44,8 @@ class ItemUpdate(BaseModel):
     location: Optional[str] = Field(None, max_length=100, description="Pickup location (e.g., 'Hostel A, Room 101')")
     is_available: Optional[bool] = Field(None, description="Whether the item is available for rent")
     images: Optional[List[str]] = Field(None, description="List of image URLs for the item")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Pickup latitude in degrees")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Pickup longitude in degrees")
 
     class Config:
         schema_extra = {
@@ -53,6 +64,11 @@ class ItemUpdate(BaseModel):
 class ItemResponse(ItemCreate):
     id: int = Field(..., description="Unique item ID")
 
+    @computed_field(description="Original, thumb and medium URLs for each image; list views should use thumb")
+    @property
+    def image_variants(self) -> Optional[List[Dict[str, str]]]:
+        return [image_variants(url) for url in self.images] if self.images else None
+
     class Config:
         orm_mode = True
         json_schema_extra = {
@@ -67,4 +83,46 @@ class ItemResponse(ItemCreate):
                 "is_available": True,
                 "images": ["https://example.com/kettle1.jpg"]
             }
-        }
\ No newline at end of file
+        }
+
+class ItemPage(BaseModel):
+    items: List[ItemResponse] = Field(..., description="Items on this page, newest first")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
+
+BULK_MAX_ITEMS = 100
+
+class ItemBulkUpdate(ItemUpdate):
+    id: int = Field(..., description="ID of the item to update")
+
+class ItemBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS, description="IDs of the items to delete")
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the entry in the request")
+    status: int = Field(..., description="HTTP status for this entry alone")
+    id: Optional[int] = Field(None, description="Item ID, when known")
+    item: Optional[ItemResponse] = Field(None, description="The created, updated or deleted item")
+    error: Optional[str] = Field(None, description="Why this entry was rejected")
+
+class BulkItemResponse(BaseModel):
+    results: List[BulkItemResult] = Field(..., description="One result per request entry, in request order")
+
+class ItemNearbyResult(ItemResponse):
+    distance_m: float = Field(..., description="Distance from the query point in metres")
+
+class ItemNearbyPage(BaseModel):
+    items: List[ItemNearbyResult] = Field(..., description="Items within the radius, nearest first")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, null on the last page")
+
+class ItemSearchResult(ItemResponse):
+    rank: float = Field(..., description="Relevance score, higher is better")
+    name_highlight: str = Field(..., description="Name with matched terms wrapped in <mark>")
+    description_highlight: str = Field(..., description="Matching description fragments wrapped in <mark>")
+
+class ItemSearchPage(BaseModel):
+    items: List[ItemSearchResult] = Field(..., description="Matches, most relevant first")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, null on the last page")
+
+
+class ImageUploadResponse(BaseModel):
+    images: List[str] = Field(..., description="URLs of the uploaded images, usable as ItemCreate.images")
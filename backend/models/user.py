@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, HttpUrl
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -77,4 +77,8 @@ class CollegeIdInput(BaseModel):
             "example": {
                 "college_id_url": "https://example.com/college_id/user_1_id.jpg"
             }
-        }
\ No newline at end of file
+        }
+
+class UserPage(BaseModel):
+    users: List[UserResponse] = Field(..., description="Users on this page, newest first")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
@@ -0,0 +1,61 @@
+import os
+import pytest
+
+# Tests marked "postgres" create a throwaway database on the configured
+# server (a role allowed to CREATE DATABASE is needed) and are skipped
+# unless LENDIT_TEST_POSTGRES is set. LENDIT_TEST_TEMPLATE clones an
+# existing database instead of running the migrations. The replica tests
+# also need LENDIT_TEST_REPLICA, a streaming replica of that server.
+POSTGRES = bool(os.environ.get("LENDIT_TEST_POSTGRES"))
+TEMPLATE = os.environ.get("LENDIT_TEST_TEMPLATE")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a Postgres server, see tests/conftest.py")
+
+
+def pytest_collection_modifyitems(config, items):
+    if not POSTGRES:
+        skip = pytest.mark.skip(reason="set LENDIT_TEST_POSTGRES to run tests against Postgres")
+        for item in items:
+            if "postgres" in item.keywords:
+                item.add_marker(skip)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database_name():
+    from benchmarks.common import disposable_database
+    async with disposable_database(template=TEMPLATE) as name:
+        yield name
+
+
+# Each test's database reuses the same ids, so the app's cache starts empty.
+@pytest.fixture
+async def client(database_name, monkeypatch):
+    from benchmarks.common import app_client
+    from core.cache import LRUCache, item_cache
+    monkeypatch.setattr(item_cache, "backend", LRUCache())
+    async with app_client() as client:
+        yield client
+
+
+# An item owned by the bench owner, and headers that authenticate as them.
+@pytest.fixture
+async def owned_item(client):
+    from app.api.auth import create_access_token
+    from benchmarks.common import BENCH_EMAIL, ensure_owner
+    from core import database
+    async with database.pool.connection() as conn:
+        owner_id = await ensure_owner(conn)
+        item = await (await conn.execute(
+            "INSERT INTO items (name, location, price_per_day, owner_id) VALUES ('Test lamp', 'Hostel A', 5, %s) RETURNING id",
+            (owner_id,)
+        )).fetchone()
+        await conn.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(owner_id), 'email': BENCH_EMAIL})}"}
+    return item["id"], headers
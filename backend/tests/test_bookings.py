@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.api import booking as booking_api
+from app.api.auth import create_access_token
+from core import database
+
+pytestmark = [pytest.mark.anyio, pytest.mark.postgres]
+
+
+@pytest.fixture
+async def renter_headers(client):
+    async with database.pool.connection() as conn:
+        renter = await (await conn.execute(
+            "INSERT INTO users (email, password, first_name, role) VALUES ('renter@example.com', 'x', 'Renter', 'renter') RETURNING id"
+        )).fetchone()
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(renter['id']), 'email': 'renter@example.com'})}"}
+
+
+def period(days: int) -> dict:
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=days)
+    return {"start": start.isoformat(), "end": (start + timedelta(hours=3)).isoformat()}
+
+
+async def test_booking_of_item_deleted_after_the_check_is_404(client, owned_item, renter_headers, monkeypatch):
+    id, _ = owned_item
+    bookable_item = booking_api._bookable_item
+
+    async def deleted_meanwhile(cursor, item_id):
+        item = await bookable_item(cursor, item_id)
+        async with database.pool.connection() as conn:
+            await conn.execute("DELETE FROM items WHERE id = %s", (item_id,))
+        return item
+
+    monkeypatch.setattr(booking_api, "_bookable_item", deleted_meanwhile)
+    response = await client.post("/v1/bookings/", headers=renter_headers, json={"item_id": id, **period(1)})
+    assert response.status_code == 404
+
+
+async def test_overlapping_booking_is_409(client, owned_item, renter_headers):
+    id, _ = owned_item
+    assert (await client.post("/v1/bookings/", headers=renter_headers, json={"item_id": id, **period(1)})).status_code == 201
+    assert (await client.post("/v1/bookings/", headers=renter_headers, json={"item_id": id, **period(1)})).status_code == 409
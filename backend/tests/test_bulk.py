@@ -0,0 +1,111 @@
+import pytest
+from app.api import item as item_api
+from core import database
+
+pytestmark = [pytest.mark.anyio, pytest.mark.postgres]
+
+MISSING = 2_000_000_000
+
+
+# Three more items for the bench owner, and one belonging to someone else.
+@pytest.fixture
+async def items(owned_item):
+    id, headers = owned_item
+    async with database.pool.connection() as conn:
+        owner = await (await conn.execute("SELECT owner_id FROM items WHERE id = %s", (id,))).fetchone()
+        mine = [row["id"] for row in await (await conn.execute(
+            """INSERT INTO items (name, location, price_per_day, owner_id)
+               SELECT 'Lamp ' || g, 'Hostel A', 5, %s FROM generate_series(1, 3) AS g RETURNING id""",
+            (owner["owner_id"],)
+        )).fetchall()]
+        other = await (await conn.execute(
+            "INSERT INTO users (email, password, first_name, role) VALUES ('other@example.com', 'x', 'Other', 'lender') RETURNING id"
+        )).fetchone()
+        theirs = await (await conn.execute(
+            "INSERT INTO items (name, location, price_per_day, owner_id) VALUES ('Their lamp', 'Hostel B', 5, %s) RETURNING id",
+            (other["id"],)
+        )).fetchone()
+    return [id, *mine], theirs["id"], headers
+
+
+async def names(ids: list) -> dict:
+    async with database.pool.connection() as conn:
+        rows = await (await conn.execute("SELECT id, name FROM items WHERE id = ANY(%s)", (ids,))).fetchall()
+    return {row["id"]: row["name"] for row in rows}
+
+
+def statuses(response) -> list:
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == list(range(len(results)))
+    return [result["status"] for result in results]
+
+
+async def test_bulk_create_reports_each_row(client, items):
+    _, _, headers = items
+    body = [
+        {"name": "First", "location": "Hostel A", "price_per_day": 5},
+        {"name": "No location", "price_per_day": 5},
+        {"name": "Third", "location": "Hostel A", "price_per_hour": 1},
+        {"name": "Bad price", "location": "Hostel A", "price_per_day": "lots"},
+        {"name": "Fifth", "location": "Hostel C", "price_per_day": 7},
+    ]
+    response = await client.post("/v1/items/bulk", headers=headers, json=body)
+    assert statuses(response) == [201, 422, 201, 422, 201]
+    results = response.json()["results"]
+    assert "location" in results[1]["error"] and "price_per_day" in results[3]["error"]
+    created = {result["id"]: result["item"]["name"] for result in results if result["status"] == 201}
+    assert [result["item"]["name"] for result in results if result["status"] == 201] == ["First", "Third", "Fifth"]
+    assert await names(list(created)) == created
+
+
+async def test_bulk_update_only_touches_the_callers_items(client, items):
+    mine, theirs, headers = items
+    body = [
+        {"id": mine[0], "name": "Renamed 0"},
+        {"id": theirs, "name": "Stolen"},
+        {"id": MISSING, "name": "Nowhere"},
+        {"name": "No id"},
+        {"id": mine[1], "price_per_day": -1},
+        {"id": mine[2], "name": "Renamed 2"},
+    ]
+    response = await client.patch("/v1/items/bulk", headers=headers, json=body)
+    assert statuses(response) == [200, 403, 404, 422, 422, 200]
+    results = response.json()["results"]
+    assert [(result["id"], result["item"]["name"]) for result in results if result["status"] == 200] == [
+        (mine[0], "Renamed 0"), (mine[2], "Renamed 2"),
+    ]
+    assert await names([*mine, theirs]) == {
+        mine[0]: "Renamed 0", mine[1]: "Lamp 1", mine[2]: "Renamed 2", mine[3]: "Lamp 3", theirs: "Their lamp",
+    }
+
+
+# A row deleted after the ownership check comes back from executemany as an
+# empty result set; the rows after it must still line up with their entries.
+async def test_bulk_update_keeps_rows_aligned_past_an_empty_result(client, items, monkeypatch):
+    mine, _, headers = items
+    owners = item_api._owners
+
+    async def deleted_meanwhile(cursor, ids):
+        found = await owners(cursor, ids)
+        async with database.pool.connection() as conn:
+            await conn.execute("DELETE FROM items WHERE id = %s", (mine[1],))
+        return found
+
+    monkeypatch.setattr(item_api, "_owners", deleted_meanwhile)
+    body = [{"id": id, "name": f"Renamed {n}"} for n, id in enumerate(mine)]
+    response = await client.patch("/v1/items/bulk", headers=headers, json=body)
+    assert statuses(response) == [200, 404, 200, 200]
+    results = response.json()["results"]
+    assert [(result["id"], (result["item"] or {}).get("name")) for result in results] == [
+        (mine[0], "Renamed 0"), (mine[1], None), (mine[2], "Renamed 2"), (mine[3], "Renamed 3"),
+    ]
+
+
+async def test_bulk_delete_only_removes_the_callers_items(client, items):
+    mine, theirs, headers = items
+    response = await client.request("DELETE", "/v1/items/bulk", headers=headers, json={"ids": [mine[0], theirs, MISSING, mine[1]]})
+    assert statuses(response) == [200, 403, 404, 200]
+    results = response.json()["results"]
+    assert [results[0]["item"]["id"], results[3]["item"]["id"]] == [mine[0], mine[1]]
+    assert set(await names([*mine, theirs])) == {mine[2], mine[3], theirs}
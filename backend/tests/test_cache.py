@@ -0,0 +1,169 @@
+import asyncio
+from decimal import Decimal
+import pytest
+from core import cache
+from core.cache import Cache, LRUCache, RedisCache
+
+pytestmark = pytest.mark.anyio
+
+
+# In-memory stand-in for the redis.asyncio client.
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    return LRUCache(max_size=16, ttl=60) if request.param == "memory" else RedisCache(FakeRedis(), ttl=60)
+
+
+async def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_size=2)
+    await lru.set("a", 1)
+    await lru.set("b", 2)
+    await lru.get("a")
+    await lru.set("c", 3)
+    assert await lru.get("b") is None
+    assert await lru.get("a") == 1
+    assert await lru.get("c") == 3
+    assert lru.evictions == 1
+
+
+async def test_lru_expires_after_ttl(clock):
+    lru = LRUCache(ttl=10)
+    await lru.set("a", 1)
+    await lru.set("b", 2, ttl=30)
+    clock.now += 11
+    assert await lru.get("a") is None
+    assert await lru.get("b") == 2
+
+
+async def test_redis_backend_round_trips_json():
+    client = FakeRedis()
+    backend = RedisCache(client, ttl=60, prefix="test:")
+    await backend.set("item:1", {"id": 1, "price_per_day": Decimal("4.50")}, ttl=5)
+    assert client.expiry["test:item:1"] == 5
+    assert await backend.get("item:1") == {"id": 1, "price_per_day": 4.5}
+    await backend.delete("item:1")
+    assert await backend.get("item:1") is None
+
+
+async def test_hit_and_miss_counters(backend):
+    item_cache = Cache(backend)
+
+    async def loader():
+        return {"id": 1}
+
+    assert await item_cache.get_or_load("item:1", loader) == {"id": 1}
+    assert await item_cache.get_or_load("item:1", loader) == {"id": 1}
+    assert (item_cache.hits, item_cache.misses) == (1, 1)
+
+
+async def test_concurrent_misses_share_one_load(backend):
+    item_cache = Cache(backend)
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"id": 1}
+
+    waiters = [asyncio.create_task(item_cache.get_or_load("item:1", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == [{"id": 1}] * 5
+    assert calls == 1
+    assert item_cache.coalesced == 4
+
+
+async def test_invalidate_during_load_keeps_stale_row_out(backend):
+    item_cache = Cache(backend)
+    row = {"id": 1, "name": "old"}
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_loader():
+        value = dict(row)
+        started.set()
+        await release.wait()
+        return value
+
+    stale = asyncio.create_task(item_cache.get_or_load("item:1", slow_loader))
+    await started.wait()
+    # The write commits and invalidates while the read above is in flight.
+    row["name"] = "new"
+    await item_cache.invalidate("item:1")
+    release.set()
+    assert (await stale)["name"] == "old"
+    assert await item_cache.get("item:1") is None
+
+    async def loader():
+        return dict(row)
+
+    assert (await item_cache.get_or_load("item:1", loader))["name"] == "new"
+    assert (await item_cache.get("item:1"))["name"] == "new"
+
+
+async def test_invalidate_during_load_does_not_join_new_callers(backend):
+    item_cache = Cache(backend)
+    release = asyncio.Event()
+
+    async def slow_loader():
+        await release.wait()
+        return {"name": "old"}
+
+    async def loader():
+        return {"name": "new"}
+
+    stale = asyncio.create_task(item_cache.get_or_load("item:1", slow_loader))
+    await asyncio.sleep(0)
+    await item_cache.invalidate("item:1")
+    assert await item_cache.get_or_load("item:1", loader) == {"name": "new"}
+    release.set()
+    await stale
+    assert await item_cache.get("item:1") == {"name": "new"}
+
+
+async def test_failed_load_reaches_waiters_and_is_not_cached(backend):
+    item_cache = Cache(backend)
+    release = asyncio.Event()
+
+    async def loader():
+        await release.wait()
+        raise RuntimeError("database down")
+
+    waiters = [asyncio.create_task(item_cache.get_or_load("item:1", loader)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert await item_cache.get("item:1") is None
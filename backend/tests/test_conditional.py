@@ -0,0 +1,104 @@
+import pytest
+from core.cache import item_cache
+from core.conditional import table_version
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query, params=None):
+        self.params = params
+
+    async def fetchone(self):
+        return self.row
+
+
+async def test_table_version_returns_the_row():
+    row = {"version": 3, "modified_us": 1700000000000000}
+    assert await table_version(FakeCursor(row), "items") == row
+
+
+async def test_table_version_without_a_seeded_row_names_the_fix():
+    with pytest.raises(RuntimeError, match="core.migrations up"):
+        await table_version(FakeCursor({"version": None, "modified_us": None}), "items")
+
+
+async def write(statement: str, params: tuple = ()):
+    from core import database
+    async with database.pool.connection() as conn:
+        await conn.execute(statement, params)
+
+
+@pytest.mark.postgres
+@pytest.mark.parametrize("path", ["/v1/items/", "/v1/users/"])
+async def test_unchanged_listing_is_not_modified(client, owned_item, path):
+    first = await client.get(path)
+    assert first.status_code == 200
+    for headers in ({"If-None-Match": first.headers["ETag"]}, {"If-Modified-Since": first.headers["Last-Modified"]}):
+        revalidated = await client.get(path, headers=headers)
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == first.headers["ETag"]
+
+
+@pytest.mark.postgres
+async def test_listing_etag_changes_with_rows_only(client, owned_item):
+    id, _ = owned_item
+    etag = (await client.get("/v1/items/")).headers["ETag"]
+    await write("UPDATE items SET price_per_day = 6 WHERE false")
+    await write("DELETE FROM items WHERE id = -1")
+    assert (await client.get("/v1/items/", headers={"If-None-Match": etag})).status_code == 304
+
+    await write("UPDATE items SET price_per_day = 6 WHERE id = %s", (id,))
+    changed = await client.get("/v1/items/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["items"][0]["price_per_day"] == 6
+
+
+@pytest.mark.postgres
+async def test_unchanged_item_is_not_modified(client, owned_item):
+    id, _ = owned_item
+    first = await client.get(f"/v1/items/{id}")
+    for headers in ({"If-None-Match": first.headers["ETag"]}, {"If-Modified-Since": first.headers["Last-Modified"]}):
+        assert (await client.get(f"/v1/items/{id}", headers=headers)).status_code == 304
+    await write("UPDATE items SET price_per_day = 6, updated_at = now() + interval '1 second' WHERE id = %s", (id,))
+    await item_cache.invalidate(f"item:{id}")
+    for headers in ({"If-None-Match": first.headers["ETag"]}, {"If-Modified-Since": first.headers["Last-Modified"]}):
+        assert (await client.get(f"/v1/items/{id}", headers=headers)).status_code == 200
+
+
+@pytest.mark.postgres
+async def test_update_with_a_stale_if_match_is_412(client, owned_item):
+    id, headers = owned_item
+    etag = (await client.get(f"/v1/items/{id}")).headers["ETag"]
+    updated = await client.put(f"/v1/items/{id}", headers={**headers, "If-Match": etag}, json={"price_per_day": 7})
+    assert updated.status_code == 200
+    stale = await client.put(f"/v1/items/{id}", headers={**headers, "If-Match": etag}, json={"price_per_day": 8})
+    assert stale.status_code == 412
+    assert (await client.get(f"/v1/items/{id}")).json()["price_per_day"] == 7
+    assert (await client.put(f"/v1/items/{id}", headers={**headers, "If-Match": updated.headers["ETag"]}, json={"price_per_day": 8})).status_code == 200
+
+
+# Writers whose connections bump different slots do not wait for each other.
+@pytest.mark.postgres
+async def test_concurrent_writers_do_not_queue_on_the_version(client, owned_item):
+    import psycopg
+    from core import database
+    id, _ = owned_item
+    connections = []
+    try:
+        while len({pid % 16 for pid in [conn.info.backend_pid for conn in connections]}) < 2:
+            connections.append(await psycopg.AsyncConnection.connect(database.conninfo()))
+        first = connections[0]
+        second = next(conn for conn in connections if conn.info.backend_pid % 16 != first.info.backend_pid % 16)
+        await first.execute("UPDATE items SET price_per_day = 6 WHERE id = %s", (id,))
+        await second.execute("SET lock_timeout = '500ms'")
+        await second.execute("INSERT INTO items (name, location, owner_id) SELECT 'Other lamp', 'Hostel B', owner_id FROM items WHERE id = %s", (id,))
+        await second.commit()
+        await first.commit()
+    finally:
+        for conn in connections:
+            await conn.close()
@@ -0,0 +1,47 @@
+import pytest
+from dotenv import dotenv_values
+from core.config import DEFAULT_ENV_FILE, config, get_config
+
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    path = tmp_path / "test.env"
+    path.write_text("DATABASE=from_override\nCACHE_TTL=5\n")
+    monkeypatch.setenv("LENDIT_ENV_FILE", str(path))
+    get_config.cache_clear()
+    yield path
+    get_config.cache_clear()
+
+
+def test_env_file_override(env_file):
+    assert config["DATABASE"] == "from_override"
+    assert config.get("CACHE_TTL") == "5"
+    assert config.get("MISSING") is None
+
+
+def test_read_once(env_file):
+    assert config["DATABASE"] == "from_override"
+    env_file.write_text("DATABASE=changed\n")
+    assert config["DATABASE"] == "from_override"
+
+
+def test_explicit_path(tmp_path):
+    path = tmp_path / "other.env"
+    path.write_text("DATABASE=explicit\n")
+    assert get_config(str(path))["DATABASE"] == "explicit"
+
+
+def test_default_ignores_the_working_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv("LENDIT_ENV_FILE", raising=False)
+    (tmp_path / ".env").write_text("DATABASE=from_cwd\n")
+    monkeypatch.chdir(tmp_path)
+    get_config.cache_clear()
+    try:
+        assert get_config() == dotenv_values(DEFAULT_ENV_FILE)
+    finally:
+        get_config.cache_clear()
+
+
+def test_writes_are_seen_by_readers(env_file):
+    config["DATABASE"] = "switched"
+    assert get_config()["DATABASE"] == "switched"
@@ -0,0 +1,59 @@
+import pytest
+from core import database, export
+
+pytestmark = pytest.mark.anyio
+
+TOKEN = "sync-job-token"
+
+
+@pytest.fixture
+def export_token(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_TOKEN", TOKEN)
+
+
+@pytest.fixture
+async def unopened_client():
+    import httpx
+    from app.main import app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", ["/v1/items/export", "/v1/users/export"])
+async def test_export_is_disabled_without_a_configured_token(monkeypatch, unopened_client, path):
+    monkeypatch.setattr(export, "EXPORT_TOKEN", None)
+    response = await unopened_client.get(path, headers={"Authorization": f"Bearer {TOKEN}"})
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("path", ["/v1/items/export", "/v1/users/export"])
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", f"Basic {TOKEN}"])
+async def test_export_rejects_missing_or_wrong_token(export_token, unopened_client, path, authorization):
+    headers = {"Authorization": authorization} if authorization else {}
+    response = await unopened_client.get(path, headers=headers)
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+@pytest.mark.postgres
+async def test_export_streams_every_row_on_its_own_connection(export_token, client):
+    async with database.pool.connection() as conn:
+        count = (await (await conn.execute("SELECT count(*) AS n FROM items")).fetchone())["n"]
+    used = database.pool.get_stats().get("connections_num", 0)
+    response = await client.get("/v1/items/export", headers={"Authorization": f"Bearer {TOKEN}"})
+    assert response.status_code == 200
+    assert len(response.content.splitlines()) == count
+    assert database.pool.get_stats().get("connections_num", 0) == used
+
+
+@pytest.mark.postgres
+async def test_export_connection_is_time_limited(export_token, database_name):
+    stream = export.stream_ndjson(
+        """SELECT name, setting::int AS ms FROM pg_settings
+           WHERE name IN ('statement_timeout', 'idle_in_transaction_session_timeout') ORDER BY name"""
+    )
+    chunks = [chunk async for chunk in stream]
+    assert b"".join(chunks).splitlines() == [
+        f'{{"name":"idle_in_transaction_session_timeout","ms":{export.IDLE_TIMEOUT_MS}}}'.encode(),
+        f'{{"name":"statement_timeout","ms":{export.STATEMENT_TIMEOUT_MS}}}'.encode(),
+    ]
@@ -0,0 +1,80 @@
+import asyncio
+import psycopg
+import pytest
+from core import database
+
+pytestmark = [pytest.mark.anyio, pytest.mark.postgres]
+
+
+# Runs the update while another transaction holds the row, so it passes the
+# ownership check, blocks on the row lock and sees that transaction's change.
+async def update_racing(client, id: int, headers: dict, change: str) -> int:
+    async with await psycopg.AsyncConnection.connect(database.conninfo()) as other:
+        await other.execute(change, (id,))
+        request = asyncio.create_task(client.put(f"/v1/items/{id}", headers=headers, json={"price_per_day": 9}))
+        await asyncio.sleep(0.3)
+        await other.commit()
+        return (await request).status_code
+
+
+async def test_update_of_item_deleted_meanwhile_is_404(client, owned_item):
+    id, headers = owned_item
+    assert await update_racing(client, id, headers, "DELETE FROM items WHERE id = %s") == 404
+
+
+async def test_conditional_update_of_item_deleted_meanwhile_is_404(client, owned_item):
+    id, headers = owned_item
+    etag = (await client.get(f"/v1/items/{id}")).headers["ETag"]
+    assert await update_racing(client, id, {**headers, "If-Match": etag}, "DELETE FROM items WHERE id = %s") == 404
+
+
+async def test_conditional_update_of_item_changed_meanwhile_is_412(client, owned_item):
+    id, headers = owned_item
+    etag = (await client.get(f"/v1/items/{id}")).headers["ETag"]
+    change = "UPDATE items SET price_per_day = 6, updated_at = clock_timestamp() WHERE id = %s"
+    assert await update_racing(client, id, {**headers, "If-Match": etag}, change) == 412
+
+
+async def test_update_without_if_match_applies_over_a_concurrent_change(client, owned_item):
+    id, headers = owned_item
+    change = "UPDATE items SET price_per_day = 6, updated_at = clock_timestamp() WHERE id = %s"
+    assert await update_racing(client, id, headers, change) == 200
+
+
+async def test_concurrent_misses_share_one_connection(client, owned_item, monkeypatch):
+    from contextlib import asynccontextmanager
+    from app.api import item as item_api
+    from core.cache import item_cache
+    id, _ = owned_item
+    checkouts = 0
+    read_connection = item_api.read_connection
+
+    @asynccontextmanager
+    async def counting(lsn=None):
+        nonlocal checkouts
+        checkouts += 1
+        async with read_connection(lsn) as conn:
+            await asyncio.sleep(0.1)
+            yield conn
+
+    monkeypatch.setattr(item_api, "read_connection", counting)
+    hits, misses = item_cache.hits, item_cache.misses
+    responses = await asyncio.gather(*(client.get(f"/v1/items/{id}") for _ in range(20)))
+    assert {response.status_code for response in responses} == {200}
+    assert checkouts == 1
+    assert item_cache.misses - misses == 20
+
+    await client.get(f"/v1/items/{id}")
+    assert (checkouts, item_cache.hits - hits) == (1, 1)
+
+
+async def test_session_that_wrote_reads_past_the_cache(client, owned_item):
+    from core.cache import item_cache
+    from core.replicas import SESSION_COOKIE
+    id, _ = owned_item
+    await client.get(f"/v1/items/{id}")
+    entry = await item_cache.get(f"item:{id}")
+    await item_cache.backend.set(f"item:{id}", {**entry, "item": {**entry["item"], "name": "Stale lamp"}})
+    assert (await client.get(f"/v1/items/{id}")).json()["name"] == "Stale lamp"
+    fresh = await client.get(f"/v1/items/{id}", cookies={SESSION_COOKIE: "0/0"})
+    assert fresh.json()["name"] == "Test lamp"
@@ -0,0 +1,148 @@
+import asyncio
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from core import cloudinary, jobs
+from core.storage import LocalStorage
+
+pytestmark = pytest.mark.anyio
+
+
+def png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def test_worker_keeps_claiming_after_database_errors(monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_SECONDS", 0.01)
+    worker = jobs.Worker(kinds=["test"])
+    calls = 0
+
+    async def claim(limit):
+        nonlocal calls
+        calls += 1
+        if calls <= 3:
+            raise OSError("connection refused")
+        worker.stop()
+        return []
+
+    async def nothing():
+        await asyncio.Event().wait()
+
+    async def maintain():
+        pass
+
+    monkeypatch.setattr(worker, "claim", claim)
+    monkeypatch.setattr(worker, "listen", nothing)
+    monkeypatch.setattr(worker, "maintain", maintain)
+    await asyncio.wait_for(worker.run(), 5)
+    assert calls == 4
+
+
+async def test_worker_stops_while_backing_off(monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_SECONDS", 30)
+    worker = jobs.Worker(kinds=["test"])
+
+    async def claim(limit):
+        raise OSError("connection refused")
+
+    async def nothing():
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(worker, "claim", claim)
+    monkeypatch.setattr(worker, "listen", nothing)
+    monkeypatch.setattr(worker, "maintain", claim)
+    run = asyncio.create_task(worker.run())
+    await asyncio.sleep(0.05)
+    worker.stop()
+    await asyncio.wait_for(run, 1)
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    monkeypatch.setattr(cloudinary, "SPOOL_DIR", str(spool))
+    monkeypatch.setattr(cloudinary, "get_storage", lambda: LocalStorage(str(tmp_path / "media"), "/media"))
+    return spool
+
+
+class FakeQueue:
+    def __init__(self):
+        self.chunks = {}
+
+    async def execute(self, query, params=None):
+        upload, seq, data = params
+        self.chunks.setdefault(str(upload), {})[seq] = data
+
+
+async def test_queued_uploads_are_staged_on_the_queue_connection(spool, monkeypatch):
+    queued = []
+
+    async def enqueue(conn, kind, payload, **kwargs):
+        queued.append(payload)
+
+    monkeypatch.setattr(jobs, "enqueue", enqueue)
+    monkeypatch.setattr(cloudinary, "READ_CHUNK_SIZE", 16)
+    queue = FakeQueue()
+    bodies = [png(), png()]
+    urls = await cloudinary.upload_images([UploadFile(io.BytesIO(body)) for body in bodies], queue=queue)
+    assert len(urls) == 2
+    for payload, body in zip(queued, bodies):
+        chunks = queue.chunks[payload["upload"]]
+        assert len(chunks) > 1
+        assert b"".join(chunks[seq] for seq in sorted(chunks)) == body
+    assert os.listdir(spool) == []
+
+
+@pytest.fixture
+async def pool(database_name):
+    from core import database
+    await database.open_pool()
+    try:
+        yield database.pool
+    finally:
+        await database.close_pool()
+
+
+async def staged(conn) -> int:
+    return (await (await conn.execute("SELECT count(*) AS n FROM upload_chunks")).fetchone())["n"]
+
+
+# The worker runs with its own scratch directory, as it would on another host.
+@pytest.mark.postgres
+async def test_staged_upload_is_stored_by_any_worker(spool, pool, tmp_path, monkeypatch):
+    async with pool.connection() as conn:
+        [url] = await cloudinary.upload_images([UploadFile(io.BytesIO(png()))], queue=conn)
+    async with pool.connection() as conn:
+        job = await (await conn.execute("SELECT payload FROM jobs WHERE kind = 'storage.upload'")).fetchone()
+    worker_spool = tmp_path / "worker"
+    worker_spool.mkdir()
+    monkeypatch.setattr(cloudinary, "SPOOL_DIR", str(worker_spool))
+    await cloudinary.store_staged_upload(job["payload"])
+    assert os.path.exists(tmp_path / "media" / os.path.basename(url))
+    assert os.listdir(worker_spool) == []
+    async with pool.connection() as conn:
+        assert await staged(conn) == 0
+    with pytest.raises(jobs.JobFailed, match="is gone"):
+        await cloudinary.store_staged_upload(job["payload"])
+
+
+@pytest.mark.postgres
+async def test_failed_batch_leaves_no_jobs_or_chunks(spool, pool):
+    images = [
+        UploadFile(io.BytesIO(png()), filename="a.png"),
+        UploadFile(io.BytesIO(b"<html>not an image</html>"), filename="b.png"),
+        UploadFile(io.BytesIO(png()), filename="c.png"),
+    ]
+    with pytest.raises(HTTPException) as raised:
+        async with pool.connection() as conn:
+            await cloudinary.upload_images(images, queue=conn)
+    assert raised.value.status_code == 400
+    async with pool.connection() as conn:
+        assert await staged(conn) == 0
+        assert (await (await conn.execute("SELECT count(*) AS n FROM jobs WHERE kind = 'storage.upload'")).fetchone())["n"] == 0
+    assert os.listdir(spool) == []
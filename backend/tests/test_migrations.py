@@ -0,0 +1,131 @@
+import psycopg
+import pytest
+from core import database, migrations
+
+pytestmark = pytest.mark.anyio
+
+WIDGETS = """-- migrate:up
+CREATE TABLE mig_widgets (id int PRIMARY KEY, name text);
+
+-- migrate:down
+DROP TABLE mig_widgets;
+"""
+WIDGET_INDEX = """-- migrate:up
+-- migrate:no-transaction
+CREATE INDEX CONCURRENTLY mig_widgets_name_idx ON mig_widgets (name);
+
+-- migrate:down
+-- migrate:no-transaction
+DROP INDEX CONCURRENTLY mig_widgets_name_idx;
+"""
+
+
+def test_parse_splits_up_and_down():
+    migration = migrations.parse("9001", "widgets", WIDGETS)
+    assert migration.up == "CREATE TABLE mig_widgets (id int PRIMARY KEY, name text);"
+    assert migration.down == "DROP TABLE mig_widgets;"
+    assert migration.transactional
+
+
+def test_checksum_covers_only_the_up_section():
+    migration = migrations.parse("9001", "widgets", WIDGETS)
+    assert migrations.parse("9001", "widgets", WIDGETS.replace("DROP TABLE", "DROP TABLE IF EXISTS")).checksum == migration.checksum
+    assert migrations.parse("9001", "widgets", WIDGETS.replace("name text", "label text")).checksum != migration.checksum
+
+
+def test_no_transaction_is_read_from_the_opening_comments():
+    assert not migrations.parse("9002", "widget_index", WIDGET_INDEX).transactional
+    header = "-- migrate:up\n-- Indexes for the listing.\n-- migrate:no-transaction\n\nCREATE INDEX CONCURRENTLY i ON t (c);\n"
+    assert not migrations.parse("9002", "widget_index", header).transactional
+
+
+@pytest.mark.parametrize("text", [
+    "-- migrate:up\nCREATE TABLE t (id int);\n-- migrate:no-transaction\n-- migrate:down\nDROP TABLE t;\n",
+    "-- migrate:up\nCREATE TABLE t (id int);\n\n-- migrate:down\n-- migrate:no-transaction\nDROP TABLE t;\n",
+    "-- migrate:up\nCOMMENT ON TABLE t IS '-- migrate:no-transaction';\n\n-- migrate:down\n",
+    "-- migrate:up\n-- Unlike 0007, this does not need -- migrate:no-transaction.\nCREATE TABLE t (id int);\n",
+])
+def test_no_transaction_elsewhere_is_ignored(text):
+    assert migrations.parse("9003", "t", text).transactional
+
+
+def test_statements_split_on_line_ending_semicolons():
+    script = "-- first\nCREATE INDEX a ON t (x);\n\n-- second\nCREATE INDEX b\n  ON t (y);\n-- trailing comment\n"
+    assert migrations._statements(script) == ["-- first\nCREATE INDEX a ON t (x)", "-- second\nCREATE INDEX b\n  ON t (y)"]
+
+
+def test_shipped_migrations():
+    loaded = migrations.load()
+    assert [migration.version for migration in loaded] == sorted({migration.version for migration in loaded})
+    assert all(migration.up and migration.down for migration in loaded)
+    assert [migration.version for migration in loaded if not migration.transactional] == ["0007"]
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    (tmp_path / "9001_widgets.sql").write_text(WIDGETS)
+    (tmp_path / "9002_widget_index.sql").write_text(WIDGET_INDEX)
+    load = migrations.load
+    monkeypatch.setattr(migrations, "load", lambda: load(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+async def conn(database_name):
+    async with await psycopg.AsyncConnection.connect(database.conninfo(database_name), autocommit=True) as conn:
+        yield conn
+
+
+async def _exists(conn, relation: str) -> bool:
+    return (await (await conn.execute("SELECT to_regclass(%s)", (relation,))).fetchone())[0] is not None
+
+
+async def _states(conn) -> dict:
+    return {version: state for version, _, state in await migrations.status(conn) if version.startswith("9")}
+
+
+@pytest.mark.postgres
+async def test_apply_and_roll_back(directory, conn):
+    assert await migrations.apply(conn) == ["9001", "9002"]
+    assert await _exists(conn, "mig_widgets_name_idx")
+    assert await _states(conn) == {"9001": "applied", "9002": "applied"}
+    assert await migrations.apply(conn) == []
+
+    assert await migrations.rollback(conn) == ["9002"]
+    assert not await _exists(conn, "mig_widgets_name_idx")
+    assert await _exists(conn, "mig_widgets")
+    assert await _states(conn) == {"9001": "applied", "9002": "pending"}
+    assert await migrations.rollback(conn, target="8999") == ["9001"]
+    assert not await _exists(conn, "mig_widgets")
+
+
+@pytest.mark.postgres
+async def test_apply_stops_at_target(directory, conn):
+    assert await migrations.apply(conn, target="9001") == ["9001"]
+    assert await _states(conn) == {"9001": "applied", "9002": "pending"}
+
+
+@pytest.mark.postgres
+async def test_fake_records_without_running(directory, conn):
+    assert await migrations.apply(conn, fake=True) == ["9001", "9002"]
+    assert await _states(conn) == {"9001": "applied", "9002": "applied"}
+    assert not await _exists(conn, "mig_widgets")
+
+
+@pytest.mark.postgres
+async def test_status_reports_edited_and_missing_files(directory, conn):
+    await migrations.apply(conn)
+    (directory / "9001_widgets.sql").write_text(WIDGETS.replace("name text", "label text"))
+    (directory / "9002_widget_index.sql").unlink()
+    assert await _states(conn) == {"9001": "changed", "9002": "missing"}
+
+
+@pytest.mark.postgres
+async def test_failed_migration_leaves_nothing_behind(directory, conn):
+    (directory / "9003_broken.sql").write_text(
+        "-- migrate:up\nCREATE TABLE mig_broken (id int);\nSELECT 1 / 0;\n\n-- migrate:down\nDROP TABLE mig_broken;\n"
+    )
+    with pytest.raises(psycopg.errors.DivisionByZero):
+        await migrations.apply(conn)
+    assert not await _exists(conn, "mig_broken")
+    assert await _states(conn) == {"9001": "applied", "9002": "applied", "9003": "pending"}
@@ -0,0 +1,163 @@
+import os
+import fastapi
+import httpx
+import pytest
+from core import ratelimit
+from core.ratelimit import Limit, MemoryBucketStore, RateLimiter, RedisBucketStore, parse_limit
+
+pytestmark = pytest.mark.anyio
+
+# A Redis server to run the Lua script against, as a redis:// URL.
+REDIS = os.environ.get("LENDIT_TEST_REDIS")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_parse_limit():
+    assert parse_limit("20/minute") == Limit(20 / 60, 20)
+    assert parse_limit(" 5 / second ") == Limit(5, 5)
+    assert parse_limit(None) is None and parse_limit("") is None
+
+
+async def test_burst_then_wait_for_refill(clock):
+    store, limit = MemoryBucketStore(), Limit(rate=2, burst=3)
+    assert [await store.take("k", limit) for _ in range(3)] == [0, 0, 0]
+    assert await store.take("k", limit) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert await store.take("k", limit) == 0
+    assert await store.take("k", limit) > 0
+    # Refill stops at the burst, however long the bucket sat idle.
+    clock[0] += 3600
+    assert [await store.take("k", limit) for _ in range(4)][-2:] == [0, pytest.approx(0.5)]
+
+
+async def test_keys_have_their_own_buckets(clock):
+    store, limit = MemoryBucketStore(), Limit(rate=1, burst=1)
+    assert await store.take("a", limit) == 0
+    assert await store.take("a", limit) > 0
+    assert await store.take("b", limit) == 0
+
+
+async def test_looking_takes_nothing(clock):
+    store, limit = MemoryBucketStore(), Limit(rate=1, burst=2)
+    assert [await store.take("k", limit, cost=0) for _ in range(5)] == [0] * 5
+    await store.take("k", limit)
+    await store.take("k", limit)
+    assert await store.take("k", limit, cost=0) == pytest.approx(1)
+
+
+async def test_forgotten_buckets_come_back_full(clock):
+    store, limit = MemoryBucketStore(shards=1, max_keys=2), Limit(rate=1, burst=1)
+    for key in ("a", "b", "c"):
+        await store.take(key, limit)
+    assert await store.take("a", limit) == 0
+    assert await store.take("c", limit) > 0
+
+
+class FakeRedis:
+    def __init__(self, wait: str = "0"):
+        self.wait = wait
+        self.calls = []
+
+    def register_script(self, script):
+        assert script == ratelimit.TAKE_SCRIPT
+
+        async def run(keys, args):
+            self.calls.append((keys, args))
+            return self.wait
+        return run
+
+
+async def test_redis_store_passes_the_limit_to_the_script():
+    client = FakeRedis(wait="1.25")
+    store = RedisBucketStore(client)
+    assert await store.take("login:account:a", Limit(rate=0.5, burst=10), cost=0) == 1.25
+    assert client.calls == [(["lendit:ratelimit:login:account:a"], [0.5, 10, 0])]
+
+
+@pytest.mark.skipif(not REDIS, reason="set LENDIT_TEST_REDIS to a Redis server URL")
+async def test_redis_script_refills_and_isolates_keys():
+    import redis.asyncio as redis
+    client = redis.from_url(REDIS)
+    store = RedisBucketStore(client, prefix=f"lendit:test:{os.getpid()}:")
+    limit = Limit(rate=0.001, burst=2)
+    try:
+        assert await store.take("a", limit, cost=0) == 0
+        assert [await store.take("a", limit) for _ in range(2)] == [0, 0]
+        assert await store.take("a", limit) > 0
+        assert await store.take("b", limit) == 0
+        fast = Limit(rate=1000, burst=1)
+        await store.take("c", fast)
+        assert await store.take("c", fast) < 0.01
+    finally:
+        await client.delete(*[f"{store.prefix}{key}" for key in "abc"])
+        await client.aclose()
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(MemoryBucketStore())
+    monkeypatch.setattr(ratelimit, "limiter", limiter)
+    return limiter
+
+
+async def test_rejections_are_429_with_retry_after(limiter, clock, monkeypatch):
+    from core.config import config
+    monkeypatch.setitem(config, "RATE_LIMIT_TESTS", "2/minute")
+    app = fastapi.FastAPI()
+
+    @app.get("/", dependencies=[fastapi.Depends(ratelimit.rate_limit("tests"))])
+    def index():
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert [(await client.get("/")).status_code for _ in range(2)] == [200, 200]
+        rejected = await client.get("/")
+        assert rejected.status_code == 429
+        assert rejected.headers["Retry-After"] == "30"
+        clock[0] += 30
+        assert (await client.get("/")).status_code == 200
+
+
+async def test_disabled_limiter_lets_everything_through(limiter):
+    limiter.enabled = False
+    for _ in range(5):
+        await limiter.hit("tests", "k", Limit(rate=1, burst=1))
+
+
+async def test_only_failed_logins_drain_the_account_bucket(limiter, clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "LOGIN_ACCOUNT_LIMIT", Limit(rate=1 / 60, burst=2))
+    for _ in range(5):
+        await ratelimit.check_login_account("Owner@Example.com")
+    await ratelimit.charge_failed_login("owner@example.com")
+    await ratelimit.check_login_account("owner@example.com")
+    await ratelimit.charge_failed_login(" OWNER@example.com")
+    with pytest.raises(fastapi.HTTPException) as rejected:
+        await ratelimit.check_login_account("owner@example.com")
+    assert rejected.value.status_code == 429
+    await ratelimit.check_login_account("someone@example.com")
+
+
+@pytest.mark.postgres
+async def test_guessing_does_not_lock_out_a_correct_login(client, limiter, monkeypatch):
+    from core import database
+    from core.security import password_hasher
+    monkeypatch.setattr(password_hasher, "rounds", 4)
+    monkeypatch.setattr(ratelimit, "LOGIN_ACCOUNT_LIMIT", Limit(rate=1 / 60, burst=3))
+    async with database.pool.connection() as conn:
+        await conn.execute(
+            "INSERT INTO users (email, password, first_name, role) VALUES ('owner@example.com', %s, 'Owner', 'lender')",
+            (await password_hasher.hash("right"),)
+        )
+
+    async def login(password):
+        return (await client.post("/v1/auth/login", data={"username": "owner@example.com", "password": password})).status_code
+
+    assert [await login("right") for _ in range(5)] == [200] * 5
+    assert [await login("wrong") for _ in range(3)] == [401] * 3
+    assert await login("right") == 429
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+import httpx
+import psycopg
+import pytest
+from psycopg_pool import PoolTimeout
+from core import database, replicas
+
+pytestmark = pytest.mark.anyio
+
+# A streaming replica of the server the postgres tests use, as host:port.
+REPLICA = os.environ.get("LENDIT_TEST_REPLICA")
+
+
+def test_parse_lsn_orders_like_the_wal():
+    assert replicas.parse_lsn("0/FFFFFFFF") < replicas.parse_lsn("1/0") < replicas.parse_lsn("16/B374D848")
+    assert replicas.parse_lsn(None) is None
+    assert replicas.parse_lsn("garbage") is None
+
+
+class FakeConn:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query, params=None):
+        return self
+
+    async def fetchone(self):
+        if isinstance(self.row, Exception):
+            raise self.row
+        return self.row
+
+    async def commit(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, row=None):
+        self.row = row
+        self.timeouts = []
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        self.timeouts.append(timeout)
+        if isinstance(self.row, PoolTimeout):
+            raise self.row
+        yield FakeConn(self.row)
+
+    async def getconn(self, timeout=None):
+        if isinstance(self.row, PoolTimeout):
+            raise self.row
+        return FakeConn(self.row)
+
+    async def putconn(self, conn):
+        pass
+
+    async def open(self, wait=True):
+        pass
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_pools(monkeypatch):
+    monkeypatch.setattr(database, "build_pool", lambda info, connection_class=None: FakePool())
+    monkeypatch.setattr(database, "pool", FakePool({"in_recovery": False}))
+
+
+def standby(lsn: str) -> dict:
+    return {"in_recovery": True, "lsn": lsn}
+
+
+# Primary WAL positions sampled 3s, 2s and 1s ago.
+def samples() -> deque:
+    now = time.monotonic()
+    return deque([(now - 3, replicas.parse_lsn("0/100")), (now - 2, replicas.parse_lsn("0/200")), (now - 1, replicas.parse_lsn("0/300"))])
+
+
+async def test_lag_is_the_age_of_the_newest_sample_replayed(fake_pools, monkeypatch):
+    monkeypatch.setattr(replicas, "MAX_LAG_SECONDS", 2.5)
+    replica = replicas.Replica("replica:5432")
+    replica.pool.row = standby("0/300")
+    await replica.check(samples())
+    assert replica.healthy and replica.lag < 1.5 and replica.usable(None)
+
+    replica.pool.row = standby("0/250")
+    await replica.check(samples())
+    assert 2 <= replica.lag < 2.5 and replica.usable(None)
+
+    replica.pool.row = standby("0/150")
+    await replica.check(samples())
+    assert replica.lag >= 3 and not replica.usable(None)
+    assert replica.healthy
+
+    replica.pool.row = standby("0/50")
+    await replica.check(samples())
+    assert replica.lag == float("inf") and not replica.usable(None)
+
+
+async def test_replica_is_ejected_after_repeated_failures(fake_pools, monkeypatch):
+    monkeypatch.setattr(replicas, "MAX_FAILURES", 2)
+    replica = replicas.Replica("replica:5432")
+    replica.pool.row = standby("0/300")
+    await replica.check(samples())
+    replica.pool.row = PoolTimeout("no connection")
+    await replica.check(samples())
+    assert replica.healthy
+    await replica.check(samples())
+    assert not replica.healthy and not replica.usable(None)
+    replica.pool.row = standby("0/300")
+    await replica.check(samples())
+    assert replica.usable(None)
+
+
+async def test_promoted_replica_is_ejected(fake_pools, monkeypatch):
+    monkeypatch.setattr(replicas, "MAX_FAILURES", 1)
+    replica = replicas.Replica("replica:5432")
+    replica.pool.row = standby("0/300")
+    await replica.check(samples())
+    replica.pool.row = {"in_recovery": False, "lsn": None}
+    await replica.check(samples())
+    assert not replica.healthy
+
+
+async def test_primary_check_does_not_wait_out_the_pool_timeout(fake_pools):
+    replica_set = replicas.ReplicaSet(["replica:5432"])
+    replica_set.replicas[0].pool.row = standby("0/300")
+    database.pool.row = PoolTimeout("no connection")
+    await replica_set.open()
+    await replica_set.close()
+    assert database.pool.timeouts == [replicas.CHECKOUT_TIMEOUT_SECONDS]
+    assert not replica_set.primary_samples
+
+
+async def test_choose_skips_replicas_behind_the_session(fake_pools):
+    replica_set = replicas.ReplicaSet(["behind:5432", "ahead:5432"])
+    behind, ahead = replica_set.replicas
+    behind.pool.row, ahead.pool.row = standby("0/200"), standby("0/300")
+    for replica in replica_set.replicas:
+        await replica.check(samples())
+    assert {replica_set.choose(None) for _ in range(4)} == {behind, ahead}
+    assert {replica_set.choose(replicas.parse_lsn("0/280")) for _ in range(4)} == {ahead}
+    assert replica_set.choose(replicas.parse_lsn("0/400")) is None
+
+
+async def test_reads_fall_back_to_the_primary(fake_pools, monkeypatch):
+    replica_set = replicas.ReplicaSet(["replica:5432"])
+    replica = replica_set.replicas[0]
+    replica.pool.row = standby("0/300")
+    await replica.check(samples())
+    monkeypatch.setattr(replicas, "replica_set", replica_set)
+
+    async with replicas.read_connection() as conn:
+        assert (await (await conn.execute("")).fetchone())["in_recovery"]
+    async with replicas.read_connection(replicas.parse_lsn("0/400")) as conn:
+        assert not (await (await conn.execute("")).fetchone())["in_recovery"]
+
+    # A replica that cannot hand out a connection is ejected on the spot.
+    replica.pool.row = PoolTimeout("no connection")
+    async with replicas.read_connection() as conn:
+        assert not (await (await conn.execute("")).fetchone())["in_recovery"]
+    assert not replica.healthy
+    assert (replica_set.replica_reads, replica_set.primary_reads) == (1, 2)
+
+
+async def test_writes_leave_their_lsn_in_a_cookie():
+    async def app(scope, receive, send):
+        if scope["method"] != "GET":
+            scope.setdefault("state", {})["write_lsn"] = "0/3000"
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    transport = httpx.ASGITransport(app=replicas.ReadYourWritesMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert replicas.SESSION_COOKIE not in (await client.get("/")).cookies
+        cookie = (await client.post("/")).headers["set-cookie"]
+    assert cookie.startswith(f"{replicas.SESSION_COOKIE}=0/3000; Max-Age={replicas.SESSION_SECONDS};")
+
+
+# Against a real primary and streaming replica. Replay on the replica is
+# paused to make it fall behind, which needs a superuser.
+live = pytest.mark.skipif(not REPLICA, reason="set LENDIT_TEST_REPLICA to a streaming replica of the test server")
+
+
+@asynccontextmanager
+async def replay_paused():
+    host, _, port = REPLICA.partition(":")
+    async with await psycopg.AsyncConnection.connect(database.conninfo("postgres", host, int(port or 5432)), autocommit=True) as conn:
+        await conn.execute("SELECT pg_wal_replay_pause()")
+        try:
+            yield
+        finally:
+            await conn.execute("SELECT pg_wal_replay_resume()")
+
+
+async def wait_for(replica_set, predicate, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for the replica"
+        await asyncio.sleep(0.05)
+        await replica_set.check()
+
+
+@pytest.fixture
+async def replica_set(database_name, monkeypatch):
+    monkeypatch.setattr(replicas, "REPLICA_HOSTS", [REPLICA])
+    await database.open_pool()
+    await replicas.open_replicas()
+    try:
+        # The disposable database reaches the replica by replication too.
+        await wait_for(replicas.replica_set, lambda: replicas.replica_set.replicas[0].usable(None))
+        yield replicas.replica_set
+    finally:
+        await replicas.close_replicas()
+        await database.close_pool()
+
+
+async def is_standby(conn) -> bool:
+    return (await (await conn.execute("SELECT pg_is_in_recovery() AS in_recovery")).fetchone())["in_recovery"]
+
+
+@pytest.mark.postgres
+@live
+async def test_lagging_replica_is_passed_over_until_it_catches_up(replica_set, monkeypatch):
+    monkeypatch.setattr(replicas, "MAX_LAG_SECONDS", 0.3)
+    replica = replica_set.replicas[0]
+    await wait_for(replica_set, lambda: replica.usable(None))
+    async with replicas.read_connection() as conn:
+        assert replicas.on_replica(conn) and await is_standby(conn)
+    async with replay_paused():
+        async with database.pool.connection() as conn:
+            await conn.execute("CREATE TABLE replica_probe (at timestamptz)")
+        await wait_for(replica_set, lambda: not replica.usable(None))
+        assert replica.healthy
+        async with replicas.read_connection() as conn:
+            assert not replicas.on_replica(conn) and not await is_standby(conn)
+    await wait_for(replica_set, lambda: replica.usable(None))
+    async with replicas.read_connection() as conn:
+        assert replicas.on_replica(conn)
+
+
+@pytest.mark.postgres
+@live
+async def test_session_reads_its_own_write_from_the_primary(replica_set, monkeypatch):
+    from app.api.auth import create_access_token
+    from app.main import create_app
+    from core.cache import item_cache
+
+    monkeypatch.setattr(replicas, "MAX_LAG_SECONDS", 60)
+    async with database.pool.connection() as conn:
+        owner = await (await conn.execute(
+            "INSERT INTO users (email, password, first_name, role) VALUES ('replica@example.com', 'x', 'Replica', 'lender') RETURNING id"
+        )).fetchone()
+    token = create_access_token({"sub": str(owner["id"]), "email": "replica@example.com"})
+    transport = httpx.ASGITransport(app=create_app())
+    async with replay_paused(), httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        created = await client.post("/v1/items/", headers={"Authorization": f"Bearer {token}"}, json={
+            "name": "Replica kettle", "price_per_day": 5, "location": "Hostel A, Room 101",
+        })
+        assert created.status_code == 201
+        lsn = created.cookies[replicas.SESSION_COOKIE]
+        assert replicas.parse_lsn(lsn) > replica_set.replicas[0].replay_lsn
+        url = f"/v1/items/{created.json()['id']}"
+
+        reads = replica_set.primary_reads
+        assert (await client.get(url, cookies={replicas.SESSION_COOKIE: lsn})).status_code == 200
+        assert replica_set.primary_reads == reads + 1
+
+        # Without the cookie the read goes to the replica, which has not
+        # replayed the insert yet.
+        client.cookies.clear()
+        await item_cache.invalidate(f"item:{created.json()['id']}")
+        reads = replica_set.replica_reads
+        assert (await client.get(url)).status_code == 404
+        assert replica_set.replica_reads == reads + 1
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from core.security import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=2)
+    yield hasher
+    hasher.shutdown()
+
+
+async def test_verify(hasher):
+    hashed = await hasher.hash("right")
+    assert await hasher.verify("right", hashed) == (True, None)
+    assert await hasher.verify("wrong", hashed) == (False, None)
+
+
+async def test_verify_rehashes_under_a_new_cost(hasher):
+    hashed = await hasher.hash("right")
+    hasher.rounds = 5
+    valid, new_hash = await hasher.verify("right", hashed)
+    assert valid and new_hash.startswith("$2b$05$")
+    assert await hasher.verify("right", new_hash) == (True, None)
+    # A wrong password never yields a replacement hash.
+    assert await hasher.verify("wrong", hashed) == (False, None)
+
+
+async def test_backlog_past_max_pending_is_503(hasher):
+    release = threading.Event()
+    blocked = [asyncio.create_task(hasher._submit(release.wait)) for _ in range(hasher.max_pending)]
+    await asyncio.sleep(0)
+    assert hasher.pending == hasher.max_pending
+    with pytest.raises(HTTPException) as rejected:
+        await hasher.hash("right")
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers == {"Retry-After": "1"}
+    assert hasher.metrics()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*blocked)
+    assert hasher.pending == 0
+    assert await hasher.verify("right", await hasher.hash("right")) == (True, None)
+
+
+@pytest.mark.postgres
+async def test_login_stores_the_rehashed_password(client, monkeypatch):
+    from core import database
+    from core.security import password_hasher
+    monkeypatch.setattr(password_hasher, "rounds", 4)
+    stored = await password_hasher.hash("right")
+    async with database.pool.connection() as conn:
+        await conn.execute(
+            "INSERT INTO users (email, password, first_name, role) VALUES ('owner@example.com', %s, 'Owner', 'lender')",
+            (stored,)
+        )
+    monkeypatch.setattr(password_hasher, "rounds", 5)
+    response = await client.post("/v1/auth/login", data={"username": "owner@example.com", "password": "right"})
+    assert response.status_code == 200
+    async with database.pool.connection() as conn:
+        row = await (await conn.execute("SELECT password FROM users WHERE email = 'owner@example.com'")).fetchone()
+    assert row["password"] != stored and row["password"].startswith("$2b$05$")
+    assert await password_hasher.verify("right", row["password"]) == (True, None)
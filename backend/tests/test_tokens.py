@@ -0,0 +1,97 @@
+import time
+import pytest
+from jose import JWTError, jwt
+from core import tokens
+from core.config import config
+from core.tokens import DEFAULT_KID, KeyRing, VerifiedTokenCache, load_keyring
+
+pytestmark = pytest.mark.anyio
+
+
+def claims(**extra) -> dict:
+    return {"sub": "1", "email": "owner@example.com", "exp": int(time.time()) + 600, **extra}
+
+
+def test_tokens_signed_with_a_retired_key_still_verify():
+    before = KeyRing("HS256", {"old": "old-secret"}, "old", "old-secret")
+    token = before.sign(claims())
+    after = KeyRing("HS256", {"old": "old-secret", "new": "new-secret"}, "new", "new-secret")
+    assert jwt.get_unverified_header(after.sign(claims()))["kid"] == "new"
+    assert after.verify(token)["sub"] == "1"
+
+
+def test_unknown_kid_is_rejected():
+    token = KeyRing("HS256", {"gone": "gone-secret"}, "gone", "gone-secret").sign(claims())
+    with pytest.raises(JWTError, match="unknown key id 'gone'"):
+        KeyRing("HS256", {"new": "new-secret"}).verify(token)
+
+
+def test_token_under_a_known_kid_with_the_wrong_key_is_rejected():
+    token = KeyRing("HS256", {"new": "forged"}, "new", "forged").sign(claims())
+    with pytest.raises(JWTError):
+        KeyRing("HS256", {"new": "new-secret"}).verify(token)
+
+
+def test_tokens_from_before_rotation_use_the_default_kid():
+    token = jwt.encode(claims(), "legacy-secret", algorithm="HS256")
+    ring = KeyRing("HS256", {DEFAULT_KID: "legacy-secret", "new": "new-secret"}, "new", "new-secret")
+    assert ring.verify(token)["sub"] == "1"
+
+
+def test_verify_only_ring_cannot_sign():
+    with pytest.raises(RuntimeError):
+        KeyRing("HS256", {"new": "new-secret"}).sign(claims())
+
+
+def test_load_keyring_from_jwt_keys(monkeypatch):
+    monkeypatch.setitem(config, "JWT_KEYS", "old:old-secret, new:new-secret")
+    monkeypatch.setitem(config, "JWT_ACTIVE_KID", "new")
+    ring = load_keyring()
+    assert ring.verification_keys == {"old": "old-secret", "new": "new-secret"}
+    assert (ring.active_kid, ring.signing_key) == ("new", "new-secret")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(tokens.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_entry_expires_at_the_token_exp(clock):
+    cache = VerifiedTokenCache()
+    cache.set("token", {"id": 1}, clock[0] + 60)
+    clock[0] += 59.9
+    assert cache.get("token") == {"id": 1}
+    clock[0] += 0.1
+    assert cache.get("token") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not cache._entries
+
+
+def test_cache_drops_least_recently_used():
+    cache = VerifiedTokenCache(max_size=2)
+    expires = time.time() + 60
+    cache.set("a", 1, expires)
+    cache.set("b", 2, expires)
+    cache.get("a")
+    cache.set("c", 3, expires)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+async def test_current_user_is_cached_until_the_token_expires(clock, monkeypatch):
+    from app.api.auth import get_current_user
+    ring = KeyRing("HS256", {"new": "new-secret"}, "new", "new-secret")
+    monkeypatch.setattr(tokens, "_keyring", ring)
+    monkeypatch.setattr(tokens, "token_cache", VerifiedTokenCache())
+    monkeypatch.setattr("app.api.auth.token_cache", tokens.token_cache)
+    exp = int(time.time()) + 600
+    token = ring.sign(claims(exp=exp))
+    assert await get_current_user(token) == {"id": 1, "email": "owner@example.com"}
+    assert await get_current_user(token) == {"id": 1, "email": "owner@example.com"}
+    assert tokens.token_cache.hits == 1
+
+    # Past exp the user is no longer served from the cache, so the token
+    # goes back through verification, which rejects it once expired.
+    clock[0] = exp
+    assert tokens.token_cache.get(token) is None
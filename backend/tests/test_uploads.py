@@ -0,0 +1,121 @@
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from core import cloudinary
+from core.storage import CloudinaryStorage, LocalStorage
+
+pytestmark = pytest.mark.anyio
+
+
+def encoded(format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    media = tmp_path / "media"
+    monkeypatch.setattr(cloudinary, "SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(cloudinary, "get_storage", lambda: LocalStorage(str(media), "/media"))
+    return media
+
+
+@pytest.mark.parametrize("format, extension", [("PNG", ".png"), ("JPEG", ".jpg"), ("GIF", ".gif"), ("WEBP", ".webp")])
+async def test_extension_comes_from_the_detected_format(media, format, extension):
+    url = await cloudinary.upload_image(UploadFile(io.BytesIO(encoded(format)), filename="photo.html"))
+    assert url.endswith(extension)
+    assert os.path.exists(media / os.path.basename(url))
+
+
+@pytest.mark.parametrize("filename, body", [
+    ("photo.svg", b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'),
+    ("photo.png", encoded("BMP")),
+])
+async def test_unsupported_files_are_rejected(media, filename, body):
+    with pytest.raises(HTTPException) as raised:
+        await cloudinary.upload_image(UploadFile(io.BytesIO(body), filename=filename))
+    assert raised.value.status_code == 400
+    assert not media.exists() or os.listdir(media) == []
+
+
+class FakeSDK:
+    class exceptions:
+        class NotFound(Exception):
+            pass
+
+    def __init__(self):
+        self.stored = set()
+        self.lookups = 0
+        self.uploads = []
+        self.api = self
+        self.uploader = self
+
+    def resource(self, public_id):
+        self.lookups += 1
+        if public_id not in self.stored:
+            raise self.exceptions.NotFound(public_id)
+
+    def upload_large(self, path, public_id, **options):
+        self.uploads.append(options)
+        self.stored.add(public_id)
+        return {"secure_url": f"https://cdn.example.com/{public_id}"}
+
+
+def test_cloudinary_remembers_stored_keys():
+    storage = CloudinaryStorage()
+    storage.sdk = FakeSDK()
+    assert not storage.exists("abc.png")
+    storage.put("abc.png", "/tmp/abc.png")
+    assert storage.exists("abc.png") and storage.exists("abc.png")
+    assert storage.sdk.lookups == 1
+    assert storage.sdk.uploads[0]["overwrite"] is False
+
+
+def test_cloudinary_remembers_keys_found_by_lookup(monkeypatch):
+    monkeypatch.setattr("core.storage.KNOWN_KEYS", 2)
+    storage = CloudinaryStorage()
+    storage.sdk = FakeSDK()
+    storage.sdk.stored.update({"a", "b", "c"})
+    for key in ("a.png", "b.png", "a.png", "c.png", "a.png", "b.png"):
+        assert storage.exists(key)
+    # a stays known throughout; b is evicted by c and looked up again.
+    assert storage.sdk.lookups == 4
+
+
+@pytest.fixture
+async def api(media, monkeypatch):
+    import httpx
+    from app.api.auth import create_access_token
+    from app.main import create_app
+    from core.ratelimit import limiter
+    monkeypatch.setattr(limiter, "enabled", False)
+    token = create_access_token({"sub": "1", "email": "owner@example.com"})
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+
+
+# No pool at all: an inline upload must not need a database connection.
+async def test_inline_upload_holds_no_connection(api, media, monkeypatch):
+    from core import database
+    monkeypatch.setattr(database, "pool", None)
+    response = await api.post("/v1/items/images", params={"background": "false"}, files={"images": ("a.png", encoded("PNG"))})
+    assert response.status_code == 201
+    assert os.path.exists(media / os.path.basename(response.json()["images"][0]))
+
+
+@pytest.mark.postgres
+async def test_queued_upload_commits_its_job(api, media, database_name):
+    from core import database
+    await database.open_pool()
+    try:
+        response = await api.post("/v1/items/images", files={"images": ("a.png", encoded("PNG"))})
+        assert response.status_code == 201
+        async with database.pool.connection() as conn:
+            job = await (await conn.execute("SELECT payload FROM jobs WHERE kind = 'storage.upload'")).fetchone()
+        assert response.json()["images"][0].endswith(job["payload"]["key"])
+    finally:
+        await database.close_pool()